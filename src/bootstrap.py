@@ -0,0 +1,279 @@
+"""
+Bootstrap confidence intervals for the test metrics.
+
+The 2022-2023 test split is small, so point estimates of ROC-AUC, PR-AUC and
+the Type I/II errors move a lot between samples. This module draws thousands
+of resamples at once as a weight matrix (row i of W = how many times each test
+row appears in resample i) and evaluates every metric as matrix operations:
+
+  - scores are sorted once; a resample only changes the weights, so weighted
+    cumulative TP/FP counts at each distinct score give all ROC/PR curves
+  - threshold metrics are weighted confusion counts (W @ indicator)
+
+Resampling schemes:
+  - stratified: positives and negatives resampled separately (fixed class counts)
+  - block: banks resampled with replacement, each keeping all its rows
+
+Usage:
+  python bootstrap.py --output ./output
+  python bootstrap.py --output ./output --scheme block --n-boot 5000
+  python bootstrap.py --prediction-store ./output/prediction_store
+"""
+
+import time
+import argparse
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+BOOTSTRAP_SCHEMES = ["stratified", "block"]
+N_BOOT = 2000
+CI_ALPHA = 0.05
+MAX_BATCH_CELLS = 1 << 23   # resamples x rows per weight-matrix batch
+RANDOM_STATE = 42
+
+METRICS = ["roc_auc", "pr_auc", "accuracy", "type_i_error", "type_ii_error", "recall"]
+
+
+# ====================
+# RESAMPLING
+# ====================
+
+def bootstrap_weights(n_boot: int, y: np.ndarray, groups: np.ndarray = None,
+                      scheme: str = "stratified", rng: np.random.Generator = None) -> np.ndarray:
+    """Multinomial resample counts, shape (n_boot, n_rows)."""
+    rng = rng or np.random.default_rng(RANDOM_STATE)
+    n = len(y)
+
+    if scheme == "stratified":
+        W = np.zeros((n_boot, n), dtype=np.float64)
+        for cls in (0, 1):
+            idx = np.flatnonzero(y == cls)
+            if len(idx):
+                W[:, idx] = rng.multinomial(len(idx), np.full(len(idx), 1.0 / len(idx)), size=n_boot)
+        return W
+
+    if scheme == "block":
+        if groups is None:
+            raise ValueError("Block bootstrap needs a group (bank) per row")
+        codes, uniques = pd.factorize(groups)
+        n_groups = len(uniques)
+        group_counts = rng.multinomial(n_groups, np.full(n_groups, 1.0 / n_groups), size=n_boot)
+        return group_counts[:, codes].astype(np.float64)
+
+    raise ValueError(f"Unknown bootstrap scheme: {scheme}")
+
+
+# ====================
+# WEIGHTED METRICS
+# ====================
+
+def weighted_auc_ap(proba: np.ndarray, y: np.ndarray, W: np.ndarray):
+    """ROC-AUC and average precision for every row of W in one pass.
+
+    Matches sklearn's roc_auc_score / average_precision_score for unit weights
+    (ties handled by grouping equal scores into one threshold).
+    """
+    order = np.argsort(-proba, kind="mergesort")
+    s = proba[order]
+    pos = y[order] == 1
+    W = W[:, order]
+
+    # Last index of every run of equal scores = one threshold
+    ends = np.r_[np.flatnonzero(np.diff(s) != 0), len(s) - 1]
+    tp = np.cumsum(W * pos, axis=1)[:, ends]
+    fp = np.cumsum(W * ~pos, axis=1)[:, ends]
+    P = tp[:, -1:]
+    N = fp[:, -1:]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tp0 = np.pad(tp, ((0, 0), (1, 0)))
+        fp0 = np.pad(fp, ((0, 0), (1, 0)))
+        auc = (np.diff(fp0, axis=1) * (tp0[:, 1:] + tp0[:, :-1]) / 2).sum(axis=1) / (P * N)[:, 0]
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        ap = (np.diff(tp0, axis=1) * precision).sum(axis=1) / P[:, 0]
+
+    # Resamples without both classes have no AUC (sklearn would raise)
+    undefined = (P[:, 0] == 0) | (N[:, 0] == 0)
+    auc[undefined] = np.nan
+    ap[P[:, 0] == 0] = np.nan
+    return auc, ap
+
+
+def weighted_threshold_metrics(proba: np.ndarray, y: np.ndarray, thr: float, W: np.ndarray) -> Dict:
+    """Accuracy and Type I/II error (see calc_type_errors) for every row of W."""
+    pred = proba >= thr
+    actual = y == 1
+    tp = W @ (actual & pred)
+    fn = W @ (actual & ~pred)
+    fp = W @ (~actual & pred)
+    tn = W @ (~actual & ~pred)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "accuracy": (tp + tn) / (tp + fn + fp + tn),
+            "type_i_error": fn / (tp + fn),
+            "type_ii_error": fp / (tn + fp),
+            "recall": tp / (tp + fn),
+        }
+
+
+def bootstrap_metrics(proba, y, thr: float, groups=None, scheme: str = "stratified",
+                      n_boot: int = N_BOOT, alpha: float = CI_ALPHA,
+                      random_state: int = RANDOM_STATE) -> pd.DataFrame:
+    """Point estimates and percentile confidence intervals for the test metrics."""
+    proba = np.asarray(proba, dtype=np.float64)
+    y = np.asarray(y).astype(int)
+    groups = None if groups is None else np.asarray(groups)
+    rng = np.random.default_rng(random_state)
+
+    # Point estimate = unit weights
+    ones = np.ones((1, len(y)))
+    point_auc, point_ap = weighted_auc_ap(proba, y, ones)
+    point = {"roc_auc": point_auc[0], "pr_auc": point_ap[0]}
+    point.update({k: v[0] for k, v in weighted_threshold_metrics(proba, y, thr, ones).items()})
+
+    # Resample in batches to bound the weight matrix size
+    batch = max(1, min(n_boot, MAX_BATCH_CELLS // max(len(y), 1)))
+    draws = {m: [] for m in METRICS}
+    for start in range(0, n_boot, batch):
+        W = bootstrap_weights(min(batch, n_boot - start), y, groups, scheme, rng)
+        auc, ap = weighted_auc_ap(proba, y, W)
+        draws["roc_auc"].append(auc)
+        draws["pr_auc"].append(ap)
+        for k, v in weighted_threshold_metrics(proba, y, thr, W).items():
+            draws[k].append(v)
+
+    rows = []
+    for metric in METRICS:
+        values = np.concatenate(draws[metric])
+        valid = values[~np.isnan(values)]
+        lower, upper = np.quantile(valid, [alpha / 2, 1 - alpha / 2]) if len(valid) else (np.nan, np.nan)
+        rows.append({
+            "metric": metric,
+            "point": point[metric],
+            "ci_lower": lower,
+            "ci_upper": upper,
+            "std": valid.std(ddof=1) if len(valid) > 1 else np.nan,
+            "n_valid": len(valid),
+        })
+    return pd.DataFrame(rows)
+
+
+# ====================
+# PREDICTION FILES
+# ====================
+
+def load_prediction_csvs(output_dir: str) -> pd.DataFrame:
+    """All <model>/<model>_predictions_<h>y.csv files under output_dir."""
+    frames = []
+    for path in sorted(Path(output_dir).glob("*/*_predictions_*y.csv")):
+        df = pd.read_csv(path)
+        df["model"] = path.name.split("_predictions_")[0]
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def load_prediction_store(store_dir: str) -> pd.DataFrame:
+    """Latest run of every model in the prediction store."""
+    from risk_query import load_latest_from_store
+    return load_latest_from_store(store_dir)
+
+
+def bootstrap_all(predictions: pd.DataFrame, scheme: str = "stratified", n_boot: int = N_BOOT,
+                  alpha: float = CI_ALPHA) -> pd.DataFrame:
+    """Confidence interval table for every (model, horizon) in a predictions frame.
+
+    Rows without a known outcome (incremental scores of recent quarters) are left out.
+    """
+    known = pd.to_numeric(predictions["distress_actual"], errors="coerce").notna()
+    if not known.all():
+        print(f"  Skipping {int((~known).sum()):,} rows with unknown distress_actual")
+        predictions = predictions[known]
+
+    tables = []
+    for (model, horizon), df in predictions.groupby(["model", "horizon"], observed=True, sort=True):
+        start = time.perf_counter()
+        thr = float(df["threshold_used"].iloc[0])
+        groups = df["symbol"].astype(str).values if scheme == "block" else None
+        table = bootstrap_metrics(df["prob_distress"].values, df["distress_actual"].values, thr,
+                                  groups, scheme, n_boot, alpha)
+        table.insert(0, "horizon", int(horizon))
+        table.insert(0, "model", model)
+        table["n_test"] = len(df)
+        table["seconds"] = round(time.perf_counter() - start, 3)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bootstrap confidence intervals for test metrics of every model and horizon",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python bootstrap.py --output ./output
+  python bootstrap.py --output ./output --scheme block --n-boot 5000
+  python bootstrap.py --prediction-store ./output/prediction_store --output ./output
+        """
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./output",
+        help="Directory with <model>/<model>_predictions_<h>y.csv; the CI table is written here"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default=None,
+        help="Read predictions from this Parquet store instead of CSVs"
+    )
+    parser.add_argument(
+        "--scheme",
+        type=str,
+        default="stratified",
+        choices=BOOTSTRAP_SCHEMES,
+        help="Resample rows within class, or whole banks"
+    )
+    parser.add_argument("--n-boot", type=int, default=N_BOOT, help="Number of resamples")
+    parser.add_argument("--alpha", type=float, default=CI_ALPHA, help="1 - confidence level")
+
+    args = parser.parse_args()
+
+    if args.prediction_store:
+        predictions = load_prediction_store(args.prediction_store)
+    else:
+        predictions = load_prediction_csvs(args.output)
+    if predictions.empty:
+        print("Error: No predictions found")
+        return
+
+    print("=" * 70)
+    print(f"BOOTSTRAP CONFIDENCE INTERVALS ({args.scheme}, {args.n_boot} resamples)")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    table = bootstrap_all(predictions, args.scheme, args.n_boot, args.alpha)
+    elapsed = time.perf_counter() - start
+    if table.empty:
+        print("Error: No predictions with known outcomes")
+        return
+
+    level = int(round((1 - args.alpha) * 100))
+    for (model, horizon), df in table.groupby(["model", "horizon"], sort=False):
+        print(f"\n  {model} {horizon}Y (n={df['n_test'].iloc[0]}, {df['seconds'].iloc[0] * 1000:.0f} ms)")
+        for row in df.itertuples():
+            print(f"    {row.metric:<14}: {row.point:.4f}  [{row.ci_lower:.4f}, {row.ci_upper:.4f}] {level}% CI")
+
+    csv_path = Path(args.output) / f"bootstrap_ci_{args.scheme}.csv"
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(csv_path, index=False)
+    print(f"\n✓ {table[['model', 'horizon']].drop_duplicates().shape[0]} model/horizon pairs in {elapsed:.2f}s")
+    print(f"  Saved: {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Probability calibration for class-weighted models.
+
+Raw scores from models trained with scale_pos_weight / class_weight /
+sample_weight are not calibrated probabilities. A calibrator is fitted on the
+validation split per (model, horizon) and stored next to the model artifacts
+as JSON. Isotonic calibrators are applied at scoring time as a piecewise-linear
+``np.interp`` lookup over their knots; Platt calibrators evaluate their sigmoid
+directly (a tabulated sigmoid is least accurate at the small scores where
+rare-event predictions concentrate).
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+CALIBRATION_METHODS = ["none", "isotonic", "platt"]
+
+# Logit-spaced grid used to tabulate the Platt sigmoid as knots (for reading, not scoring)
+PLATT_GRID_SIZE = 512
+PROBA_EPS = 1e-6
+
+
+class Calibrator:
+    """Monotone map from raw score to calibrated probability.
+
+    Knots (x, y) are interpolated piecewise-linearly unless the sigmoid
+    parameters of a Platt fit (coef, intercept) are set.
+    """
+
+    def __init__(self, method: str, x, y, coef: float = None, intercept: float = None):
+        self.method = method
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.coef = coef
+        self.intercept = intercept
+
+    def transform(self, proba) -> np.ndarray:
+        """Calibrate raw scores (vectorized)."""
+        if self.coef is not None:
+            return _sigmoid(self.coef * _logit(np.asarray(proba, dtype=np.float64)) + self.intercept)
+        return np.interp(proba, self.x, self.y)
+
+    def to_dict(self) -> dict:
+        d = {"method": self.method, "x": self.x.tolist(), "y": self.y.tolist()}
+        if self.coef is not None:
+            d.update(coef=self.coef, intercept=self.intercept)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Calibrator":
+        # Platt files written before coef / intercept were stored fall back to the knots
+        return cls(d["method"], d["x"], d["y"], d.get("coef"), d.get("intercept"))
+
+    def save(self, path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path) -> "Calibrator":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, PROBA_EPS, 1 - PROBA_EPS)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def fit_isotonic(y_true, proba) -> Calibrator:
+    """Isotonic regression; its step knots become the interpolation table."""
+    from sklearn.isotonic import IsotonicRegression
+
+    iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip")
+    iso.fit(np.asarray(proba, dtype=np.float64), np.asarray(y_true, dtype=np.float64))
+    return Calibrator("isotonic", iso.X_thresholds_, iso.y_thresholds_)
+
+
+def fit_platt(y_true, proba) -> Calibrator:
+    """Platt scaling on the logit of the raw score; knots tabulated on a logit-spaced grid."""
+    from sklearn.linear_model import LogisticRegression
+
+    z = _logit(np.asarray(proba, dtype=np.float64)).reshape(-1, 1)
+    lr = LogisticRegression(C=1e6)
+    lr.fit(z, np.asarray(y_true, dtype=int))
+    coef, intercept = float(lr.coef_[0, 0]), float(lr.intercept_[0])
+
+    limit = _logit(np.array([1 - PROBA_EPS]))[0]
+    grid = np.r_[0.0, _sigmoid(np.linspace(-limit, limit, PLATT_GRID_SIZE - 2)), 1.0]
+    return Calibrator("platt", grid, _sigmoid(coef * _logit(grid) + intercept), coef, intercept)
+
+
+def fit_calibrator(y_true, proba, method: str = "isotonic") -> Calibrator:
+    """Fit a calibrator on validation labels and raw validation scores."""
+    if method == "isotonic":
+        return fit_isotonic(y_true, proba)
+    elif method == "platt":
+        return fit_platt(y_true, proba)
+    else:
+        raise ValueError(f"Unknown calibration method: {method}")
+
+
+def calibrator_path(output_dir: str, model_name: str, horizon: int) -> Path:
+    """Location of a calibrator next to the model's other per-horizon outputs."""
+    return Path(output_dir) / f"{model_name}_calibrator_{horizon}y.json"
+
+
+def calibrate_horizon(proba_val, y_val, method: str, output_dir: str,
+                      model_name: str, horizon: int) -> Calibrator:
+    """Fit, report and store the calibrator for one (model, horizon)."""
+    if method == "none":
+        return None
+
+    calibrator = fit_calibrator(y_val, proba_val, method)
+
+    path = calibrator_path(output_dir, model_name, horizon)
+    calibrator.save(path)
+    print(f"  Calibrator ({method}, {len(calibrator.x)} knots) saved: {path}")
+
+    return calibrator
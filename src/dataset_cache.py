@@ -0,0 +1,136 @@
+"""
+On-disk cache of the prepared training panel.
+
+Validation, the 4Q filter, horizon labels and the news-feature join run once per
+distinct input; later runs load the prepared panel from a pickle keyed by the
+content hash of the data file, the news file and the preparation settings.
+
+Usage:
+  python dataset_cache.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python dataset_cache.py --news ./scheduler_state/articles.sqlite
+  python dataset_cache.py --clear
+"""
+
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from pathlib import Path
+from typing import List, Tuple
+
+import pandas as pd
+
+from training_utils import (
+    load_and_prepare_data,
+    FEATURE_COLS,
+    TARGET_COL,
+    YEAR_START,
+    YEAR_END,
+)
+from news_features import load_articles, add_news_features, NEWS_HALF_LIFE_QUARTERS
+
+DATASET_CACHE_DIR = "./data/cache"
+
+# Bump when preparation logic changes in a way the settings below do not capture
+DATASET_CACHE_VERSION = 2
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dataset_key(data_path: str, news_path: str = None, half_life: float = NEWS_HALF_LIFE_QUARTERS) -> str:
+    """Cache key: input contents + preparation settings."""
+    parts = {
+        "version": DATASET_CACHE_VERSION,
+        "data": file_digest(data_path),
+        "news": file_digest(news_path) if news_path else None,
+        "half_life": half_life if news_path else None,
+        "years": [YEAR_START, YEAR_END],
+        "features": FEATURE_COLS,
+        "target": TARGET_COL,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def load_dataset(data_path: str, news_path: str = None, cache_dir: str = DATASET_CACHE_DIR,
+                 half_life: float = NEWS_HALF_LIFE_QUARTERS,
+                 validate: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
+    """Prepared panel, optionally with news features, through the cache.
+
+    Returns (df_h, df_model, feature_cols); feature_cols is FEATURE_COLS plus the
+    news columns when news_path is given. cache_dir=None disables the cache.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = Path(cache_dir) / f"panel_{dataset_key(data_path, news_path, half_life)}.pkl"
+        if cache_path.exists():
+            start = time.perf_counter()
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            print(f"  Dataset cache hit: {cache_path.name} ({time.perf_counter() - start:.2f}s)")
+            df_h, feature_cols = cached["df_h"], cached["feature_cols"]
+            return df_h, df_h.dropna(subset=FEATURE_COLS + [TARGET_COL]).copy(), feature_cols
+
+    df_h, _ = load_and_prepare_data(data_path, validate=validate)
+    feature_cols = list(FEATURE_COLS)
+    if news_path:
+        df_h, news_cols = add_news_features(df_h, load_articles(news_path), half_life)
+        feature_cols += news_cols
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"df_h": df_h, "feature_cols": feature_cols}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(cache_path)
+        print(f"  Dataset cache miss: wrote {cache_path.name}")
+
+    return df_h, df_h.dropna(subset=FEATURE_COLS + [TARGET_COL]).copy(), feature_cols
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build or inspect the prepared-panel cache",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python dataset_cache.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python dataset_cache.py --news ./scheduler_state/articles.sqlite
+  python dataset_cache.py --clear
+        """
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV"
+    )
+    parser.add_argument("--news", type=str, default=None, help="Article store (.sqlite) or sheet CSV export")
+    parser.add_argument("--cache-dir", type=str, default=DATASET_CACHE_DIR, help="Cache directory")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached panels")
+
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = list(Path(args.cache_dir).glob("panel_*.pkl"))
+        for path in removed:
+            path.unlink()
+        print(f"Removed {len(removed)} cached panels from {args.cache_dir}")
+        return
+
+    for attempt in ("first", "second"):
+        start = time.perf_counter()
+        df_h, df_model, feature_cols = load_dataset(args.data, args.news, args.cache_dir)
+        print(f"{attempt} load: {time.perf_counter() - start:.2f}s | "
+              f"{len(df_h):,} rows | {len(feature_cols)} features")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Population stability / drift monitor for incoming quarters.
+
+The reference (drift_reference.npz, written next to models_all_horizons.pkl)
+holds, per horizon, a histogram of every feature over that horizon's training
+set on shared quantile bins, and per (model, horizon) a histogram of the
+validation scores. Checking new data bins every row once, counts all
+(group, feature, bin) cells with a single bincount and compares them with every
+horizon's training histogram by broadcasting, so the cost is one pass over the
+new panel regardless of the number of horizons. Score drift scores a sample of
+the new rows with every (model, horizon); PSI on 20k rows is within ~0.001 of
+the full panel.
+
+  PSI  on 10 bins (pairs of the 20 quantile bins) plus a missing-value bin
+       < 0.10 stable | 0.10-0.25 moderate | >= 0.25 shift
+  KS   max CDF gap over the 20-bin edges (non-missing values)
+
+Usage:
+  python drift_monitor.py build --models ./output/models_all_horizons.pkl
+  python drift_monitor.py check --data ./data/incoming/2024Q1.csv
+  python drift_monitor.py check --data ./data/processed/financial_report_bank_zscore_clean.csv --from-year 2022 --by-quarter
+  python drift_monitor.py check --data big_panel.csv --no-scores --report ./output/drift_report.csv --fail-on-shift
+"""
+
+import sys
+import time
+import pickle
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+DRIFT_REFERENCE_NAME = "drift_reference.npz"
+N_BINS = 20            # quantile bins per feature / score (KS resolution)
+PSI_BIN_GROUP = 2      # adjacent bins merged for PSI -> 10 bins
+PSI_EPS = 1e-4         # floor for empty bins in the PSI log ratio
+PSI_MODERATE = 0.10
+PSI_SHIFT = 0.25
+SCORE_SAMPLE_N = 20_000
+RANDOM_STATE = 42
+
+STATUS_ORDER = ["stable", "moderate", "shift"]
+
+
+def psi_status(psi) -> np.ndarray:
+    return np.array(STATUS_ORDER)[np.digitize(psi, [PSI_MODERATE, PSI_SHIFT])]
+
+
+# ====================
+# BINNING & METRICS
+# ====================
+
+def quantile_edges(X: np.ndarray, n_bins: int = N_BINS) -> np.ndarray:
+    """Inner bin edges per column, shape (n_cols, n_bins - 1); ties give empty bins.
+
+    Each quantile is moved halfway to the next distinct value, so mass points
+    (e.g. many identical scores) never sit on an edge and rounding noise in
+    re-scored data cannot flip them into the neighbouring bin.
+    """
+    with np.errstate(all="ignore"):
+        edges = np.nanquantile(X, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+    edges = np.nan_to_num(edges, nan=0.0)
+    for j in range(X.shape[1]):
+        distinct = np.unique(X[:, j][~np.isnan(X[:, j])])
+        if len(distinct) < 2:
+            continue
+        i = np.clip(np.searchsorted(distinct, edges[j], side="right"), 1, len(distinct) - 1)
+        edges[j] = (distinct[i - 1] + distinct[i]) / 2
+    return edges
+
+
+def bin_counts(X: np.ndarray, edges: np.ndarray, groups: np.ndarray = None, n_groups: int = 1) -> np.ndarray:
+    """Histogram of every column on its edges, shape (n_groups, n_cols, n_bins + 1).
+
+    The last bin counts missing values. All cells are counted in one bincount.
+    """
+    n_cols, n_inner = edges.shape
+    width = n_inner + 2  # n_bins value bins + missing
+    idx = np.empty(X.shape, dtype=np.int64)
+    for j in range(n_cols):
+        idx[:, j] = np.searchsorted(edges[j], X[:, j], side="right")
+    idx[np.isnan(X)] = width - 1
+    idx += np.arange(n_cols) * width
+    if groups is not None:
+        idx += (groups.astype(np.int64) * (n_cols * width))[:, None]
+    counts = np.bincount(idx.ravel(), minlength=n_groups * n_cols * width)
+    return counts.reshape(n_groups, n_cols, width)
+
+
+def _shares(counts: np.ndarray) -> np.ndarray:
+    total = counts.sum(axis=-1, keepdims=True)
+    return counts / np.maximum(total, 1)
+
+
+def psi(ref_counts: np.ndarray, new_counts: np.ndarray) -> np.ndarray:
+    """PSI over the last axis on PSI_BIN_GROUP-merged value bins plus the missing bin (broadcasts)."""
+    def merge(counts):
+        values = counts[..., :-1]
+        merged = values.reshape(values.shape[:-1] + (-1, PSI_BIN_GROUP)).sum(axis=-1)
+        return np.concatenate([merged, counts[..., -1:]], axis=-1)
+
+    p = np.maximum(_shares(merge(ref_counts)), PSI_EPS)
+    q = np.maximum(_shares(merge(new_counts)), PSI_EPS)
+    return ((q - p) * np.log(q / p)).sum(axis=-1)
+
+
+def binned_ks(ref_counts: np.ndarray, new_counts: np.ndarray) -> np.ndarray:
+    """Max CDF gap at the bin edges over non-missing values (broadcasts)."""
+    p = np.cumsum(_shares(ref_counts[..., :-1]), axis=-1)
+    q = np.cumsum(_shares(new_counts[..., :-1]), axis=-1)
+    return np.abs(p - q).max(axis=-1)
+
+
+# ====================
+# REFERENCE
+# ====================
+
+class DriftReference:
+    """Training-feature and validation-score histograms for one models store."""
+
+    def __init__(self, features: List[str], horizons: List[int], models: List[str], feature_edges: np.ndarray,
+                 feature_counts: np.ndarray, score_edges: np.ndarray, score_counts: np.ndarray):
+        self.features = list(features)
+        self.horizons = [int(h) for h in horizons]
+        self.models = list(models)
+        self.feature_edges = feature_edges    # (F, N_BINS - 1)
+        self.feature_counts = feature_counts  # (H, F, N_BINS + 1)
+        self.score_edges = score_edges        # (M * H, N_BINS - 1)
+        self.score_counts = score_counts      # (M * H, N_BINS + 1)
+
+    @classmethod
+    def from_models_store(cls, models_store: Dict, n_bins: int = N_BINS) -> "DriftReference":
+        models = list(models_store)
+        horizons = sorted(models_store[models[0]])
+        # All models of a horizon share its training split
+        X_trains = [models_store[models[0]][h]["X_train"] for h in horizons]
+        features = list(X_trains[0].columns)
+
+        pooled = np.concatenate([X.to_numpy(dtype=np.float64) for X in X_trains])
+        feature_edges = quantile_edges(pooled, n_bins)
+        feature_counts = np.concatenate([
+            bin_counts(X.to_numpy(dtype=np.float64), feature_edges) for X in X_trains
+        ])
+
+        # Validation sets differ in size per horizon, so each score vector is binned on its own
+        score_edges, score_counts = [], []
+        for m in models:
+            for h in horizons:
+                scores = np.asarray(models_store[m][h]["proba_val"], dtype=np.float64)[:, None]
+                edges = quantile_edges(scores, n_bins)
+                score_edges.append(edges[0])
+                score_counts.append(bin_counts(scores, edges)[0, 0])
+        score_edges, score_counts = np.array(score_edges), np.array(score_counts)
+        return cls(features, horizons, models, feature_edges, feature_counts, score_edges, score_counts)
+
+    def save(self, path: str) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path, features=np.array(self.features), horizons=np.array(self.horizons),
+            models=np.array(self.models), feature_edges=self.feature_edges,
+            feature_counts=self.feature_counts, score_edges=self.score_edges, score_counts=self.score_counts
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "DriftReference":
+        with np.load(path, allow_pickle=False) as npz:
+            return cls(npz["features"].tolist(), npz["horizons"].tolist(), npz["models"].tolist(),
+                       npz["feature_edges"], npz["feature_counts"], npz["score_edges"], npz["score_counts"])
+
+
+def save_reference(models_store: Dict, output_dir: str) -> Path:
+    """Write drift_reference.npz next to models_all_horizons.pkl."""
+    path = DriftReference.from_models_store(models_store).save(Path(output_dir) / DRIFT_REFERENCE_NAME)
+    print(f"  Drift reference saved to: {path}")
+    return path
+
+
+# ====================
+# CHECK
+# ====================
+
+def _group_codes(df: pd.DataFrame, by_quarter: bool):
+    if not by_quarter:
+        return None, ["all"]
+    labels = df["calendar_year"].astype(str) + df["period"].astype(str)
+    codes, uniques = pd.factorize(labels, sort=True)
+    return codes, list(uniques)
+
+
+def check_drift(reference: DriftReference, df: pd.DataFrame, models_store: Dict = None,
+                by_quarter: bool = False, score_sample_n: int = SCORE_SAMPLE_N,
+                random_state: int = RANDOM_STATE) -> pd.DataFrame:
+    """Long report: one row per (group, kind, name, horizon) with PSI, KS and status.
+
+    kind is "feature" (new rows vs that horizon's training set) or "score"
+    (model scores on new rows vs its validation scores; needs models_store).
+    """
+    groups, group_names = _group_codes(df, by_quarter)
+    n_groups = len(group_names)
+    H, F = len(reference.horizons), len(reference.features)
+    X = df[reference.features].to_numpy(dtype=np.float64)
+
+    counts = bin_counts(X, reference.feature_edges, groups, n_groups)          # (G, F, B+1)
+    ref = reference.feature_counts[None]                                        # (1, H, F, B+1)
+    new = counts[:, None]                                                       # (G, 1, F, B+1)
+    feature_psi = psi(ref, new)                                                 # (G, H, F)
+    feature_ks = binned_ks(ref, new)
+    group_rows = counts[:, 0].sum(axis=-1)
+    missing = counts[..., -1] / np.maximum(group_rows[:, None], 1)              # (G, F)
+
+    g, h, f = np.meshgrid(np.arange(n_groups), np.arange(H), np.arange(F), indexing="ij")
+    parts = [pd.DataFrame({
+        "group": np.array(group_names)[g.ravel()],
+        "kind": "feature",
+        "name": np.array(reference.features)[f.ravel()],
+        "horizon": np.array(reference.horizons)[h.ravel()],
+        "n_rows": group_rows[g.ravel()],
+        "psi": feature_psi.ravel(),
+        "ks": feature_ks.ravel(),
+        "missing_share": missing[g.ravel(), f.ravel()],
+    })]
+
+    if models_store is not None:
+        from training_utils import get_probabilities
+
+        rng = np.random.default_rng(random_state)
+        rows = np.arange(len(df))
+        if len(rows) > score_sample_n:
+            rows = np.sort(rng.choice(rows, score_sample_n, replace=False))
+        X_scores = df[reference.features].iloc[rows]
+        sample_groups = groups[rows] if groups is not None else None
+
+        pairs = [(m, h) for m in reference.models for h in reference.horizons]
+        scores = np.column_stack([
+            get_probabilities(models_store[m][h]["model"], X_scores, m) for m, h in pairs
+        ])
+        score_counts = bin_counts(scores, reference.score_edges, sample_groups, n_groups)  # (G, M*H, B+1)
+        score_psi = psi(reference.score_counts[None], score_counts)
+        score_ks = binned_ks(reference.score_counts[None], score_counts)
+        g, k = np.meshgrid(np.arange(n_groups), np.arange(len(pairs)), indexing="ij")
+        parts.append(pd.DataFrame({
+            "group": np.array(group_names)[g.ravel()],
+            "kind": "score",
+            "name": [pairs[i][0] for i in k.ravel()],
+            "horizon": [pairs[i][1] for i in k.ravel()],
+            "n_rows": score_counts[:, 0].sum(axis=-1)[g.ravel()],
+            "psi": score_psi.ravel(),
+            "ks": score_ks.ravel(),
+            "missing_share": np.nan,
+        }))
+
+    report = pd.concat(parts, ignore_index=True)
+    report["status"] = psi_status(report["psi"].to_numpy())
+    return report
+
+
+def summarize(report: pd.DataFrame) -> pd.DataFrame:
+    """Worst horizon per (group, kind, name)."""
+    worst = report.loc[report.groupby(["group", "kind", "name"], sort=False)["psi"].idxmax()]
+    return worst.sort_values(["group", "kind", "psi"], ascending=[True, True, False]).reset_index(drop=True)
+
+
+def print_summary(report: pd.DataFrame, top: int = 15):
+    summary = summarize(report)
+    for group, part in summary.groupby("group", sort=True):
+        n_rows = int(part["n_rows"].iloc[0])
+        counts = part["status"].value_counts()
+        flags = ", ".join(f"{s}={counts.get(s, 0)}" for s in STATUS_ORDER)
+        print(f"\n{group} ({n_rows:,} rows) – {flags}")
+        print(f"  {'kind':<8}{'name':<26}{'worst h':>8}{'psi':>9}{'ks':>8}{'missing':>9}  status")
+        for _, row in part.groupby("kind", sort=False).head(top).iterrows():
+            missing = "" if pd.isna(row["missing_share"]) else f"{row['missing_share']:.1%}"
+            print(f"  {row['kind']:<8}{row['name']:<26}{row['horizon']:>7}y{row['psi']:>9.3f}"
+                  f"{row['ks']:>8.3f}{missing:>9}  {row['status']}")
+
+
+def load_incoming(data_path: str, news_path: str = None, from_year: int = None,
+                  to_year: int = None) -> pd.DataFrame:
+    """Rows to check: the raw panel (or the news-augmented panel), optionally a year window."""
+    if news_path:
+        from dataset_cache import load_dataset
+        df, _, _ = load_dataset(data_path, news_path, validate=False)
+    else:
+        df = pd.read_csv(data_path)
+    if from_year is not None:
+        df = df[df["calendar_year"] >= from_year]
+    if to_year is not None:
+        df = df[df["calendar_year"] <= to_year]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Feature and score drift of incoming quarters against the training distribution",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python drift_monitor.py build --models ./output/models_all_horizons.pkl
+  python drift_monitor.py check --data ./data/incoming/2024Q1.csv
+  python drift_monitor.py check --data ./data/processed/financial_report_bank_zscore_clean.csv --from-year 2022 --by-quarter
+  python drift_monitor.py check --data big_panel.csv --no-scores --report ./output/drift_report.csv --fail-on-shift
+        """
+    )
+    parser.add_argument("action", choices=["build", "check"], help="Build the reference or check new data")
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store (build; check uses it for score drift)"
+    )
+    parser.add_argument(
+        "--reference",
+        type=str,
+        default=None,
+        help=f"Reference file (default: {DRIFT_REFERENCE_NAME} next to --models)"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="CSV with the incoming quarters (same columns as the cleaned panel)"
+    )
+    parser.add_argument("--news", type=str, default=None, help="Article store the models' news features came from")
+    parser.add_argument("--from-year", type=int, default=None, help="Only check rows from this calendar year")
+    parser.add_argument("--to-year", type=int, default=None, help="Only check rows up to this calendar year")
+    parser.add_argument("--by-quarter", action="store_true", help="Report every incoming quarter separately")
+    parser.add_argument("--no-scores", action="store_true", help="Feature drift only (skip scoring)")
+    parser.add_argument("--score-sample", type=int, default=SCORE_SAMPLE_N, help="Rows scored for score drift")
+    parser.add_argument("--report", type=str, default=None, help="Write the full long report to this CSV")
+    parser.add_argument("--top", type=int, default=15, help="Features / models shown per group")
+    parser.add_argument("--fail-on-shift", action="store_true", help="Exit with status 1 if anything has PSI >= 0.25")
+
+    args = parser.parse_args()
+
+    reference_path = Path(args.reference or Path(args.models).parent / DRIFT_REFERENCE_NAME)
+    models_store = None
+    if args.action == "build" or not args.no_scores:
+        if not Path(args.models).exists():
+            print(f"Error: Models file not found: {args.models}")
+            return
+        with open(args.models, "rb") as f:
+            models_store = pickle.load(f)
+
+    if args.action == "build":
+        DriftReference.from_models_store(models_store).save(reference_path)
+        print(f"✓ Drift reference saved to: {reference_path}")
+        return
+
+    if not reference_path.exists():
+        print(f"Error: Drift reference not found: {reference_path} (run `drift_monitor.py build`)")
+        return
+    reference = DriftReference.load(reference_path)
+
+    start = time.perf_counter()
+    df = load_incoming(args.data, args.news, args.from_year, args.to_year)
+    load_seconds = time.perf_counter() - start
+    if df.empty:
+        print("No rows to check")
+        return
+
+    start = time.perf_counter()
+    report = check_drift(reference, df, models_store, args.by_quarter, args.score_sample)
+    check_seconds = time.perf_counter() - start
+
+    print("=" * 70)
+    print("DRIFT MONITOR")
+    print("=" * 70)
+    print(f"Reference: {reference_path} ({len(reference.features)} features x {len(reference.horizons)} horizons"
+          f"{'' if models_store is None else f', {len(reference.models)} models'})")
+    print(f"Data: {args.data} ({len(df):,} rows, loaded in {load_seconds:.2f}s, checked in {check_seconds:.2f}s)")
+    print_summary(report, args.top)
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        report.to_csv(args.report, index=False)
+        print(f"\nFull report: {args.report}")
+
+    if args.fail_on_shift and (report["status"] == "shift").any():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Ensemble / stacking layer over the 4 base models.
+
+Fits a lightweight stacker per horizon on the validation predictions stored
+during training (``proba_val`` in models_all_horizons.pkl), scores the four
+base models concurrently in a thread pool, and exports the combined score in
+the same schema as ``evaluate_and_export``.
+
+Usage:
+  python ensemble.py
+  python ensemble.py --models ./output/models_all_horizons.pkl --method weighted
+  python ensemble.py --news ./scheduler_state/articles.sqlite   # models trained with --news
+"""
+
+import json
+import argparse
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from training_utils import (
+    load_and_prepare_data,
+    split_by_horizon,
+    get_probabilities,
+    export_predictions,
+    HARDCODED_THRESHOLD,
+)
+from prediction_store import PredictionStore, new_run_id
+from dataset_cache import load_dataset
+
+BASE_MODELS = ["ngboost", "rf", "xgboost", "lgbm"]
+STACKER_METHODS = ["logistic", "weighted"]
+PROBA_EPS = 1e-6
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, PROBA_EPS, 1 - PROBA_EPS)
+    return np.log(p / (1 - p))
+
+
+class Stacker:
+    """Combines base-model probabilities (n_rows x n_models) into one score.
+
+    - ``weighted``: average of probabilities, weights proportional to val PR-AUC
+    - ``logistic``: logistic regression on base-model logits
+    """
+
+    def __init__(self, method: str = "logistic", model_names: List[str] = None):
+        if method not in STACKER_METHODS:
+            raise ValueError(f"Unknown stacker method: {method}")
+        self.method = method
+        self.model_names = model_names or BASE_MODELS
+        self.weights = None
+        self.intercept = 0.0
+
+    def fit(self, P_val: np.ndarray, y_val) -> "Stacker":
+        y_val = np.asarray(y_val, dtype=int)
+        if self.method == "weighted":
+            from sklearn.metrics import average_precision_score
+            scores = np.array([average_precision_score(y_val, P_val[:, j]) for j in range(P_val.shape[1])])
+            self.weights = scores / scores.sum()
+            self.intercept = 0.0
+        else:
+            from sklearn.linear_model import LogisticRegression
+            lr = LogisticRegression(C=1.0)
+            lr.fit(_logit(P_val), y_val)
+            self.weights = lr.coef_[0]
+            self.intercept = float(lr.intercept_[0])
+        return self
+
+    def predict(self, P: np.ndarray) -> np.ndarray:
+        if self.method == "weighted":
+            return P @ self.weights
+        return 1.0 / (1.0 + np.exp(-(_logit(P) @ self.weights + self.intercept)))
+
+    def to_dict(self) -> Dict:
+        return {
+            "method": self.method,
+            "models": self.model_names,
+            "weights": [float(w) for w in self.weights],
+            "intercept": self.intercept,
+        }
+
+
+class EnsembleScorer:
+    """Scores the base models of one horizon concurrently and stacks them.
+
+    XGBoost, LightGBM and the sklearn trees release the GIL while predicting,
+    so a thread pool overlaps the four calls without copying the models.
+    """
+
+    def __init__(self, models: Dict, stacker: Stacker, max_workers: int = None):
+        self.models = models
+        self.stacker = stacker
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or len(models))
+
+    def base_probabilities(self, X) -> np.ndarray:
+        futures = [
+            self.executor.submit(get_probabilities, self.models[name], X, name)
+            for name in self.stacker.model_names
+        ]
+        return np.column_stack([f.result() for f in futures])
+
+    def predict(self, X) -> np.ndarray:
+        return self.stacker.predict(self.base_probabilities(X))
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def validation_matrix(models_store: Dict, horizon: int, X_val, model_names: List[str]) -> np.ndarray:
+    """Stack stored validation predictions; recompute for pickles that predate them."""
+    columns = []
+    for name in model_names:
+        entry = models_store[name][horizon]
+        proba_val = entry.get("proba_val")
+        if proba_val is None:
+            proba_val = get_probabilities(entry["model"], X_val, name)
+        columns.append(np.asarray(proba_val))
+    return np.column_stack(columns)
+
+
+def run_ensemble(models_store: Dict, df_h, output_dir: str, method: str = "logistic",
+                 horizons: List[int] = None, thr: float = HARDCODED_THRESHOLD,
+                 store: PredictionStore = None, run_id: str = None) -> Dict:
+    """Fit a stacker per horizon and export ensemble predictions."""
+    output_dir = Path(output_dir) / "ensemble"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model_names = [name for name in BASE_MODELS if name in models_store]
+    horizons = horizons or sorted(models_store[model_names[0]].keys())
+    # Score on the columns the base models were trained on (may include news features)
+    feature_cols = list(models_store[model_names[0]][horizons[0]]["X_train"].columns)
+    stackers = {}
+
+    for horizon in horizons:
+        print(f"\nHORIZON {horizon}Y")
+        print("-" * 70)
+        (_, _), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon, feature_cols)
+
+        P_val = validation_matrix(models_store, horizon, X_val, model_names)
+        stacker = Stacker(method, model_names).fit(P_val, y_val)
+        weights = ", ".join(f"{n}={w:.3f}" for n, w in zip(model_names, stacker.weights))
+        print(f"  Stacker ({method}): {weights}")
+
+        scorer = EnsembleScorer({name: models_store[name][horizon]["model"] for name in model_names}, stacker)
+        try:
+            proba = scorer.predict(X_test)
+        finally:
+            scorer.close()
+
+        export_predictions(proba, y_test, df_test_meta, horizon, thr, "ensemble", str(output_dir),
+                           store=store, run_id=run_id)
+        stackers[horizon] = stacker.to_dict()
+
+    json_path = output_dir / "ensemble_stackers.json"
+    with open(json_path, "w") as f:
+        json.dump(stackers, f, indent=2)
+    print(f"\n  Stackers (all horizons) saved: {json_path}")
+
+    return stackers
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stack the 4 trained models into one ensemble score per horizon",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python ensemble.py
+  python ensemble.py --models ./output/models_all_horizons.pkl --method weighted
+  python ensemble.py --news ./scheduler_state/articles.sqlite
+        """
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store from train_all_models.py / run_pipeline.py"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./output",
+        help="Output directory (predictions go to <output>/ensemble/)"
+    )
+    parser.add_argument(
+        "--method",
+        type=str,
+        default="logistic",
+        choices=STACKER_METHODS,
+        help="Stacker type"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default=None,
+        help="Append predictions to this Parquet store instead of writing CSVs"
+    )
+    parser.add_argument(
+        "--news",
+        type=str,
+        default=None,
+        help="Article store / sheet CSV the base models' news features came from"
+    )
+
+    args = parser.parse_args()
+
+    models_path = Path(args.models)
+    if not models_path.exists():
+        print(f"Error: Models file not found: {args.models}")
+        return
+
+    with open(models_path, "rb") as f:
+        models_store = pickle.load(f)
+
+    print("=" * 70)
+    print("ENSEMBLE STACKING")
+    print("=" * 70)
+    print(f"Models: {args.models}")
+    print(f"Method: {args.method}")
+
+    if args.news:
+        df_h, _, _ = load_dataset(args.data, args.news)
+    else:
+        df_h, _ = load_and_prepare_data(args.data)
+    store = PredictionStore(args.prediction_store) if args.prediction_store else None
+    run_ensemble(models_store, df_h, args.output, args.method, store=store, run_id=new_run_id())
+
+    print("\n" + "=" * 70)
+    print("✓ COMPLETE")
+    print("=" * 70)
+    print(f"Predictions exported to: {store.root if store is not None else args.output + '/ensemble'}/")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+On-demand per-bank SHAP explanations for dashboards.
+
+SHAPAnalyzer.plot_force builds a new explainer (for NGBoost a KernelExplainer on
+a fresh background sample) on every call. Here:
+
+  - one ModelExplainer per (model, horizon) lives in an LRU cache capped by
+    approximate memory (model + explainer arrays)
+  - requests from any number of threads are queued; a dispatcher thread takes
+    what arrives within a short window, groups it by (model, horizon) and
+    answers each group with a single shap_values call
+  - answers are JSON-ready contribution lists (force plots remain available)
+
+Usage:
+  python explanation_service.py explain --symbol BBRI --year 2022 --period Q4 --model xgboost --horizon 1
+  python explanation_service.py benchmark --clients 8 --requests 50
+  python explanation_service.py benchmark --model-types ngboost --clients 4 --requests 3
+"""
+
+import time
+import json
+import queue
+import pickle
+import argparse
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from shap_analysis import build_explainer, ModelExplainer, SHAPAnalyzer, EXPLAINER_KEY
+from training_utils import load_and_prepare_data
+from dataset_cache import load_dataset
+
+EXPLAINER_CACHE_MB = 512
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH_ROWS = 256
+BACKGROUND_N = 100
+RANDOM_STATE = 42
+
+# Units of base_value / contributions per explainer
+OUTPUT_SPACE = {"xgb": "log_odds", "lgbm": "log_odds", "ngboost": "log_odds", "rf": "probability"}
+KEY_COLS = ["symbol", "calendar_year", "period"]
+
+
+def _approx_nbytes(obj, depth: int = 3, seen: set = None) -> int:
+    """Bytes of the numpy arrays / frames reachable from obj (a few levels deep)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=False).sum())
+    if depth == 0:
+        return 0
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, "__dict__"):
+        children = vars(obj).values()
+    else:
+        return 0
+    return sum(_approx_nbytes(child, depth - 1, seen) for child in children)
+
+
+def explainer_nbytes(explainer: ModelExplainer) -> int:
+    """Approximate memory held by a cached explainer: the model plus the explainer's own arrays."""
+    return len(pickle.dumps(explainer.model, protocol=pickle.HIGHEST_PROTOCOL)) + _approx_nbytes(explainer.explainer)
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else float("nan")
+
+
+# ====================
+# EXPLAINER CACHE
+# ====================
+
+class ExplainerCache:
+    """LRU of ModelExplainers keyed by (model, horizon), capped by approximate bytes."""
+
+    def __init__(self, models_store: Dict, max_bytes: int = EXPLAINER_CACHE_MB << 20,
+                 background_n: int = BACKGROUND_N, random_state: int = RANDOM_STATE):
+        self.models_store = models_store
+        self.max_bytes = max_bytes
+        self.background_n = background_n
+        self.random_state = random_state
+        self._entries = OrderedDict()  # (model, horizon) -> (explainer, nbytes)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.build_seconds = 0.0
+
+    def get(self, model_type: str, horizon: int) -> ModelExplainer:
+        key = (model_type, int(horizon))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+            self.misses += 1
+            start = time.perf_counter()
+            entry = self.models_store[model_type][int(horizon)]
+            explainer = build_explainer(entry["model"], model_type, entry["X_train"],
+                                        self.background_n, self.random_state)
+            self._entries[key] = (explainer, explainer_nbytes(explainer))
+            self.build_seconds += time.perf_counter() - start
+
+            # Evict least recently used, always keeping the one just built
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return explainer
+
+    @property
+    def nbytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def info(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "mb": round(self.nbytes / 2**20, 1),
+            "max_mb": round(self.max_bytes / 2**20, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "build_seconds": round(self.build_seconds, 2),
+        }
+
+
+# ====================
+# SERVICE
+# ====================
+
+class ExplanationService:
+    """Per-row SHAP contributions with cached explainers and request batching."""
+
+    def __init__(self, models_store: Dict, panel: pd.DataFrame = None,
+                 max_bytes: int = EXPLAINER_CACHE_MB << 20, batch_window_ms: float = BATCH_WINDOW_MS,
+                 max_batch_rows: int = MAX_BATCH_ROWS, background_n: int = BACKGROUND_N,
+                 random_state: int = RANDOM_STATE):
+        self.models_store = models_store
+        self.cache = ExplainerCache(models_store, max_bytes, background_n, random_state)
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.panel = None
+        if panel is not None:
+            self.panel = panel.set_index(KEY_COLS).sort_index()
+        self.batches = 0
+        self.batched_rows = 0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def feature_cols(self, model_type: str, horizon: int) -> List[str]:
+        return list(self.models_store[model_type][int(horizon)]["X_train"].columns)
+
+    # ----- requests -----
+
+    def submit(self, model_type: str, horizon: int, X: pd.DataFrame) -> Future:
+        """Queue rows for explanation; the future resolves to one dict per row."""
+        future = Future()
+        self._requests.put(((model_type, int(horizon)), X[self.feature_cols(model_type, horizon)], future))
+        return future
+
+    def explain(self, model_type: str, horizon: int, X: pd.DataFrame) -> List[Dict]:
+        return self.submit(model_type, horizon, X).result()
+
+    def explain_bank(self, symbol: str, calendar_year: int, period: str, model_type: str,
+                     horizon: int) -> Dict:
+        """Contributions for one bank-quarter of the panel."""
+        if self.panel is None:
+            raise ValueError("ExplanationService was created without a panel")
+        try:
+            row = self.panel.loc[[(symbol, int(calendar_year), period)]]
+        except KeyError:
+            raise KeyError(f"No panel row for {symbol} {calendar_year} {period}") from None
+        result = self.explain(model_type, horizon, row.iloc[:1])[0]
+        return {"symbol": symbol, "calendar_year": int(calendar_year), "period": period, **result}
+
+    def force_plot(self, model_type: str, horizon: int, X_row: pd.DataFrame):
+        """shap.force_plot for one row from the cached explainer."""
+        explainer = self.cache.get(model_type, horizon)
+        feature_cols = self.feature_cols(model_type, horizon)
+        return SHAPAnalyzer().plot_force(explainer.model, None, X_row[feature_cols], model_type,
+                                         feature_cols, explainer=explainer)
+
+    def close(self):
+        self._requests.put(None)
+        self._thread.join()
+
+    # ----- batching -----
+
+    def _dispatch(self):
+        stop = False
+        while not stop:
+            item = self._requests.get()
+            if item is None:
+                return
+            batch, n_rows = [item], len(item[1])
+            deadline = time.monotonic() + self.batch_window
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                n_rows += len(item[1])
+
+            groups = {}
+            for key, X, future in batch:
+                groups.setdefault(key, []).append((X, future))
+            for key, requests in groups.items():
+                self._answer(key, requests)
+
+    def _answer(self, key, requests):
+        model_type, horizon = key
+        try:
+            explainer = self.cache.get(model_type, horizon)
+            X = pd.concat([X for X, _ in requests])
+            values = explainer.shap_values(X)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_rows += len(X)
+        offset = 0
+        for X_req, future in requests:
+            rows = [
+                contributions(values[offset + i], X_req.iloc[i], explainer.base_value, model_type, horizon)
+                for i in range(len(X_req))
+            ]
+            offset += len(X_req)
+            future.set_result(rows)
+
+
+def contributions(shap_row: np.ndarray, x_row: pd.Series, base_value: float, model_type: str,
+                  horizon: int) -> Dict:
+    """JSON-ready explanation of one row, features ordered by |contribution|."""
+    order = np.argsort(-np.abs(shap_row), kind="stable")
+    return {
+        "model": model_type,
+        "horizon": int(horizon),
+        "output_space": OUTPUT_SPACE[EXPLAINER_KEY.get(model_type, model_type)],
+        "base_value": float(base_value),
+        "output": float(base_value + shap_row.sum()),
+        "contributions": [
+            {"feature": x_row.index[j], "value": float(x_row.iloc[j]), "shap": float(shap_row[j])}
+            for j in order
+        ],
+    }
+
+
+# ====================
+# BENCHMARK
+# ====================
+
+def benchmark(models_store: Dict, panel: pd.DataFrame, model_types: List[str], clients: int = 8,
+              requests: int = 50, baseline_rows: int = 10, random_state: int = RANDOM_STATE) -> Dict:
+    """Per-row latency: fresh explainer per call (plot_force) vs. the service under concurrent clients."""
+    rng = np.random.default_rng(random_state)
+    horizons = sorted(models_store[model_types[0]])
+    jobs = [(m, h) for m in model_types for h in horizons]
+    feature_cols = list(models_store[model_types[0]][horizons[0]]["X_train"].columns)
+    rows = panel.dropna(subset=feature_cols).reset_index(drop=True)
+
+    def random_row():
+        i = int(rng.integers(len(rows)))
+        return rows.iloc[[i]]
+
+    # Baseline: what plot_force does per call
+    analyzer = SHAPAnalyzer(background_n=BACKGROUND_N, random_state=random_state)
+    baseline = []
+    for _ in range(baseline_rows):
+        m, h = jobs[int(rng.integers(len(jobs)))]
+        entry = models_store[m][h]
+        X_row = random_row()[feature_cols]
+        start = time.perf_counter()
+        build_explainer(entry["model"], m, entry["X_train"], analyzer.background_n,
+                        analyzer.random_state).shap_values(X_row)
+        baseline.append(time.perf_counter() - start)
+
+    # Service: warm the cache once, then concurrent single-row requests
+    service = ExplanationService(models_store, panel)
+    warm_start = time.perf_counter()
+    for m, h in jobs:
+        service.explain(m, h, random_row())
+    warm_seconds = time.perf_counter() - warm_start
+
+    plans = [[(jobs[int(rng.integers(len(jobs)))], random_row()) for _ in range(requests)] for _ in range(clients)]
+
+    def client(plan):
+        latencies = []
+        for (m, h), X_row in plan:
+            start = time.perf_counter()
+            service.explain(m, h, X_row)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    service.batches = service.batched_rows = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [lat for result in pool.map(client, plans) for lat in result]
+    wall = time.perf_counter() - start
+    service.close()
+
+    return {
+        "model_types": model_types,
+        "baseline_p50_ms": percentile(baseline, 50) * 1000,
+        "baseline_p99_ms": percentile(baseline, 99) * 1000,
+        "warm_cache_seconds": warm_seconds,
+        "service_p50_ms": percentile(latencies, 50) * 1000,
+        "service_p99_ms": percentile(latencies, 99) * 1000,
+        "rows_per_second": len(latencies) / wall,
+        "mean_batch_rows": service.batched_rows / max(service.batches, 1),
+        "cache": service.cache.info(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-bank SHAP explanations with cached explainers",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python explanation_service.py explain --symbol BBRI --year 2022 --period Q4 --model xgboost --horizon 1
+  python explanation_service.py benchmark --clients 8 --requests 50
+  python explanation_service.py benchmark --model-types ngboost --clients 4 --requests 3
+        """
+    )
+    parser.add_argument("action", choices=["explain", "benchmark"], help="Action to run")
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store from train_all_models.py / run_pipeline.py"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV"
+    )
+    parser.add_argument("--news", type=str, default=None, help="Article store the models' news features came from")
+    parser.add_argument("--symbol", type=str, help="Bank symbol (explain)")
+    parser.add_argument("--year", type=int, help="Calendar year (explain)")
+    parser.add_argument("--period", type=str, help="Quarter Q1-Q4 (explain)")
+    parser.add_argument("--model", type=str, default="xgboost", help="Model key in the store (explain)")
+    parser.add_argument("--horizon", type=int, default=1, help="Horizon in years (explain)")
+    parser.add_argument("--top", type=int, default=None, help="Only the top-N contributions (explain)")
+    parser.add_argument(
+        "--model-types",
+        type=str,
+        default="rf,xgboost,lgbm",
+        help="Models to benchmark (comma-separated; NGBoost KernelSHAP is ~1s per row)"
+    )
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads (benchmark)")
+    parser.add_argument("--requests", type=int, default=50, help="Single-row requests per client (benchmark)")
+    parser.add_argument("--baseline-rows", type=int, default=10, help="Rows explained the uncached way (benchmark)")
+
+    args = parser.parse_args()
+
+    if not Path(args.models).exists():
+        print(f"Error: Models file not found: {args.models}")
+        return
+
+    with open(args.models, "rb") as f:
+        models_store = pickle.load(f)
+    if args.news:
+        panel, _, _ = load_dataset(args.data, args.news)
+    else:
+        panel, _ = load_and_prepare_data(args.data)
+
+    if args.action == "explain":
+        if not (args.symbol and args.year and args.period):
+            parser.error("explain needs --symbol, --year and --period")
+        service = ExplanationService(models_store, panel)
+        try:
+            result = service.explain_bank(args.symbol, args.year, args.period, args.model, args.horizon)
+        finally:
+            service.close()
+        if args.top:
+            result["contributions"] = result["contributions"][:args.top]
+        print(json.dumps(result, indent=2))
+        return
+
+    results = benchmark(models_store, panel, args.model_types.split(","), args.clients, args.requests,
+                        args.baseline_rows)
+    print("=" * 70)
+    print(f"EXPLANATION LATENCY PER ROW ({', '.join(results['model_types'])})")
+    print("=" * 70)
+    print(f"  New explainer per call : p50 {results['baseline_p50_ms']:9.1f} ms | p99 {results['baseline_p99_ms']:9.1f} ms")
+    print(f"  Service (cached, batch): p50 {results['service_p50_ms']:9.1f} ms | p99 {results['service_p99_ms']:9.1f} ms")
+    print(f"  Throughput: {results['rows_per_second']:.1f} rows/s with {args.clients} clients, "
+          f"{results['mean_batch_rows']:.1f} rows per shap_values call")
+    print(f"  Cache warm-up: {results['warm_cache_seconds']:.2f}s | {results['cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Import-time budget for the CLI entry points.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`;
+the cumulative time of the module itself (best of --repeats) must stay under its
+budget, and modules that only a specific trainer/analyzer needs must not be
+loaded at import time. Exits with status 1 on any violation, so it can guard
+startup against regressions in CI.
+
+Usage:
+  python import_budget.py
+  python import_budget.py --repeats 5 --scale 1.5
+  python import_budget.py --modules train_single_model,risk_query --verbose
+"""
+
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+# Loaded lazily by the trainer / analyzer that needs them
+HEAVY_MODULES = ["xgboost", "lightgbm", "ngboost", "shap", "matplotlib", "sklearn"]
+
+# entry point -> (budget in seconds, heavy modules allowed at import time)
+IMPORT_BUDGETS = {
+    "train_single_model": (1.0, []),
+    "train_all_models": (1.0, []),
+    "run_pipeline": (1.0, []),
+    "pipeline_dag": (1.0, []),
+    "work_queue": (1.0, []),
+    "ensemble": (1.0, []),
+    "dataset_cache": (1.0, []),
+    "panel": (1.0, []),
+    "news_features": (1.0, []),
+    "calibration": (1.0, []),
+    "risk_query": (1.0, []),
+    "prediction_store": (1.0, []),
+    "bootstrap": (1.0, []),
+    "inference_engine": (1.0, []),
+    "data_validation": (1.0, []),
+    "drift_monitor": (1.0, []),
+    "incremental_scoring": (1.0, []),
+    # These exist to run a backend / the SHAP stack, so they load it eagerly
+    "out_of_core": (5.0, ["xgboost", "lightgbm", "sklearn"]),
+    "shap_orchestrator": (8.0, ["shap", "matplotlib", "xgboost", "sklearn"]),
+    "shap_analysis": (8.0, ["shap", "matplotlib", "xgboost", "sklearn"]),
+    "explanation_service": (8.0, ["shap", "matplotlib", "xgboost", "sklearn"]),
+}
+
+SRC_DIR = Path(__file__).resolve().parent
+
+
+def measure_import(module: str):
+    """(cumulative seconds, {top-level package: seconds}) for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    total = None
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        seconds = int(cumulative) / 1e6
+        if name == module:
+            total = seconds
+        top = name.split(".")[0]
+        if "." not in name:
+            packages[top] = max(packages.get(top, 0.0), seconds)
+        else:
+            packages.setdefault(top, 0.0)
+    return total, packages
+
+
+def check(modules, repeats: int = 3, scale: float = 1.0, verbose: bool = False) -> bool:
+    print(f"{'entry point':<22}{'import s':>10}{'budget s':>10}  status")
+    print("-" * 70)
+    ok = True
+    for module in modules:
+        budget, allowed = IMPORT_BUDGETS[module]
+        budget *= scale
+        runs = [measure_import(module) for _ in range(repeats)]
+        best, packages = min(runs, key=lambda r: r[0])
+        heavy = [m for m in HEAVY_MODULES if m in packages and m not in allowed]
+
+        problems = []
+        if best > budget:
+            problems.append("over budget")
+        if heavy:
+            problems.append("loads " + ", ".join(heavy))
+        ok &= not problems
+        print(f"{module:<22}{best:>10.2f}{budget:>10.2f}  {'; '.join(problems) or 'ok'}")
+
+        if verbose:
+            slowest = sorted(packages.items(), key=lambda kv: -kv[1])[:5]
+            print("    " + ", ".join(f"{name}={s:.2f}s" for name, s in slowest))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check import time of the CLI entry points against per-module budgets",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python import_budget.py
+  python import_budget.py --repeats 5 --scale 1.5
+  python import_budget.py --modules train_single_model,risk_query --verbose
+        """
+    )
+    parser.add_argument(
+        "--modules",
+        type=str,
+        default=",".join(IMPORT_BUDGETS),
+        help="Comma-separated entry points to check"
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Cold imports per module (best is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget (slow CI machines)")
+    parser.add_argument("--verbose", action="store_true", help="Show the slowest top-level packages")
+
+    args = parser.parse_args()
+
+    ok = check(args.modules.split(","), args.repeats, args.scale, args.verbose)
+    print("-" * 70)
+    print("✓ All entry points within budget" if ok else "✗ Import budget exceeded")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
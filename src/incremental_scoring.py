@@ -0,0 +1,471 @@
+"""
+Event-driven scoring of newly landed bank-quarter rows.
+
+A watcher polls the source CSV (and/or a drop directory of filing CSVs) and
+scores only rows that are new or changed since it last looked:
+
+  - every row seen is remembered as (hash of symbol/year/period, hash of its
+    feature values) in an append-only log under --state-dir; a row is scored
+    when its key is unknown or its value hash differs
+  - rows appended to the source CSV are read from the last byte offset, so a
+    landing costs O(new rows), not O(panel); a rewritten file (shrunk, or the
+    bytes before the offset changed) falls back to one full rescan
+  - filings dropped into --drop-dir (write elsewhere, then rename into it) are
+    scored and moved to <drop-dir>/processed/ (or failed/); a source chunk that
+    fails (e.g. no symbol column) is copied to <state-dir>/failed/ and skipped
+  - the delta goes through the same validation and news-feature join as
+    dataset_cache.load_dataset, is scored by the 4 x 5 models loaded once at
+    startup and appended to the prediction store under a fresh incremental run
+    id (<timestamp>-inc-<suffix>; PredictionStore.read_latest overlays these
+    on the latest training run). Small deltas use inference_engine's compiled
+    forests (no per-call library overhead: 46 rows x 20 models 0.05s vs 0.40s;
+    LightGBM keeps its faster native predict), rescans the native predict
+
+Outcomes of new quarters are not known yet, so distress_actual and
+confusion_type are left empty.
+
+Usage:
+  python incremental_scoring.py --source ./data/processed/financial_report_bank_zscore_clean.csv
+  python incremental_scoring.py --drop-dir ./data/incoming --interval 0.5
+  python incremental_scoring.py --source panel.csv --once --backfill
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import fcntl
+import pickle
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from training_utils import FEATURE_COLS, TARGET_COL, get_probabilities, prediction_frame
+from data_validation import validate_panel, build_panel_schema
+from prediction_store import PredictionStore, new_run_id
+from pipeline_dag import EXPORT_KEY
+
+STATE_DIR = "./output/incremental_state"
+HASH_LOG_NAME = "row_hashes.bin"
+SOURCE_STATE_NAME = "source.json"
+LOCK_NAME = "watcher.lock"
+POLL_INTERVAL = 1.0
+BOUNDARY_BYTES = 4096       # bytes before the offset that must be unchanged for a tail read
+RECENT_MERGE_MIN = 100_000  # recent entries merged into the sorted index past max(this, 1% of it)
+COMPILED_MAX_ROWS = 5_000   # deltas up to this size are scored with the compiled forests
+
+
+# ====================
+# ROW HASHES
+# ====================
+
+def row_hashes(df: pd.DataFrame, value_cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(key hash, value hash) per row, uint64; stable across how the CSV chunk was parsed."""
+    keys = pd.DataFrame({
+        "symbol": df["symbol"].astype(str),
+        "calendar_year": pd.to_numeric(df["calendar_year"], errors="coerce").fillna(-1).astype(np.int64),
+        "period": df["period"].astype(str),
+    })
+    values = df[value_cols].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy(),
+            pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+
+def _dedupe_last(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted unique keys with the value of their last occurrence."""
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    last = np.r_[keys[1:] != keys[:-1], True] if len(keys) else np.zeros(0, dtype=bool)
+    return keys[last], values[last]
+
+
+class RowHashIndex:
+    """key hash -> value hash of every row seen, persisted as an append-only log.
+
+    Lookups are vectorized searchsorted calls on a large sorted index plus a
+    small sorted "recent" index, so recording a landing costs O(new rows); the
+    recent part is folded into the large one only once it is a sizeable fraction.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        pairs = np.zeros((0, 2), dtype=np.uint64)
+        if self.path.exists():
+            pairs = np.fromfile(self.path, dtype=np.uint64).reshape(-1, 2)
+        self.keys, self.values = _dedupe_last(pairs[:, 0], pairs[:, 1])
+        self.recent_keys = self.recent_values = np.zeros(0, dtype=np.uint64)
+        self.n_logged = len(pairs)
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.recent_keys)
+
+    @staticmethod
+    def _find(sorted_keys, sorted_values, keys):
+        idx = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+        found = (sorted_keys[idx] == keys) if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+        return found, sorted_values[idx] if len(sorted_keys) else np.zeros(len(keys), dtype=np.uint64)
+
+    def changed(self, keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Mask of rows that are new or whose values differ from the last recorded ones."""
+        found, known = self._find(self.keys, self.values, keys)
+        found_recent, known_recent = self._find(self.recent_keys, self.recent_values, keys)
+        known = np.where(found_recent, known_recent, known)
+        return ~(found | found_recent) | (known != values)
+
+    def record(self, keys: np.ndarray, values: np.ndarray):
+        if not len(keys):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(np.column_stack([keys, values]).astype(np.uint64).tobytes())
+        self.n_logged += len(keys)
+
+        self.recent_keys, self.recent_values = _dedupe_last(
+            np.concatenate([self.recent_keys, keys]), np.concatenate([self.recent_values, values])
+        )
+        if len(self.recent_keys) > max(RECENT_MERGE_MIN, len(self.keys) // 100):
+            self.keys, self.values = _dedupe_last(
+                np.concatenate([self.keys, self.recent_keys]), np.concatenate([self.values, self.recent_values])
+            )
+            self.recent_keys = self.recent_values = np.zeros(0, dtype=np.uint64)
+            if self.n_logged > 2 * len(self.keys):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the log with one entry per key."""
+        keys, values = _dedupe_last(
+            np.concatenate([self.keys, self.recent_keys]), np.concatenate([self.values, self.recent_values])
+        )
+        tmp_path = self.path.with_suffix(".tmp")
+        np.column_stack([keys, values]).astype(np.uint64).tofile(tmp_path)
+        tmp_path.replace(self.path)
+        self.keys, self.values = keys, values
+        self.recent_keys = self.recent_values = np.zeros(0, dtype=np.uint64)
+        self.n_logged = len(keys)
+
+
+# ====================
+# SCORING
+# ====================
+
+class IncrementalScorer:
+    """Validation, feature prep and scoring of a delta with models loaded once."""
+
+    def __init__(self, models_store: Dict, store: PredictionStore, news_path: str = None,
+                 compiled_max_rows: int = COMPILED_MAX_ROWS):
+        self.models_store = models_store
+        self.store = store
+        first = next(iter(models_store.values()))
+        self.feature_cols = list(next(iter(first.values()))["X_train"].columns)
+        self.articles = None
+        if news_path:
+            from news_features import load_articles
+            self.articles = load_articles(news_path)
+        self.compiled_max_rows = compiled_max_rows
+        self.compiled = None
+        if compiled_max_rows:
+            from inference_engine import compile_models_store
+            self.compiled = compile_models_store(models_store)
+
+    def prepare(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Same checks and news join load_dataset applies, on the delta only."""
+        schema = build_panel_schema(FEATURE_COLS, TARGET_COL)
+        if TARGET_COL not in rows.columns:
+            schema = [spec for spec in schema if spec.name != TARGET_COL]
+        report = validate_panel(rows, schema)
+        report.raise_if_errors()
+
+        # Like df_model in training: rows with missing ratios are not scored
+        rows = rows.dropna(subset=FEATURE_COLS).astype({"symbol": str, "period": str})
+        if self.articles is not None:
+            from news_features import add_news_features
+            rows, _ = add_news_features(rows, self.articles)
+        if "time" not in rows.columns:
+            rows["time"] = rows["calendar_year"].astype(str) + rows["period"]
+        return rows
+
+    def score(self, rows: pd.DataFrame, run_id: str) -> int:
+        """Score rows with every (model, horizon) and append them to the store; returns parts written."""
+        X = rows[self.feature_cols]
+        compiled = self.compiled if self.compiled is not None and len(X) <= self.compiled_max_rows else None
+        parts = 0
+        for model_name, horizons in self.models_store.items():
+            key = EXPORT_KEY[model_name]
+            for horizon, entry in horizons.items():
+                model = compiled[model_name][horizon] if compiled is not None else entry["model"]
+                proba = get_probabilities(model, X, key)
+                if entry.get("calibrator") is not None:
+                    proba = entry["calibrator"].transform(proba)
+                frame = prediction_frame(proba, None, rows, horizon, entry["threshold"], key)
+                self.store.append(frame, key, horizon, run_id)
+                parts += 1
+        return parts
+
+
+# ====================
+# SOURCES
+# ====================
+
+def _read_csv_bytes(header: bytes, body: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(header + body))
+
+
+class SourceTracker:
+    """Byte offset into the source CSV plus a fingerprint of the bytes before it."""
+
+    def __init__(self, source: str, state_path: str):
+        self.source = Path(source)
+        self.state_path = Path(state_path)
+        self.state = {}
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text())
+            if self.state.get("source") != str(self.source.resolve()):
+                self.state = {}
+
+    def _boundary(self, f, offset: int) -> str:
+        f.seek(max(0, offset - BOUNDARY_BYTES))
+        return hashlib.sha256(f.read(min(offset, BOUNDARY_BYTES))).hexdigest()
+
+    def changed(self) -> bool:
+        st = self.source.stat()
+        return (st.st_size, st.st_mtime_ns) != (self.state.get("size"), self.state.get("mtime_ns"))
+
+    def read_new(self) -> Tuple[pd.DataFrame, str, float]:
+        """(rows to check, "tail" | "rescan", file mtime) since the last call."""
+        st = self.source.stat()
+        with open(self.source, "rb") as f:
+            offset = self.state.get("offset", 0)
+            tail = (0 < offset <= st.st_size and self.state.get("boundary") == self._boundary(f, offset))
+            if not tail:
+                f.seek(0)
+                header = f.readline()
+                offset = f.tell()
+            else:
+                header = self.state["header"].encode()
+            f.seek(offset)
+            body = f.read()
+
+        # Only complete lines; a partially written last line is picked up next time
+        complete = body.rfind(b"\n") + 1
+        body = body[:complete]
+        new_offset = offset + complete
+        with open(self.source, "rb") as f:
+            boundary = self._boundary(f, new_offset)
+
+        rows = _read_csv_bytes(header, body) if body.strip() else pd.DataFrame()
+        self.state = {
+            "source": str(self.source.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "offset": new_offset, "boundary": boundary, "header": header.decode(),
+        }
+        return rows, "tail" if tail else "rescan", st.st_mtime_ns / 1e9
+
+    def save(self):
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state))
+        tmp_path.replace(self.state_path)
+
+
+# ====================
+# WATCHER
+# ====================
+
+class Watcher:
+    """Polls the sources, scores the delta, records what was seen."""
+
+    def __init__(self, scorer: IncrementalScorer, state_dir: str, source: str = None,
+                 drop_dir: str = None, backfill: bool = False):
+        self.scorer = scorer
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.index = RowHashIndex(self.state_dir / HASH_LOG_NAME)
+        self.value_cols = [c for c in FEATURE_COLS if c in scorer.feature_cols]
+        self.tracker = SourceTracker(source, self.state_dir / SOURCE_STATE_NAME) if source else None
+        self.drop_dir = Path(drop_dir) if drop_dir else None
+        if self.drop_dir is not None:
+            for sub in ("processed", "failed"):
+                (self.drop_dir / sub).mkdir(parents=True, exist_ok=True)
+        # Without state, the current source panel is the baseline (already scored by training)
+        self.baseline = self.tracker is not None and not backfill and len(self.index) == 0
+
+    def process(self, rows: pd.DataFrame, origin: str, landed_at: float, score: bool = True) -> Dict:
+        """Score the new / changed rows of one landing; returns its event record."""
+        start = time.perf_counter()
+        event = {"origin": origin, "rows": len(rows), "scored": 0}
+        if rows.empty:
+            return event
+
+        keys, values = row_hashes(rows, self.value_cols)
+        mask = self.index.changed(keys, values)
+        # Last version of a key within the landing wins
+        _, last = np.unique(keys[::-1], return_index=True)
+        latest = np.zeros(len(keys), dtype=bool)
+        latest[len(keys) - 1 - last] = True
+        mask &= latest
+        delta = rows[mask].reset_index(drop=True)
+
+        if len(delta) and score:
+            try:
+                prepared = self.scorer.prepare(delta)
+                event["run_id"] = new_run_id(incremental=True)
+                event["parts"] = self.scorer.score(prepared, event["run_id"])
+                event["scored"] = len(prepared)
+            except Exception as e:
+                event["error"] = str(e).splitlines()[0]
+
+        # Rows that failed validation or scoring are recorded too: they are retried once they change
+        self.index.record(keys[mask], values[mask])
+        event["seconds"] = time.perf_counter() - start
+        event["latency"] = time.time() - landed_at
+        return event
+
+    def quarantine(self, rows: pd.DataFrame) -> Path:
+        """Keep a source chunk that could not be processed under <state-dir>/failed/."""
+        path = self.state_dir / "failed" / f"{self.tracker.source.stem}-{time.strftime('%Y%m%dT%H%M%S')}.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows.to_csv(path, index=False)
+        return path
+
+    def poll(self) -> List[Dict]:
+        events = []
+        if self.tracker is not None and self.tracker.changed():
+            rows, mode, landed_at = self.tracker.read_new()
+            origin = f"{self.tracker.source.name} ({mode})"
+            try:
+                event = self.process(rows, origin, landed_at, not self.baseline)
+            except Exception as e:
+                # Move past the chunk either way, or every restart fails on it again
+                event = {"origin": origin, "rows": len(rows), "scored": 0, "error": str(e).splitlines()[0]}
+                event["quarantined"] = str(self.quarantine(rows))
+            self.tracker.save()
+            if self.baseline:
+                print(f"  Baseline: {len(self.index):,} rows recorded without scoring (use --backfill to score them)")
+                self.baseline = False
+            events.append(event)
+
+        if self.drop_dir is not None:
+            for path in sorted(p for p in self.drop_dir.glob("*.csv") if p.is_file()):
+                landed_at = path.stat().st_mtime
+                try:
+                    event = self.process(pd.read_csv(path), path.name, landed_at)
+                except Exception as e:
+                    event = {"origin": path.name, "rows": 0, "scored": 0, "error": str(e).splitlines()[0]}
+                target = "failed" if "error" in event else "processed"
+                path.replace(self.drop_dir / target / path.name)
+                events.append(event)
+        return events
+
+
+def print_event(event: Dict):
+    if "error" in event:
+        kept = f" (kept in {event['quarantined']})" if "quarantined" in event else ""
+        print(f"  ✗ {event['origin']}: {event['error']}{kept}")
+    elif event["scored"]:
+        print(f"  ✓ {event['origin']}: {event['scored']}/{event['rows']} rows scored in "
+              f"{event['seconds']:.2f}s ({event['parts']} parts, run_id={event['run_id']}, "
+              f"{event['latency']:.2f}s after landing)")
+    else:
+        print(f"  · {event['origin']}: {event['rows']} rows, nothing new")
+
+
+def acquire_lock(state_dir: Path):
+    """Exclusive lock on the state directory (released by the OS if the process dies)."""
+    fd = open(state_dir / LOCK_NAME, "a+")
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        fd.close()
+        return None
+    fd.seek(0)
+    fd.truncate()
+    fd.write(str(os.getpid()))
+    fd.flush()
+    return fd
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score new or changed bank-quarter rows as they land",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python incremental_scoring.py --source ./data/processed/financial_report_bank_zscore_clean.csv
+  python incremental_scoring.py --drop-dir ./data/incoming --interval 0.5
+  python incremental_scoring.py --source panel.csv --once --backfill
+        """
+    )
+    parser.add_argument("--source", type=str, default=None, help="Source CSV to watch for appended / changed rows")
+    parser.add_argument("--drop-dir", type=str, default=None, help="Directory of filing CSVs to score as they arrive")
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store from train_all_models.py / run_pipeline.py"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default="./output/prediction_store",
+        help="Parquet prediction store to append to"
+    )
+    parser.add_argument("--news", type=str, default=None, help="Article store the models' news features came from")
+    parser.add_argument("--state-dir", type=str, default=STATE_DIR, help="Row-hash log and source offset")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--once", action="store_true", help="Poll once and exit")
+    parser.add_argument("--backfill", action="store_true", help="On first start, score the current rows too")
+    parser.add_argument(
+        "--compiled-max-rows",
+        type=int,
+        default=COMPILED_MAX_ROWS,
+        help="Largest delta scored with the compiled forests (0 = always native predict)"
+    )
+
+    args = parser.parse_args()
+
+    if not args.source and not args.drop_dir:
+        parser.error("give --source and/or --drop-dir")
+    if not Path(args.models).exists():
+        print(f"Error: Models file not found: {args.models}")
+        return
+
+    state_dir = Path(args.state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    lock = acquire_lock(state_dir)
+    if lock is None:
+        print(f"Another watcher holds {state_dir / LOCK_NAME}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    with open(args.models, "rb") as f:
+        models_store = pickle.load(f)
+    scorer = IncrementalScorer(models_store, PredictionStore(args.prediction_store), args.news,
+                               args.compiled_max_rows)
+    watcher = Watcher(scorer, args.state_dir, args.source, args.drop_dir, args.backfill)
+
+    print("=" * 70)
+    print("INCREMENTAL SCORING")
+    print("=" * 70)
+    print(f"Watching: {', '.join(str(p) for p in [args.source, args.drop_dir] if p)}")
+    print(f"Models: {args.models} ({sum(len(h) for h in models_store.values())} loaded in "
+          f"{time.perf_counter() - start:.2f}s)")
+    print(f"Store: {args.prediction_store} | state: {args.state_dir} ({len(watcher.index):,} rows known)")
+
+    try:
+        while True:
+            for event in watcher.poll():
+                print_event(event)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        lock.close()
+
+
+if __name__ == "__main__":
+    main()
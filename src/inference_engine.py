@@ -0,0 +1,447 @@
+"""
+Compiled tree-ensemble inference engine for low-latency scoring.
+
+Converts trained NGBoost, Random Forest, XGBoost and LightGBM models into one
+flat array-based tree representation (feature, threshold, left/right child,
+leaf value per node) and scores them with a single vectorized NumPy traversal.
+
+Usage:
+  python inference_engine.py --models ./output/models_all_horizons.pkl
+  python inference_engine.py --models ./output/models_all_horizons.pkl --batch-sizes 1,8,64
+"""
+
+import json
+import time
+import argparse
+import pickle
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# Upper bound on (rows x trees) node indices held in memory per traversal chunk
+MAX_CHUNK_CELLS = 1 << 22
+
+
+class FlatForest:
+    """Tree ensemble stored as flat node arrays.
+
+    Leaves point to themselves, so every tree can be walked for the same
+    number of steps (the ensemble depth) without per-tree masking. Inputs are
+    cast to ``dtype`` before comparison, matching each library's precision.
+    The score is ``link(base_margin + leaf_values @ tree_weights)``.
+    """
+
+    compiled = True
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 tree_weights, base_margin: float = 0.0, link: str = "identity",
+                 strict: bool = False, dtype=np.float32, n_features: int = None,
+                 model_type: str = None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.tree_weights = np.asarray(tree_weights, dtype=np.float64)
+        self.base_margin = float(base_margin)
+        self.link = link
+        self.strict = strict
+        self.dtype = dtype
+        self.n_features = n_features
+        self.model_type = model_type
+        self.depth = _max_depth(self.left, self.right, self.roots)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def leaf_indices(self, X) -> np.ndarray:
+        """Return the leaf node reached in every tree, shape (n_rows, n_trees)."""
+        X = np.ascontiguousarray(np.asarray(X, dtype=self.dtype))
+        n = X.shape[0]
+        idx = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        rows = np.arange(n)[:, None]
+
+        for _ in range(self.depth):
+            x = X[rows, self.feature[idx]]
+            thr = self.threshold[idx]
+            go_left = (x < thr) if self.strict else (x <= thr)
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[idx], go_left)
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+
+        return idx
+
+    def predict_margin(self, X) -> np.ndarray:
+        """Raw ensemble score before the link function."""
+        X = np.asarray(X)
+        chunk = max(1, MAX_CHUNK_CELLS // max(self.n_trees, 1))
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk):
+            leaves = self.value[self.leaf_indices(X[start:start + chunk])]
+            out[start:start + chunk] = self.base_margin + leaves @ self.tree_weights
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        """Probability of the positive class."""
+        margin = self.predict_margin(X)
+        if self.link == "sigmoid":
+            return 1.0 / (1.0 + np.exp(-margin))
+        return margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Two-column probabilities, matching the sklearn/NGBoost interface."""
+        p = self.predict(X)
+        return np.column_stack([1.0 - p, p])
+
+
+def _max_depth(left: np.ndarray, right: np.ndarray, roots: np.ndarray) -> int:
+    """Longest root-to-leaf path across all trees."""
+    depth = 0
+    frontier = roots.copy()
+    while True:
+        is_leaf = left[frontier] == frontier
+        frontier = frontier[~is_leaf]
+        if len(frontier) == 0:
+            return depth
+        frontier = np.concatenate([left[frontier], right[frontier]])
+        depth += 1
+
+
+class _NodeBuffer:
+    """Accumulates nodes from many trees into shared flat arrays."""
+
+    def __init__(self):
+        self.feature, self.threshold = [], []
+        self.left, self.right = [], []
+        self.value, self.default_left = [], []
+        self.roots = []
+
+    def add_sklearn_tree(self, tree, leaf_value: np.ndarray, col_map: np.ndarray = None):
+        """Append a fitted sklearn ``tree_`` with precomputed per-node leaf values."""
+        offset = len(self.feature)
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count)
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        if col_map is not None:
+            feature = np.asarray(col_map)[feature]
+
+        missing_left = getattr(tree, "missing_go_to_left", None)
+        if missing_left is None:
+            missing_left = np.zeros(tree.node_count, dtype=bool)
+
+        self.roots.append(offset)
+        self.feature.extend(feature.tolist())
+        self.threshold.extend(np.where(is_leaf, np.inf, tree.threshold).tolist())
+        self.left.extend((np.where(is_leaf, node_ids, tree.children_left) + offset).tolist())
+        self.right.extend((np.where(is_leaf, node_ids, tree.children_right) + offset).tolist())
+        self.value.extend(np.where(is_leaf, leaf_value, 0.0).tolist())
+        self.default_left.extend(np.asarray(missing_left, dtype=bool).tolist())
+
+    def add_nested_tree(self, root: Dict, parse_node):
+        """Append a tree given as nested dicts.
+
+        ``parse_node(node)`` returns ``(None, leaf_value)`` for a leaf or
+        ``(feature, threshold, default_left, left_child, right_child)``.
+        """
+        self.roots.append(len(self.feature))
+        stack = [(root, None, None)]
+        while stack:
+            node, parent, side = stack.pop()
+            node_id = len(self.feature)
+            if parent is not None:
+                (self.left if side == "left" else self.right)[parent] = node_id
+
+            split = parse_node(node)
+            if split[0] is None:
+                self.feature.append(0)
+                self.threshold.append(np.inf)
+                self.left.append(node_id)
+                self.right.append(node_id)
+                self.value.append(split[1])
+                self.default_left.append(True)
+                continue
+
+            feature, threshold, default_left, left_child, right_child = split
+            self.feature.append(feature)
+            self.threshold.append(threshold)
+            self.left.append(-1)
+            self.right.append(-1)
+            self.value.append(0.0)
+            self.default_left.append(default_left)
+            stack.append((right_child, node_id, "right"))
+            stack.append((left_child, node_id, "left"))
+
+    def build(self, **kwargs) -> FlatForest:
+        return FlatForest(
+            self.feature, self.threshold, self.left, self.right,
+            self.value, self.default_left, self.roots, **kwargs
+        )
+
+
+# ====================
+# CONVERTERS
+# ====================
+
+def compile_random_forest(rf) -> FlatForest:
+    """Random Forest: average of per-tree class-1 leaf fractions."""
+    buf = _NodeBuffer()
+    for est in rf.estimators_:
+        tree = est.tree_
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        leaf_value = np.divide(counts[:, 1], totals, out=np.zeros_like(totals), where=totals > 0)
+        buf.add_sklearn_tree(tree, leaf_value)
+
+    n_trees = len(rf.estimators_)
+    return buf.build(
+        tree_weights=np.full(n_trees, 1.0 / n_trees),
+        n_features=rf.n_features_in_, model_type="rf"
+    )
+
+
+def compile_ngboost(ngb) -> FlatForest:
+    """NGBoost Bernoulli: logit = init - lr * sum(scaling * tree), then sigmoid."""
+    if ngb.Manifold.n_params != 1:
+        raise ValueError("Only single-parameter (Bernoulli) NGBoost models are supported")
+
+    buf = _NodeBuffer()
+    weights = []
+    for models, scaling, col_idx in zip(ngb.base_models, ngb.scalings, ngb.col_idxs):
+        tree = models[0].tree_
+        buf.add_sklearn_tree(tree, tree.value[:, 0, 0], col_map=col_idx)
+        weights.append(-ngb.learning_rate * scaling)
+
+    return buf.build(
+        tree_weights=weights,
+        base_margin=float(np.ravel(ngb.init_params)[0]),
+        link="sigmoid",
+        n_features=ngb.n_features, model_type="ngboost"
+    )
+
+
+def _xgb_base_margin(booster) -> float:
+    """Logit of the booster's base_score (stored in probability space)."""
+    config = json.loads(booster.save_config())
+    raw = str(config["learner"]["learner_model_param"]["base_score"])
+    base_score = float(raw.strip("[]"))
+    return float(np.log(base_score / (1.0 - base_score)))
+
+
+def compile_xgboost(booster) -> FlatForest:
+    """XGBoost binary:logistic booster (all trees, as ``Booster.predict``)."""
+    feature_names = booster.feature_names or []
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+
+    def feature_id(split):
+        if split in feature_index:
+            return feature_index[split]
+        return int(split.lstrip("f"))
+
+    def parse_node(node):
+        if "leaf" in node:
+            return (None, node["leaf"])
+        children = {child["nodeid"]: child for child in node["children"]}
+        return (
+            feature_id(node["split"]),
+            # XGBoost splits on float32 values
+            float(np.float32(node["split_condition"])),
+            node["missing"] == node["yes"],
+            children[node["yes"]],
+            children[node["no"]],
+        )
+
+    buf = _NodeBuffer()
+    for tree_json in booster.get_dump(dump_format="json"):
+        buf.add_nested_tree(json.loads(tree_json), parse_node)
+
+    return buf.build(
+        tree_weights=np.ones(len(buf.roots)),
+        base_margin=_xgb_base_margin(booster),
+        link="sigmoid", strict=True,
+        n_features=booster.num_features(), model_type="xgb"
+    )
+
+
+def compile_lightgbm(booster) -> FlatForest:
+    """LightGBM binary booster (best iteration, as ``Booster.predict``)."""
+    dump = booster.dump_model()
+    if "sigmoid:1" not in dump.get("objective", "binary sigmoid:1"):
+        raise ValueError(f"Unsupported LightGBM objective: {dump['objective']}")
+
+    def parse_node(node):
+        if "leaf_value" in node:
+            return (None, node["leaf_value"])
+        if node["decision_type"] != "<=":
+            raise ValueError("Categorical LightGBM splits are not supported")
+        threshold = node["threshold"]
+        # Without a missing type LightGBM scores NaN as 0.0
+        if node.get("missing_type") == "None":
+            default_left = 0.0 <= threshold
+        else:
+            default_left = node["default_left"]
+        return (
+            node["split_feature"], threshold, default_left,
+            node["left_child"], node["right_child"],
+        )
+
+    buf = _NodeBuffer()
+    for tree in dump["tree_info"]:
+        buf.add_nested_tree(tree["tree_structure"], parse_node)
+
+    return buf.build(
+        tree_weights=np.ones(len(buf.roots)),
+        link="sigmoid", dtype=np.float64,
+        n_features=dump["max_feature_idx"] + 1, model_type="lgbm"
+    )
+
+
+def compile_model(model, model_type: str) -> FlatForest:
+    """Convert a trained model into a FlatForest."""
+    if model_type in ["xgb", "xgboost"]:
+        return compile_xgboost(model)
+    elif model_type == "lgbm":
+        return compile_lightgbm(model)
+    elif model_type == "rf":
+        return compile_random_forest(model)
+    elif model_type == "ngboost":
+        return compile_ngboost(model)
+    else:
+        raise ValueError(f"Unknown model_type: {model_type}")
+
+
+# Kept native by compile_models_store: LightGBM's own predict beats the flat
+# traversal (0.12-0.19x for the compiled forest at 1-5,000 rows, 300 trees)
+NATIVE_MODELS = {"lgbm"}
+
+
+def compile_models_store(models_store: Dict) -> Dict:
+    """Compile a ``models_all_horizons.pkl`` store, keeping its layout.
+
+    Models in NATIVE_MODELS stay as trained; get_probabilities scores them natively.
+    """
+    compiled = {}
+    for model_name, models_dict in models_store.items():
+        compiled[model_name] = {
+            horizon: entry["model"] if model_name in NATIVE_MODELS else compile_model(entry["model"], model_name)
+            for horizon, entry in models_dict.items()
+        }
+    return compiled
+
+
+# ====================
+# VERIFICATION & BENCHMARK
+# ====================
+
+def _time_per_row(fn, X, repeats: int) -> float:
+    """Median seconds per row over several repeats."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) / len(X)
+
+
+def benchmark_models_store(models_store: Dict, X: pd.DataFrame, batch_sizes: List[int],
+                           repeats: int = 20) -> pd.DataFrame:
+    """Compare compiled vs native probabilities and per-row latency."""
+    from training_utils import get_probabilities
+
+    rows = []
+    for model_name, models_dict in models_store.items():
+        for horizon, entry in models_dict.items():
+            model = entry["model"]
+            forest = compile_model(model, model_name)
+            max_abs_diff = float(np.max(np.abs(
+                forest.predict(X.values) - get_probabilities(model, X, model_name)
+            )))
+
+            for batch_size in batch_sizes:
+                X_batch = X.iloc[:batch_size]
+                native = _time_per_row(lambda b: get_probabilities(model, b, model_name), X_batch, repeats)
+                flat = _time_per_row(lambda b: forest.predict(b.values), X_batch, repeats)
+                rows.append({
+                    "model": model_name,
+                    "horizon": horizon,
+                    "n_trees": forest.n_trees,
+                    "depth": forest.depth,
+                    "batch_size": len(X_batch),
+                    "max_abs_diff": max_abs_diff,
+                    "native_us_per_row": native * 1e6,
+                    "compiled_us_per_row": flat * 1e6,
+                    "speedup": native / flat if flat > 0 else np.nan,
+                })
+
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verify and benchmark compiled tree-ensemble scoring",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python inference_engine.py --models ./output/models_all_horizons.pkl
+  python inference_engine.py --models ./output/models_all_horizons.pkl --batch-sizes 1,8,64
+        """
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store from train_all_models.py / run_pipeline.py"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV (scored rows)"
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=str,
+        default="1,16,256",
+        help="Batch sizes to time (comma-separated)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional CSV path for the benchmark table"
+    )
+
+    args = parser.parse_args()
+
+    from training_utils import load_and_prepare_data, FEATURE_COLS
+
+    with open(args.models, "rb") as f:
+        models_store = pickle.load(f)
+
+    _, df_model = load_and_prepare_data(args.data)
+    X = df_model[FEATURE_COLS]
+    batch_sizes = [int(b.strip()) for b in args.batch_sizes.split(",")]
+
+    results = benchmark_models_store(models_store, X, batch_sizes)
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(results.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        results.to_csv(args.output, index=False)
+        print(f"\nBenchmark saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+News-derived features per (symbol, calendar_year, period).
+
+Turns the scraped article store (scraper/article_store.py, or a CSV export of
+the sheet) into quarterly features joined onto the training panel:
+
+  - news_articles / news_negative: stories published in the quarter
+    (syndicated copies sharing a near-dup cluster_id count once)
+  - news_neg_<category>: negative stories by keyword category
+  - news_neg_decay / news_articles_decay: exponentially decayed counts over all
+    quarters up to and including this one (half-life NEWS_HALF_LIFE_QUARTERS)
+
+Everything is a group-by plus one pass over a dense (symbol x quarter) grid;
+the result is cached with the panel by dataset_cache.py.
+
+Usage:
+  python news_features.py --news ./scheduler_state/articles.sqlite
+  python news_features.py --news sheet_export.csv --output ./output/news_features.csv
+"""
+
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+NEWS_HALF_LIFE_QUARTERS = 2.0
+
+# Negative keywords (config.DEFAULT_NEGATIVE_KEYWORDS) by distress channel;
+# keywords added through APP_NEGATIVE_KEYWORDS fall into "other"
+NEWS_KEYWORD_CATEGORIES = {
+    "credit": ["gagal bayar", "kredit macet", "non performing loan", "npl"],
+    "liquidity": ["likuiditas"],
+    "earnings": ["kerugian", "rugi", "penurunan laba"],
+    "insolvency": ["bangkrut", "pailit"],
+    "fraud": ["fraud", "penipuan", "korupsi", "skandal", "pidana", "tersangka", "ditahan", "penyidikan"],
+    "regulatory": ["denda", "sanksi", "dibekukan", "pencabutan izin", "penutupan", "tutup", "dihentikan"],
+    "crisis": ["krisis", "guncangan", "gagal", "masalah"],
+}
+NEWS_CATEGORIES = list(NEWS_KEYWORD_CATEGORIES) + ["other"]
+
+NEWS_FEATURE_COLS = (
+    ["news_articles", "news_negative"]
+    + [f"news_neg_{c}" for c in NEWS_CATEGORIES]
+    + ["news_articles_decay", "news_neg_decay"]
+)
+
+KEY_COLS = ["symbol", "calendar_year", "period"]
+PERIODS = np.array(["Q1", "Q2", "Q3", "Q4"])
+
+
+# ====================
+# LOADING
+# ====================
+
+def load_articles(path: str) -> pd.DataFrame:
+    """Articles from an article store (.sqlite/.db) or a CSV export of the sheet."""
+    path = Path(path)
+    if path.suffix in (".sqlite", ".db"):
+        with sqlite3.connect(path) as conn:
+            return pd.read_sql("SELECT * FROM articles", conn)
+    return pd.read_csv(path)
+
+
+def _clean_articles(articles: pd.DataFrame) -> pd.DataFrame:
+    """One row per story with symbol, quarter index, negative flag and category."""
+    df = articles.copy()
+    published = pd.to_datetime(df["published_at"], errors="coerce")
+    df["q"] = published.dt.year * 4 + (published.dt.quarter - 1)
+    df["symbol"] = df["symbol"].astype("string").str.strip().str.upper()
+    df = df[df["q"].notna() & df["symbol"].notna() & (df["symbol"] != "")].copy()
+    df["q"] = df["q"].astype(np.int64)
+
+    neg = df["is_negative"] if "is_negative" in df.columns else pd.Series(False, index=df.index)
+    df["is_negative"] = neg.astype(str).str.strip().str.upper().isin(["TRUE", "1", "1.0"])
+
+    # Syndicated copies of one story count once per bank
+    story = df["cluster_id"] if "cluster_id" in df.columns else pd.Series(np.nan, index=df.index)
+    df["story"] = story.astype("string").fillna("link:" + df["link"].astype("string"))
+    df = (
+        df.sort_values(["published_at", "is_negative"], ascending=[True, False])
+        .drop_duplicates(["symbol", "story"])
+    )
+
+    keyword_to_category = {kw: cat for cat, kws in NEWS_KEYWORD_CATEGORIES.items() for kw in kws}
+    keyword = df["neg_keyword"].astype("string").str.strip().str.lower() if "neg_keyword" in df.columns \
+        else pd.Series(pd.NA, index=df.index, dtype="string")
+    df["category"] = keyword.map(keyword_to_category).fillna("other").where(df["is_negative"])
+    return df[["symbol", "q", "is_negative", "category"]]
+
+
+# ====================
+# AGGREGATION
+# ====================
+
+def build_news_features(articles: pd.DataFrame, last_quarter: Tuple[int, str] = None,
+                        half_life: float = NEWS_HALF_LIFE_QUARTERS) -> pd.DataFrame:
+    """Quarterly news features for every symbol from its first article up to last_quarter.
+
+    last_quarter=(year, period) extends the decayed scores past the last article
+    (e.g. to the end of the panel); default is the latest article quarter.
+    """
+    df = _clean_articles(articles)
+    if last_quarter is not None and not df.empty:
+        # Articles after the panel (the live store runs ahead of it) have no row to join
+        q_max = int(last_quarter[0]) * 4 + int(str(last_quarter[1])[-1]) - 1
+        df = df[df["q"] <= q_max]
+    if df.empty:
+        empty = pd.DataFrame({"symbol": pd.Series(dtype=object), "calendar_year": pd.Series(dtype=np.int64),
+                              "period": pd.Series(dtype=object)})
+        empty[NEWS_FEATURE_COLS] = np.zeros((0, len(NEWS_FEATURE_COLS)))
+        return empty
+    if last_quarter is None:
+        q_max = int(df["q"].max())
+
+    # Counts per (symbol, quarter): all stories, negative, negative by category
+    onehot = pd.get_dummies(df["category"]).reindex(columns=NEWS_CATEGORIES, fill_value=False)
+    counts = pd.concat([
+        pd.Series(1, index=df.index, name="news_articles"),
+        df["is_negative"].rename("news_negative"),
+        onehot.add_prefix("news_neg_"),
+    ], axis=1).astype(np.int64)
+    counts = counts.groupby([df["symbol"], df["q"]]).sum()
+
+    # Dense grid: every symbol x every quarter from its first article to the end
+    q_min = int(df["q"].min())
+    symbols = counts.index.get_level_values("symbol").unique().sort_values()
+    n_q = q_max - q_min + 1
+
+    sym_idx = symbols.get_indexer(counts.index.get_level_values("symbol"))
+    q_idx = counts.index.get_level_values("q").to_numpy() - q_min
+    grid = np.zeros((len(NEWS_FEATURE_COLS) - 2, len(symbols), n_q), dtype=np.float64)
+    grid[:, sym_idx, q_idx] = counts.to_numpy().T
+
+    # Exponential decay: S_t = d * S_{t-1} + c_t, vectorized across symbols
+    d = 0.5 ** (1.0 / half_life)
+    decay = np.zeros((2, len(symbols), n_q), dtype=np.float64)
+    running = np.zeros((2, len(symbols)), dtype=np.float64)
+    for t in range(n_q):
+        running = running * d + grid[:2, :, t]
+        decay[:, :, t] = running
+
+    # Keep cells from each symbol's first article onward
+    first_q = df.groupby("symbol")["q"].min().reindex(symbols).to_numpy() - q_min
+    s_idx, t_idx = np.nonzero(np.arange(n_q)[None, :] >= first_q[:, None])
+    q_abs = t_idx + q_min
+
+    features = pd.DataFrame({
+        "symbol": symbols.to_numpy()[s_idx].astype(object),
+        "calendar_year": q_abs // 4,
+        "period": PERIODS[q_abs % 4],
+    })
+    values = np.concatenate([grid[:, s_idx, t_idx], decay[:, s_idx, t_idx]]).T
+    features[NEWS_FEATURE_COLS] = values
+    return features
+
+
+def add_news_features(df_h: pd.DataFrame, articles: pd.DataFrame,
+                      half_life: float = NEWS_HALF_LIFE_QUARTERS) -> Tuple[pd.DataFrame, List[str]]:
+    """Left-join news features onto the panel (no news = 0). Returns (df_h, news feature cols)."""
+    last = df_h.sort_values(["calendar_year", "period"]).iloc[-1]
+    features = build_news_features(articles, (last["calendar_year"], last["period"]), half_life)
+
+    keys = df_h[KEY_COLS].astype({"symbol": str, "period": str})
+    features = features.astype({"calendar_year": keys["calendar_year"].dtype})
+    joined = keys.merge(features, on=KEY_COLS, how="left")
+    out = df_h.copy()
+    out[NEWS_FEATURE_COLS] = joined[NEWS_FEATURE_COLS].fillna(0.0).to_numpy()
+    return out, list(NEWS_FEATURE_COLS)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Quarterly news features per bank from the scraped article store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python news_features.py --news ./scheduler_state/articles.sqlite
+  python news_features.py --news sheet_export.csv --output ./output/news_features.csv
+        """
+    )
+    parser.add_argument("--news", type=str, required=True, help="Article store (.sqlite) or sheet CSV export")
+    parser.add_argument("--output", type=str, default=None, help="Write the feature table to this CSV")
+    parser.add_argument(
+        "--half-life",
+        type=float,
+        default=NEWS_HALF_LIFE_QUARTERS,
+        help="Half-life of the decayed scores, in quarters"
+    )
+
+    args = parser.parse_args()
+
+    articles = load_articles(args.news)
+    features = build_news_features(articles, half_life=args.half_life)
+    print(f"{len(articles):,} articles -> {len(features):,} (symbol, quarter) rows, "
+          f"{features['symbol'].nunique() if len(features) else 0} symbols")
+    if len(features):
+        print(features[NEWS_FEATURE_COLS].describe().T[["mean", "max"]].to_string())
+    if args.output:
+        features.to_csv(args.output, index=False)
+        print(f"Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,626 @@
+"""
+Out-of-core training path for panels larger than RAM.
+
+1. ingest: stream the cleaned CSV in chunks and route rows to partition files
+   by symbol hash, so every bank's history lands in one partition. Each
+   partition then fits in memory and goes through the same
+   prepare_horizon_panel / CompactPanel steps as the in-memory path, and its
+   arrays are appended to flat binary files opened later as np.memmap:
+
+     <work_dir>/features.bin  float32 (n_rows x n_features)
+     <work_dir>/labels.bin    int8    (n_rows x 5), valid.bin uint8 bitmask
+     <work_dir>/calendar_year.bin, period.bin, symbol.bin, symbols.txt
+     <work_dir>/manifest.json
+
+2. train: XGBoost from an external-memory ExtMemQuantileDMatrix fed by a
+   DataIter over fixed-size row chunks (xgboost < 3.0, e.g. on the Python 3.8
+   ML image: an in-memory QuantileDMatrix built from the same chunks, holding
+   only the quantized bins), LightGBM from a file-backed Dataset
+   (two_round loading), RF / NGBoost from an exact stratified subsample.
+
+Peak memory depends on chunk / partition / subsample sizes, not on row count
+(``stress`` measures it in fresh subprocesses).
+
+Usage:
+  python out_of_core.py ingest --data ./data/big_panel.csv --work-dir ./output/ooc
+  python out_of_core.py train --work-dir ./output/ooc --output ./output/ooc_models
+  python out_of_core.py stress --rows 400000,800000,1600000
+"""
+
+import sys
+import json
+import math
+import time
+import pickle
+import shutil
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+import lightgbm as lgb
+
+from training_utils import (
+    FEATURE_COLS,
+    TARGET_COL,
+    TRAIN_END_YEAR,
+    VAL_END_YEAR,
+    RANDOM_STATE,
+    HARDCODED_THRESHOLD,
+    prepare_horizon_panel,
+    train_ngboost,
+    train_random_forest,
+    get_probabilities,
+    export_predictions,
+)
+from panel import CompactPanel, HORIZONS
+from data_validation import build_panel_schema, validate_panel
+
+
+# ====================
+# CONFIGURATION
+# ====================
+
+READ_CHUNK_ROWS = 100_000
+PARTITION_BYTES = 64 * 2**20      # target CSV bytes per symbol-hash partition
+SCAN_CHUNK_ROWS = 262_144         # rows per scan batch (DataIter, scoring)
+SUBSAMPLE_ROWS = 200_000          # RF / NGBoost training rows per split
+
+PERIODS = ["Q1", "Q2", "Q3", "Q4"]
+ARRAY_DTYPES = {
+    "features": np.float32,
+    "labels": np.int8,
+    "valid": np.uint8,
+    "calendar_year": np.int16,
+    "period": np.int8,
+    "symbol": np.int32,
+}
+
+XGB_EXTERNAL_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_bin": 256,
+    "eta": 0.05,
+    "max_depth": 6,
+    "min_child_weight": 3,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "seed": RANDOM_STATE,
+}
+XGB_EXTERNAL_ROUNDS = 1000
+XGB_EXTERNAL_EARLY_STOPPING = 50
+
+
+# ====================
+# INGESTION
+# ====================
+
+def ingest(data_path: str, work_dir: str, partition_bytes: int = PARTITION_BYTES,
+           validate: bool = True) -> Dict:
+    """Stream a cleaned CSV into the memmap panel format. Returns the manifest."""
+    work_dir = Path(work_dir)
+    parts_dir = work_dir / "partitions"
+    if parts_dir.exists():
+        shutil.rmtree(parts_dir)
+    parts_dir.mkdir(parents=True)
+
+    n_parts = max(1, math.ceil(Path(data_path).stat().st_size / partition_bytes))
+    usecols = ["symbol", "calendar_year", "period", "time"] + FEATURE_COLS + [TARGET_COL]
+    start = time.perf_counter()
+
+    # Pass 1: route rows to partitions by symbol hash
+    for chunk in pd.read_csv(data_path, usecols=usecols, chunksize=READ_CHUNK_ROWS):
+        part = pd.util.hash_array(chunk["symbol"].to_numpy(dtype=object)) % n_parts
+        for p, rows in chunk.groupby(part):
+            path = parts_dir / f"part-{p:04d}.csv"
+            rows.to_csv(path, mode="a", header=not path.exists(), index=False)
+
+    # Pass 2: prepare each partition in memory and append its compact arrays
+    schema = build_panel_schema(FEATURE_COLS, TARGET_COL)
+    files = {name: open(work_dir / f"{name}.bin", "wb") for name in ARRAY_DTYPES}
+    symbols = []
+    n_rows = 0
+    n_warnings = 0
+
+    try:
+        for path in sorted(parts_dir.glob("part-*.csv")):
+            df = pd.read_csv(path, dtype={col: np.float32 for col in FEATURE_COLS})
+            if validate:
+                # Partitions hold whole banks, so duplicate-key checks are exact here
+                report = validate_panel(df, schema)
+                report.raise_if_errors()
+                n_warnings += len(report.warnings)
+
+            panel = CompactPanel.from_frame(prepare_horizon_panel(df))
+            path.unlink()
+            if len(panel) == 0:
+                continue
+
+            period_index = np.array([PERIODS.index(p) for p in panel.period.categories], dtype=np.int8)
+            arrays = {
+                "features": panel.features,
+                "labels": panel.labels,
+                "valid": panel.valid,
+                "calendar_year": panel.calendar_year,
+                "period": period_index[panel.period.codes],
+                "symbol": panel.symbol.codes.astype(np.int32) + len(symbols),
+            }
+            for name, arr in arrays.items():
+                np.ascontiguousarray(arr, dtype=ARRAY_DTYPES[name]).tofile(files[name])
+
+            symbols.extend(str(s) for s in panel.symbol.categories)
+            n_rows += len(panel)
+    finally:
+        for f in files.values():
+            f.close()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    (work_dir / "symbols.txt").write_text("\n".join(symbols))
+    manifest = {
+        "source": str(data_path),
+        "n_rows": n_rows,
+        "n_symbols": len(symbols),
+        "n_partitions": n_parts,
+        "feature_cols": FEATURE_COLS,
+        "horizons": HORIZONS,
+        "dtypes": {name: np.dtype(dtype).name for name, dtype in ARRAY_DTYPES.items()},
+        "validation_warnings": n_warnings,
+        "ingest_seconds": round(time.perf_counter() - start, 3),
+    }
+    with open(work_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+# ====================
+# MEMMAP PANEL
+# ====================
+
+class OutOfCorePanel:
+    """Read-only view of an ingested panel, scanned in fixed-size chunks.
+
+    Arrays are exposed as memmaps for random access (e.g. metadata of test rows).
+    """
+
+    def __init__(self, work_dir: str, chunk_rows: int = SCAN_CHUNK_ROWS):
+        self.work_dir = Path(work_dir)
+        with open(self.work_dir / "manifest.json") as f:
+            self.manifest = json.load(f)
+        self.n_rows = self.manifest["n_rows"]
+        if self.n_rows == 0:
+            raise ValueError(f"No rows ingested in {work_dir}")
+        self.feature_cols = self.manifest["feature_cols"]
+        self.chunk_rows = chunk_rows
+
+        shapes = {"features": (self.n_rows, len(self.feature_cols)), "labels": (self.n_rows, len(HORIZONS))}
+        for name, dtype in ARRAY_DTYPES.items():
+            setattr(self, name, np.memmap(self.work_dir / f"{name}.bin", dtype=dtype, mode="r",
+                                          shape=shapes.get(name, (self.n_rows,))))
+        self.symbols = np.array((self.work_dir / "symbols.txt").read_text().split("\n"), dtype=object)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _read(self, name: str, lo: int, hi: int) -> np.ndarray:
+        """Rows lo:hi of one array via a plain file read.
+
+        Sequential scans read instead of slicing the memmap, so scanned pages are
+        not kept mapped into the process and peak RSS stays at one chunk.
+        """
+        dtype = np.dtype(ARRAY_DTYPES[name])
+        width = int(np.prod(getattr(self, name).shape[1:], dtype=np.int64))
+        arr = np.fromfile(self.work_dir / f"{name}.bin", dtype=dtype,
+                          count=(hi - lo) * width, offset=lo * width * dtype.itemsize)
+        return arr.reshape((hi - lo,) + getattr(self, name).shape[1:])
+
+    def _mask(self, lo: int, hi: int, horizon: int, split: str) -> np.ndarray:
+        known = ((self._read("valid", lo, hi) >> (horizon - 1)) & 1).astype(bool)
+        year = self._read("calendar_year", lo, hi).astype(np.int32) + horizon  # label year
+        if split == "train":
+            return known & (year <= TRAIN_END_YEAR)
+        if split == "val":
+            return known & (year > TRAIN_END_YEAR) & (year <= VAL_END_YEAR)
+        return known & (year > VAL_END_YEAR)
+
+    def iter_split(self, horizon: int, split: str):
+        """Yield (row_ids, X float32, y int8) per chunk, skipping empty chunks."""
+        for lo in range(0, self.n_rows, self.chunk_rows):
+            hi = min(lo + self.chunk_rows, self.n_rows)
+            local = np.flatnonzero(self._mask(lo, hi, horizon, split))
+            if len(local):
+                X = self._read("features", lo, hi)[local]
+                y = self._read("labels", lo, hi)[local, horizon - 1]
+                yield lo + local, X, y
+
+    def class_counts(self, horizon: int, split: str) -> np.ndarray:
+        """[n_negative, n_positive] in one split."""
+        counts = np.zeros(2, dtype=np.int64)
+        for _, _, y in self.iter_split(horizon, split):
+            counts += np.bincount(y, minlength=2)[:2]
+        return counts
+
+    def subsample(self, horizon: int, split: str, max_rows: int = SUBSAMPLE_ROWS,
+                  random_state: int = RANDOM_STATE):
+        """Exact-size stratified sample without replacement, in one chunked pass.
+
+        Each class keeps its share of max_rows. Per chunk, the number of rows
+        taken from a class is hypergeometric given the rows still needed and
+        still unseen, which is uniform sampling without ever holding the split.
+        """
+        counts = self.class_counts(horizon, split)
+        total = counts.sum()
+        if total <= max_rows:
+            need = counts.copy()
+        else:
+            need = np.floor(counts * max_rows / total).astype(np.int64)
+        remaining = counts.copy()
+        rng = np.random.default_rng(random_state)
+
+        X_parts, y_parts, row_parts = [], [], []
+        for rows, X, y in self.iter_split(horizon, split):
+            keep = []
+            for c in (0, 1):
+                idx = np.flatnonzero(y == c)
+                if not len(idx) or not need[c]:
+                    remaining[c] -= len(idx)
+                    continue
+                take = rng.hypergeometric(len(idx), remaining[c] - len(idx), need[c])
+                keep.append(rng.choice(idx, size=take, replace=False))
+                need[c] -= take
+                remaining[c] -= len(idx)
+            if keep:
+                keep = np.sort(np.concatenate(keep))
+                X_parts.append(X[keep])
+                y_parts.append(y[keep])
+                row_parts.append(rows[keep])
+
+        rows = np.concatenate(row_parts) if row_parts else np.array([], dtype=np.int64)
+        X = np.concatenate(X_parts) if X_parts else np.empty((0, len(self.feature_cols)), dtype=np.float32)
+        y = np.concatenate(y_parts) if y_parts else np.array([], dtype=np.int8)
+        return (pd.DataFrame(X, columns=self.feature_cols, index=rows),
+                pd.Series(y, index=rows, name=f"distress_{horizon}y"))
+
+    def meta(self, rows: np.ndarray) -> pd.DataFrame:
+        """Export metadata (symbol, calendar_year, period, time) for row ids."""
+        year = np.asarray(self.calendar_year[rows])
+        period = np.array(PERIODS)[self.period[rows]]
+        return pd.DataFrame({
+            "symbol": self.symbols[self.symbol[rows]],
+            "calendar_year": year,
+            "period": period,
+            "time": pd.Series(year).astype(str).values + period,
+        }, index=rows)
+
+
+# ====================
+# TRAINING
+# ====================
+
+# xgboost >= 3.0 (Python >= 3.10); older versions quantize the same batches in memory
+XGB_EXTERNAL_MEMORY = hasattr(xgb, "ExtMemQuantileDMatrix")
+QuantileMatrix = xgb.ExtMemQuantileDMatrix if XGB_EXTERNAL_MEMORY else xgb.QuantileDMatrix
+
+
+class PanelBatchIter(xgb.DataIter):
+    """Feeds one horizon/split of an OutOfCorePanel to XGBoost chunk by chunk."""
+
+    def __init__(self, panel: OutOfCorePanel, horizon: int, split: str, cache_prefix: str):
+        self.panel = panel
+        self.horizon = horizon
+        self.split = split
+        self._batches = None
+        self.reset()
+        # QuantileDMatrix rejects a cache prefix (it keeps no pages on disk)
+        super().__init__(cache_prefix=cache_prefix if XGB_EXTERNAL_MEMORY else None)
+
+    def next(self, input_data) -> bool:
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        _, X, y = batch
+        input_data(data=X, label=y, feature_names=self.panel.feature_cols)
+        return True
+
+    def reset(self):
+        self._batches = self.panel.iter_split(self.horizon, self.split)
+
+
+def train_xgboost_external(panel: OutOfCorePanel, horizon: int, cache_dir: str):
+    """XGBoost on an external-memory quantile DMatrix with validation early stopping."""
+    print(f"  Training XGBoost ({'external memory' if XGB_EXTERNAL_MEMORY else 'quantized in memory'})...")
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    dtrain = QuantileMatrix(
+        PanelBatchIter(panel, horizon, "train", str(cache_dir / f"train_{horizon}y")),
+        max_bin=XGB_EXTERNAL_PARAMS["max_bin"]
+    )
+    dval = QuantileMatrix(
+        PanelBatchIter(panel, horizon, "val", str(cache_dir / f"val_{horizon}y")), ref=dtrain
+    )
+
+    n_neg, n_pos = panel.class_counts(horizon, "train")
+    params = {**XGB_EXTERNAL_PARAMS, "scale_pos_weight": float(n_neg / max(n_pos, 1))}
+    model = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=XGB_EXTERNAL_ROUNDS,
+        evals=[(dval, "val")],
+        early_stopping_rounds=XGB_EXTERNAL_EARLY_STOPPING,
+        verbose_eval=False
+    )
+    print(f"    Best iteration: {model.best_iteration}")
+    return model
+
+
+def write_split_csv(panel: OutOfCorePanel, horizon: int, split: str, path: Path) -> int:
+    """Label-first, headerless CSV of one split (LightGBM's file input format)."""
+    n_rows = 0
+    with open(path, "w") as f:
+        for _, X, y in panel.iter_split(horizon, split):
+            pd.DataFrame(np.column_stack([y.astype(np.float32), X])).to_csv(
+                f, header=False, index=False, float_format="%.9g", na_rep="nan"
+            )
+            n_rows += len(y)
+    return n_rows
+
+
+def train_lightgbm_from_file(panel: OutOfCorePanel, horizon: int, cache_dir: str):
+    """LightGBM from file-backed Datasets, loaded in two rounds to bound memory."""
+    print("  Training LightGBM (file-backed dataset)...")
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    train_path = cache_dir / f"lgbm_train_{horizon}y.csv"
+    val_path = cache_dir / f"lgbm_val_{horizon}y.csv"
+    write_split_csv(panel, horizon, "train", train_path)
+    write_split_csv(panel, horizon, "val", val_path)
+
+    n_neg, n_pos = panel.class_counts(horizon, "train")
+    dataset_params = {"two_round": True, "header": False, "label_column": 0, "verbose": -1}
+    train_data = lgb.Dataset(str(train_path), params=dataset_params, feature_name=panel.feature_cols)
+    val_data = lgb.Dataset(str(val_path), params=dataset_params, reference=train_data)
+
+    # Same configuration as training_utils.train_lightgbm
+    params = {
+        "objective": "binary",
+        "metric": "binary_logloss",
+        "boosting_type": "gbdt",
+        "num_leaves": 31,
+        "learning_rate": 0.05,
+        "scale_pos_weight": float(n_neg / max(n_pos, 1)),
+        "verbose": -1
+    }
+    model = lgb.train(
+        params,
+        train_data,
+        num_boost_round=500,
+        valid_sets=[val_data],
+        callbacks=[lgb.early_stopping(200, verbose=False)]
+    )
+
+    train_path.unlink()
+    val_path.unlink()
+    print(f"    Best iteration: {model.best_iteration}")
+    return model
+
+
+SUBSAMPLE_TRAINERS = {
+    "ngboost": train_ngboost,
+    "rf": train_random_forest,
+}
+
+
+def train_subsampled(panel: OutOfCorePanel, model_name: str, horizon: int, max_rows: int):
+    """RF / NGBoost on stratified train and validation subsamples."""
+    X_train, y_train = panel.subsample(horizon, "train", max_rows)
+    X_val, y_val = panel.subsample(horizon, "val", max_rows)
+    print(f"  Subsample: {len(X_train):,} train / {len(X_val):,} val rows")
+    model, _ = SUBSAMPLE_TRAINERS[model_name](
+        X_train, y_train, X_val, y_val, hardcode_threshold=HARDCODED_THRESHOLD, horizon=horizon
+    )
+    return model
+
+
+def score_split(panel: OutOfCorePanel, model, model_type: str, horizon: int, split: str = "test"):
+    """Chunked scoring. Holds only the split's probabilities, labels and metadata."""
+    proba, labels, row_ids = [], [], []
+    for rows, X, y in panel.iter_split(horizon, split):
+        proba.append(get_probabilities(model, pd.DataFrame(X, columns=panel.feature_cols), model_type))
+        labels.append(y)
+        row_ids.append(rows)
+
+    rows = np.concatenate(row_ids)
+    y = pd.Series(np.concatenate(labels), index=rows, name=f"distress_{horizon}y")
+    return np.concatenate(proba), y, panel.meta(rows)
+
+
+def train_out_of_core(work_dir: str, output_dir: str, models: List[str], horizons: List[int],
+                      max_rows: int = SUBSAMPLE_ROWS) -> Dict:
+    """Train the requested models per horizon from an ingested panel and export test predictions."""
+    panel = OutOfCorePanel(work_dir)
+    output_dir = Path(output_dir)
+    cache_dir = Path(work_dir) / "cache"
+    models_store = {}
+
+    for model_name in models:
+        print("\n" + "=" * 70)
+        print(f"TRAINING {model_name.upper()} (out of core)")
+        print("=" * 70)
+        model_output_dir = output_dir / model_name
+        model_output_dir.mkdir(parents=True, exist_ok=True)
+        export_key = "xgb" if model_name == "xgboost" else model_name
+
+        models_store[model_name] = {}
+        for horizon in horizons:
+            print(f"\nHORIZON {horizon}Y")
+            print("-" * 70)
+            if model_name == "xgboost":
+                model = train_xgboost_external(panel, horizon, str(cache_dir))
+            elif model_name == "lgbm":
+                model = train_lightgbm_from_file(panel, horizon, str(cache_dir))
+            else:
+                model = train_subsampled(panel, model_name, horizon, max_rows)
+
+            proba, y_test, df_test_meta = score_split(panel, model, export_key, horizon)
+            export_predictions(proba, y_test, df_test_meta, horizon, HARDCODED_THRESHOLD,
+                               export_key, str(model_output_dir))
+            models_store[model_name][horizon] = {"model": model, "threshold": HARDCODED_THRESHOLD}
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    models_path = output_dir / "models_out_of_core.pkl"
+    with open(models_path, "wb") as f:
+        pickle.dump(models_store, f)
+    print(f"\nModels saved to: {models_path}")
+
+    return models_store
+
+
+# ====================
+# STRESS TEST
+# ====================
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _stress_worker(data_path: str, work_dir: str, partition_bytes: int, max_rows: int):
+    """One stress measurement: ingest + one horizon of XGBoost, LightGBM and RF."""
+    start = time.perf_counter()
+    manifest = ingest(data_path, work_dir, partition_bytes)
+    panel = OutOfCorePanel(work_dir)
+    cache_dir = Path(work_dir) / "cache"
+    train_xgboost_external(panel, 1, str(cache_dir))
+    train_lightgbm_from_file(panel, 1, str(cache_dir))
+    panel.subsample(1, "train", max_rows)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    print(json.dumps({
+        "rows": manifest["n_rows"],
+        "partitions": manifest["n_partitions"],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "seconds": round(time.perf_counter() - start, 1),
+    }))
+
+
+def stress_test(row_counts: List[int], work_root: str, partition_bytes: int,
+                max_rows: int) -> pd.DataFrame:
+    """Peak RSS of ingest + training as the panel grows, each size in a fresh process."""
+    from synthetic_data import write_synthetic_csv
+
+    results = []
+    for n_rows in row_counts:
+        size_dir = Path(work_root) / f"rows_{n_rows}"
+        csv_path = size_dir / "panel.csv"
+        # 10 years x 4 quarters per bank, inside the YEAR_START-YEAR_END filter
+        write_synthetic_csv(str(csv_path), n_banks=max(1, n_rows // 40), n_years=10)
+
+        proc = subprocess.run(
+            [sys.executable, __file__, "stress-worker", "--data", str(csv_path),
+             "--work-dir", str(size_dir / "work"), "--partition-mb", str(partition_bytes // 2**20),
+             "--max-rows", str(max_rows)],
+            capture_output=True, text=True, check=True
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  {result['rows']:>10,} rows: peak RSS {result['peak_rss_mb']:.0f} MB "
+              f"({result['partitions']} partitions, {result['seconds']:.0f}s)")
+        results.append(result)
+        shutil.rmtree(size_dir, ignore_errors=True)
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Out-of-core ingestion and training for panels larger than RAM",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python out_of_core.py ingest --data ./data/big_panel.csv --work-dir ./output/ooc
+  python out_of_core.py train --work-dir ./output/ooc --output ./output/ooc_models
+  python out_of_core.py train --work-dir ./output/ooc --models xgboost,lgbm --horizons 1,2
+  python out_of_core.py stress --rows 400000,800000,1600000
+        """
+    )
+    parser.add_argument("command", choices=["ingest", "train", "stress", "stress-worker"], help="Action to run")
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV (ingest)"
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=str,
+        default="./output/out_of_core",
+        help="Directory for the memmap panel and training caches"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./output/out_of_core_models",
+        help="Output directory for predictions and models (train)"
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="ngboost,rf,xgboost,lgbm",
+        help="Models to train (comma-separated)"
+    )
+    parser.add_argument(
+        "--horizons",
+        type=str,
+        default="1,2,3,4,5",
+        help="Horizons to train (comma-separated)"
+    )
+    parser.add_argument(
+        "--partition-mb",
+        type=int,
+        default=PARTITION_BYTES // 2**20,
+        help="Target CSV megabytes per ingestion partition"
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=SUBSAMPLE_ROWS,
+        help="Stratified subsample size for RF / NGBoost"
+    )
+    parser.add_argument(
+        "--rows",
+        type=str,
+        default="400000,800000,1600000",
+        help="Panel sizes for the stress test (comma-separated)"
+    )
+
+    args = parser.parse_args()
+    partition_bytes = args.partition_mb * 2**20
+
+    if args.command == "ingest":
+        manifest = ingest(args.data, args.work_dir, partition_bytes)
+        print(f"Ingested {manifest['n_rows']:,} rows / {manifest['n_symbols']:,} symbols "
+              f"in {manifest['n_partitions']} partitions ({manifest['ingest_seconds']:.1f}s)")
+        print(f"Panel written to: {args.work_dir}/")
+    elif args.command == "train":
+        models = [m.strip() for m in args.models.split(",")]
+        horizons = [int(h.strip()) for h in args.horizons.split(",")]
+        train_out_of_core(args.work_dir, args.output, models, horizons, args.max_rows)
+    elif args.command == "stress-worker":
+        _stress_worker(args.data, args.work_dir, partition_bytes, args.max_rows)
+    else:
+        print("=" * 70)
+        print("OUT-OF-CORE STRESS TEST")
+        print("=" * 70)
+        row_counts = [int(n) for n in args.rows.split(",")]
+        results = stress_test(row_counts, args.work_dir, partition_bytes, args.max_rows)
+        print()
+        print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
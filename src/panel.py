@@ -0,0 +1,222 @@
+"""
+Compact in-memory panel for training.
+
+The wide ``df_h`` frame keeps float64 ratios, object-dtype symbol/period/time
+strings and five float64 ``distress_{h}y`` columns that are NaN where the
+future label is missing; ``split_by_horizon`` then copies it per horizon.
+``CompactPanel`` holds the same data as:
+
+  - features: one C-contiguous float32 matrix (n_rows x n_features)
+  - symbol / period / time: pandas categoricals (integer codes)
+  - calendar_year: int16
+  - labels: int8 matrix (n_rows x 5) plus a uint8 validity bitmask
+    (bit h-1 set when distress_{h}y is known)
+
+``split_by_horizon`` accepts a CompactPanel directly and gets float32 frames
+and int8 labels for just the rows of each split.
+
+Usage:
+  python panel.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python panel.py --benchmark-banks 50000
+"""
+
+import time
+import argparse
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from training_utils import (
+    FEATURE_COLS,
+    TARGET_COL,
+    TRAIN_END_YEAR,
+    VAL_END_YEAR,
+    YEAR_START,
+    YEAR_END,
+    prepare_horizon_panel,
+    split_by_horizon,
+)
+from data_validation import build_panel_schema, validate_panel
+
+HORIZONS = [1, 2, 3, 4, 5]
+META_COLS = ["symbol", "period", "time"]
+
+
+def _compact_read_dtypes(feature_cols: List[str]) -> dict:
+    dtypes = {col: np.float32 for col in feature_cols}
+    dtypes.update({col: "category" for col in META_COLS})
+    return dtypes
+
+
+class CompactPanel:
+    """Horizon-labelled panel with downcast, categorical-encoded columns."""
+
+    def __init__(self, symbol: pd.Categorical, calendar_year: np.ndarray, period: pd.Categorical,
+                 time_: pd.Categorical, features: np.ndarray, labels: np.ndarray, valid: np.ndarray,
+                 feature_cols: List[str] = None):
+        self.symbol = symbol
+        self.calendar_year = calendar_year
+        self.period = period
+        self.time = time_
+        self.features = features
+        self.labels = labels
+        self.valid = valid
+        self.feature_cols = list(feature_cols or FEATURE_COLS)
+
+    @classmethod
+    def from_frame(cls, df_h: pd.DataFrame, feature_cols: List[str] = None) -> "CompactPanel":
+        """Convert a prepared frame (see prepare_horizon_panel), keeping its row order."""
+        feature_cols = list(feature_cols or FEATURE_COLS)
+
+        labels = np.zeros((len(df_h), len(HORIZONS)), dtype=np.int8)
+        valid = np.zeros(len(df_h), dtype=np.uint8)
+        for j, h in enumerate(HORIZONS):
+            col = df_h[f"distress_{h}y"].to_numpy(dtype=np.float64)
+            known = ~np.isnan(col)
+            labels[known, j] = col[known]
+            valid |= known.astype(np.uint8) << j
+
+        return cls(
+            symbol=pd.Categorical(df_h["symbol"]),
+            calendar_year=df_h["calendar_year"].to_numpy(dtype=np.int16),
+            period=pd.Categorical(df_h["period"]),
+            time_=pd.Categorical(df_h["time"]),
+            features=np.ascontiguousarray(df_h[feature_cols].to_numpy(dtype=np.float32)),
+            labels=labels,
+            valid=valid,
+            feature_cols=feature_cols,
+        )
+
+    def __len__(self) -> int:
+        return len(self.calendar_year)
+
+    @property
+    def nbytes(self) -> int:
+        categoricals = sum(
+            c.codes.nbytes + pd.Series(c.categories).memory_usage(deep=True)
+            for c in [self.symbol, self.period, self.time]
+        )
+        return int(categoricals + self.calendar_year.nbytes + self.features.nbytes
+                   + self.labels.nbytes + self.valid.nbytes)
+
+    def label_mask(self, horizon: int) -> np.ndarray:
+        return ((self.valid >> (horizon - 1)) & 1).astype(bool)
+
+    def _X(self, rows: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(self.features[rows], columns=self.feature_cols, index=rows)
+
+    def _y(self, rows: np.ndarray, horizon: int) -> pd.Series:
+        return pd.Series(self.labels[rows, horizon - 1], index=rows, name=f"distress_{horizon}y")
+
+    def split(self, horizon: int):
+        """Same time-based split as split_by_horizon, in float32 / int8."""
+        known = self.label_mask(horizon)
+        label_year = self.calendar_year.astype(np.int32) + horizon
+
+        train = np.flatnonzero(known & (label_year <= TRAIN_END_YEAR))
+        val = np.flatnonzero(known & (label_year > TRAIN_END_YEAR) & (label_year <= VAL_END_YEAR))
+        test = np.flatnonzero(known & (label_year > VAL_END_YEAR))
+
+        df_test_meta = pd.DataFrame({
+            "symbol": self.symbol[test],
+            "calendar_year": self.calendar_year[test],
+            "period": self.period[test],
+            "time": self.time[test],
+        }, index=test)
+
+        return ((self._X(train), self._y(train, horizon)),
+                (self._X(val), self._y(val, horizon)),
+                (self._X(test), self._y(test, horizon), df_test_meta))
+
+
+def load_compact_panel(data_path: str, validate: bool = True) -> CompactPanel:
+    """Read the cleaned CSV straight into compact dtypes and prepare horizon labels."""
+    usecols = ["symbol", "calendar_year", "period", "time"] + FEATURE_COLS + [TARGET_COL]
+    df = pd.read_csv(data_path, usecols=usecols, dtype=_compact_read_dtypes(FEATURE_COLS))
+
+    if validate:
+        report = validate_panel(df, build_panel_schema(FEATURE_COLS, TARGET_COL))
+        if report.issues:
+            print(report.summary())
+        report.raise_if_errors()
+
+    return CompactPanel.from_frame(prepare_horizon_panel(df))
+
+
+def _timed_splits(panel) -> float:
+    start = time.perf_counter()
+    for h in HORIZONS:
+        split_by_horizon(panel, h)
+    return time.perf_counter() - start
+
+
+def benchmark(n_banks: int, n_years: int) -> pd.DataFrame:
+    """Memory and split time of the wide frame vs CompactPanel on a synthetic panel."""
+    from synthetic_data import make_synthetic_panel
+
+    raw = make_synthetic_panel(n_banks=n_banks, n_years=n_years)
+    # Object-dtype strings, as pd.read_csv produces them
+    for col in META_COLS:
+        raw[col] = raw[col].astype(str)
+    df_h = prepare_horizon_panel(raw)
+    del raw
+    print(f"Synthetic panel: {len(df_h):,} rows in {YEAR_START}-{YEAR_END}")
+    wide_bytes = df_h.memory_usage(deep=True, index=True).sum()
+    wide_split = _timed_splits(df_h)
+
+    start = time.perf_counter()
+    panel = CompactPanel.from_frame(df_h)
+    convert = time.perf_counter() - start
+    del df_h
+    compact_split = _timed_splits(panel)
+
+    return pd.DataFrame([
+        {"representation": "wide DataFrame", "memory_mb": wide_bytes / 2**20,
+         "split_5h_seconds": wide_split, "convert_seconds": 0.0},
+        {"representation": "CompactPanel", "memory_mb": panel.nbytes / 2**20,
+         "split_5h_seconds": compact_split, "convert_seconds": convert},
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the compact training panel or benchmark it against the wide frame",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python panel.py --data ./data/processed/financial_report_bank_zscore_clean.csv
+  python panel.py --benchmark-banks 50000
+        """
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default="./data/processed/financial_report_bank_zscore_clean.csv",
+        help="Path to cleaned data CSV"
+    )
+    parser.add_argument(
+        "--benchmark-banks",
+        type=int,
+        default=None,
+        help="Benchmark on a synthetic panel with this many banks instead"
+    )
+    parser.add_argument("--years", type=int, default=10, help="Years per bank from 2014 (benchmark)")
+
+    args = parser.parse_args()
+
+    if args.benchmark_banks:
+        result = benchmark(args.benchmark_banks, args.years)
+        print(result.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        wide, compact = result["memory_mb"]
+        print(f"\nMemory reduction: {wide / compact:.1f}x")
+        return
+
+    panel = load_compact_panel(args.data)
+    print(f"Rows: {len(panel):,} | memory: {panel.nbytes / 2**20:.2f} MB")
+    for h in HORIZONS:
+        print(f"  {h}Y labels known: {panel.label_mask(h).sum():,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+"""
+Resumable pipeline: training, export and SHAP as a DAG of checkpointed stages.
+
+  load -> split(h) -> fit(model, h) -> threshold(model, h) -> export(model, h), export(models)
+                                    \\-> shap(model, h) -> render
+
+Every node is checkpointed under a key derived from its parameters, the source
+of the modules its stage runs and the keys of its inputs (external files enter
+through their content hash), so a new data file or an edited training_utils.py
+invalidates exactly the nodes downstream of it. Reruns load completed nodes
+from their checkpoints, a crash only loses the nodes in flight, and nodes whose
+inputs are ready (the 20 fits, the 20 SHAP jobs, ...) run in a process pool.
+
+Driven by run_pipeline.py (--only / --from / --workers / --plan).
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from training_utils import (
+    load_and_prepare_data,
+    split_by_horizon,
+    train_ngboost,
+    train_random_forest,
+    train_xgboost,
+    train_lightgbm,
+    evaluate_and_export,
+    get_probabilities,
+    HARDCODED_THRESHOLD,
+    RANDOM_STATE,
+)
+from calibration import calibrate_horizon, calibrator_path
+from panel import load_compact_panel, CompactPanel
+from dataset_cache import load_dataset, file_digest
+from drift_monitor import save_reference, DRIFT_REFERENCE_NAME
+
+# Bump to invalidate every checkpoint (e.g. when a stage's output layout changes)
+PIPELINE_DAG_VERSION = 1
+
+STAGES = ["load", "split", "fit", "threshold", "export", "shap", "render"]
+SHAP_STAGES = ["shap", "render"]
+
+# Modules whose source is part of each stage's key
+STAGE_MODULES = {
+    "load": ["training_utils.py", "data_validation.py", "panel.py", "dataset_cache.py", "news_features.py"],
+    "split": ["training_utils.py", "panel.py"],
+    "fit": ["training_utils.py"],
+    "threshold": ["training_utils.py", "calibration.py"],
+    "export": ["training_utils.py", "prediction_store.py", "drift_monitor.py"],
+    "shap": ["shap_orchestrator.py"],
+    "render": ["shap_orchestrator.py"],
+}
+
+MODEL_TRAINERS = {
+    "ngboost": train_ngboost,
+    "rf": train_random_forest,
+    "xgboost": train_xgboost,
+    "lgbm": train_lightgbm,
+}
+EXPORT_KEY = {"ngboost": "ngboost", "rf": "rf", "xgboost": "xgb", "lgbm": "lgbm"}
+HORIZONS = [1, 2, 3, 4, 5]
+
+# Rough relative cost; among ready nodes the most expensive are started first
+MODEL_COST = {"ngboost": 100, "rf": 10, "xgboost": 5, "lgbm": 1}
+
+SRC_DIR = Path(__file__).resolve().parent
+
+
+# ====================
+# STAGE FUNCTIONS
+# ====================
+# fn(*dependency outputs, **params, **context); module-level so worker processes can run them
+
+def stage_load(data_path: str, news_path: str = None, compact_panel: bool = False) -> Dict:
+    feature_cols = None
+    if news_path:
+        df_h, _, feature_cols = load_dataset(data_path, news_path)
+        if compact_panel:
+            df_h = CompactPanel.from_frame(df_h, feature_cols)
+    elif compact_panel:
+        df_h = load_compact_panel(data_path)
+    else:
+        df_h, _ = load_and_prepare_data(data_path)
+    return {"df_h": df_h, "feature_cols": feature_cols}
+
+
+def stage_split(loaded: Dict, horizon: int) -> Dict:
+    (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(
+        loaded["df_h"], horizon, loaded["feature_cols"]
+    )
+    return {"X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val,
+            "X_test": X_test, "y_test": y_test, "df_test_meta": df_test_meta}
+
+
+def stage_fit(split: Dict, model_name: str, horizon: int, output_dir: str) -> Dict:
+    print(f"\n  [{model_name} {horizon}Y] training")
+    # NGBoost's default base learner draws from the global RNG; seed it so a fit
+    # does not depend on which process or in which order it runs
+    np.random.seed(RANDOM_STATE)
+    search_logs = []
+    params = {
+        "X_train": split["X_train"], "y_train": split["y_train"],
+        "X_val": split["X_val"], "y_val": split["y_val"],
+        "hardcode_threshold": HARDCODED_THRESHOLD, "horizon": horizon, "search_logs": search_logs
+    }
+    if model_name == "xgboost":
+        params["output_dir"] = str(Path(output_dir) / model_name)
+
+    result = MODEL_TRAINERS[model_name](**params)
+    if model_name == "xgboost":
+        model, threshold, best_params = result
+    else:
+        (model, threshold), best_params = result, None
+    return {"model": model, "threshold": threshold, "best_params": best_params, "search_logs": search_logs}
+
+
+def stage_threshold(split: Dict, fit: Dict, model_name: str, horizon: int, calibration: str,
+                    output_dir: str) -> Dict:
+    """Validation scores, calibrator and the decision threshold for one (model, horizon)."""
+    model_output_dir = Path(output_dir) / model_name
+    model_output_dir.mkdir(parents=True, exist_ok=True)
+    proba_val = get_probabilities(fit["model"], split["X_val"], EXPORT_KEY[model_name])
+    calibrator = calibrate_horizon(proba_val, split["y_val"], calibration, str(model_output_dir),
+                                   model_name, horizon)
+    return {"threshold": fit["threshold"], "calibrator": calibrator, "proba_val": proba_val}
+
+
+def stage_export(split: Dict, fit: Dict, thr: Dict, model_name: str, horizon: int, store_root: str,
+                 output_dir: str, run_id: str = None) -> Dict:
+    from prediction_store import PredictionStore
+
+    model_output_dir = Path(output_dir) / model_name
+    model_output_dir.mkdir(parents=True, exist_ok=True)
+    store = PredictionStore(store_root) if store_root else None
+    export_df = evaluate_and_export(
+        fit["model"], split["X_test"], split["y_test"], split["df_test_meta"], horizon, thr["threshold"],
+        EXPORT_KEY[model_name], str(model_output_dir), calibrator=thr["calibrator"], store=store, run_id=run_id
+    )
+    return {"rows": len(export_df), "run_id": run_id}
+
+
+def stage_models(*entries, model_names: List[str], horizons: List[int], output_dir: str) -> Dict:
+    """models_all_horizons.pkl (train_all_models layout), drift reference, XGBoost params / search logs.
+
+    entries are (split, fit, threshold) outputs for every (model, horizon), model-major.
+    """
+    output_dir = Path(output_dir)
+    models_store = {}
+    for i, model_name in enumerate(model_names):
+        models_store[model_name] = {}
+        best_params, search_logs = {}, []
+        for j, horizon in enumerate(horizons):
+            k = 3 * (i * len(horizons) + j)
+            split, fit, thr = entries[k:k + 3]
+            models_store[model_name][horizon] = {
+                "model": fit["model"],
+                "threshold": thr["threshold"],
+                "calibrator": thr["calibrator"],
+                "proba_val": thr["proba_val"],
+                "y_val": split["y_val"],
+                "X_train": split["X_train"],
+                "y_train": split["y_train"]
+            }
+            if fit["best_params"] is not None:
+                best_params[horizon] = fit["best_params"]
+            search_logs += fit["search_logs"]
+
+        model_output_dir = output_dir / model_name
+        model_output_dir.mkdir(parents=True, exist_ok=True)
+        if best_params:
+            with open(model_output_dir / f"{model_name}_best_params.json", "w") as f:
+                json.dump(best_params, f, indent=2)
+        if search_logs:
+            pd.DataFrame(search_logs).to_csv(model_output_dir / f"{model_name}_search_logs.csv", index=False)
+
+    models_path = output_dir / "models_all_horizons.pkl"
+    with open(models_path, "wb") as f:
+        pickle.dump(models_store, f)
+    print(f"  Models saved to: {models_path}")
+    save_reference(models_store, str(output_dir))
+    return {"path": str(models_path)}
+
+
+def stage_shap(*splits_and_fit, model_name: str, horizon: int) -> Dict:
+    """SHAP values for one (model, horizon) on the model type's shared sample.
+
+    splits_and_fit: the split outputs of every horizon (for the shared sample), then the fit.
+    """
+    from shap_orchestrator import shared_rows, explain
+
+    *splits, fit = splits_and_fit
+    X_sample, X_bg = shared_rows({i: split["X_train"] for i, split in enumerate(splits)})
+    values, base = explain(fit["model"], model_name, X_sample, X_bg)
+    return {"sample": X_sample, "values": values.astype("float32"), "base": base}
+
+
+def stage_render(*shaps, jobs: List[List], output_dir: str, plots: bool = True) -> Dict:
+    """shap_store.npz, importance CSVs and plots from every SHAP node (jobs: [model, horizon] per input)."""
+    from shap_orchestrator import save_shap_store, write_importance_csvs, render_plots, ShapStore, \
+        SHAP_STORE_NAME
+
+    computed = {"samples": {}, "results": {}}
+    for (model_name, horizon), out in zip(jobs, shaps):
+        computed["samples"].setdefault(model_name, out["sample"])
+        computed["results"][(model_name, horizon)] = (out["values"], out["base"])
+
+    store_path = save_shap_store(Path(output_dir) / SHAP_STORE_NAME, computed)
+    store = ShapStore(store_path)
+    n_csv = write_importance_csvs(store, output_dir)
+    n_png = render_plots(store, output_dir) if plots else 0
+    print(f"  SHAP store: {store_path} | {n_csv} importance CSVs, {n_png} plots")
+    return {"path": str(store_path)}
+
+
+# ====================
+# DAG
+# ====================
+
+class Node:
+    """One checkpointed unit of work: fn(*outputs of deps, **params, **context).
+
+    params (JSON-serializable) and the digests of ``files`` are part of the key;
+    context (output dirs, run id) is not. A checkpoint only counts while every
+    path in ``products`` still exists.
+    """
+
+    def __init__(self, name: str, stage: str, fn, deps: List[str] = (), params: Dict = None,
+                 context: Dict = None, files: List[str] = (), products: List[str] = (), cost: int = 0):
+        self.name = name
+        self.stage = stage
+        self.fn = fn
+        self.deps = list(deps)
+        self.params = params or {}
+        self.context = context or {}
+        self.files = [f for f in files if f]
+        self.products = list(products)
+        self.cost = cost
+
+
+def _code_digest(stage: str) -> str:
+    h = hashlib.sha256()
+    for module in STAGE_MODULES[stage]:
+        h.update(module.encode())
+        h.update(file_digest(str(SRC_DIR / module)).encode())
+    return h.hexdigest()
+
+
+def _execute(fn, args, kwargs):
+    start = time.perf_counter()
+    return fn(*args, **kwargs), time.perf_counter() - start
+
+
+class Pipeline:
+    """Nodes in topological order plus their checkpoint directory."""
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.nodes: Dict[str, Node] = {}
+        self._keys = {}
+        self._code = {}
+
+    def add(self, node: Node) -> Node:
+        missing = [d for d in node.deps if d not in self.nodes]
+        if missing:
+            raise ValueError(f"{node.name}: unknown dependencies {missing}")
+        self.nodes[node.name] = node
+        return node
+
+    # ----- checkpoints -----
+
+    def key(self, name: str) -> str:
+        if name not in self._keys:
+            node = self.nodes[name]
+            if node.stage not in self._code:
+                self._code[node.stage] = _code_digest(node.stage)
+            parts = {
+                "version": PIPELINE_DAG_VERSION,
+                "stage": node.stage,
+                "name": name,
+                "params": node.params,
+                "files": [file_digest(f) for f in node.files],
+                "code": self._code[node.stage],
+                "deps": [self.key(d) for d in node.deps],
+            }
+            self._keys[name] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+        return self._keys[name]
+
+    def checkpoint_path(self, name: str) -> Path:
+        node = self.nodes[name]
+        return self.checkpoint_dir / node.stage / f"{name.replace('/', '_')}-{self.key(name)[:20]}.pkl"
+
+    def is_complete(self, name: str) -> bool:
+        return self.checkpoint_path(name).exists() and all(Path(p).exists() for p in self.nodes[name].products)
+
+    def load(self, name: str):
+        with open(self.checkpoint_path(name), "rb") as f:
+            return pickle.load(f)
+
+    def _save(self, name: str, output):
+        path = self.checkpoint_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    def execute(self, name: str) -> float:
+        """Run one node from its inputs' checkpoints and checkpoint the result (work_queue.py workers)."""
+        node = self.nodes[name]
+        output, seconds = _execute(node.fn, [self.load(d) for d in node.deps], {**node.params, **node.context})
+        self._save(name, output)
+        return seconds
+
+    # ----- planning / execution -----
+
+    def plan(self, stages: List[str] = None, force_stages: List[str] = ()) -> Dict[str, str]:
+        """{node: "run" | "cached"} for the nodes of `stages` and whatever they need.
+
+        Nodes of force_stages always run; other nodes run only without a valid
+        checkpoint, and the inputs of a cached node are not needed at all.
+        """
+        stages = stages or STAGES
+        status = {}
+
+        def visit(name):
+            if name in status:
+                return
+            node = self.nodes[name]
+            if node.stage in force_stages or not self.is_complete(name):
+                status[name] = "run"
+                for dep in node.deps:
+                    visit(dep)
+            else:
+                status[name] = "cached"
+
+        for name, node in self.nodes.items():
+            if node.stage in stages:
+                visit(name)
+        return {name: status[name] for name in self.nodes if name in status}
+
+    def run(self, stages: List[str] = None, force_stages: List[str] = (), workers: int = 1) -> Dict[str, str]:
+        """Execute the plan; finished nodes are checkpointed as they complete."""
+        status = self.plan(stages, force_stages)
+        pending = [name for name, s in status.items() if s == "run"]
+        done = {name for name, s in status.items() if s == "cached"}
+        values = {}
+
+        def value(name):
+            if name not in values:
+                values[name] = self.load(name)
+            return values[name]
+
+        def finish(name, output, seconds):
+            self._save(name, output)
+            values[name] = output
+            done.add(name)
+            print(f"  ✓ {name} ({seconds:.1f}s)")
+
+        def arguments(name):
+            node = self.nodes[name]
+            return node.fn, [value(d) for d in node.deps], {**node.params, **node.context}
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(pending) or 1))
+        print(f"  {len(pending)} nodes to run, {len(done)} from checkpoints ({workers} worker(s))")
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        running = {}
+        try:
+            while pending or running:
+                ready = [n for n in pending if all(d in done for d in self.nodes[n].deps)]
+                ready.sort(key=lambda n: -self.nodes[n].cost)
+                if pool is None:
+                    name = ready[0]
+                    pending.remove(name)
+                    finish(name, *_execute(*arguments(name)))
+                    continue
+
+                for name in ready[:workers - len(running)]:
+                    pending.remove(name)
+                    running[pool.submit(_execute, *arguments(name))] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        output, seconds = future.result()
+                    except Exception:
+                        print(f"  ✗ {name} failed (completed nodes are checkpointed; rerun to resume)")
+                        raise
+                    finish(name, output, seconds)
+        finally:
+            if pool is not None:
+                # Drop queued nodes after a failure (shutdown(cancel_futures=) needs Python 3.9)
+                for future in running:
+                    future.cancel()
+                pool.shutdown()
+
+        return status
+
+
+def build_pipeline(data_path: str, output_dir: str, calibration: str = "none", store_root: str = None,
+                   run_id: str = None, compact_panel: bool = False, news_path: str = None,
+                   checkpoint_dir: str = None, model_names: List[str] = None,
+                   horizons: List[int] = None, plots: bool = True) -> Pipeline:
+    """The full training + SHAP DAG for run_pipeline.py."""
+    from shap_orchestrator import SHAP_STORE_NAME
+
+    model_names = model_names or list(MODEL_TRAINERS)
+    horizons = horizons or HORIZONS
+    output_dir = str(output_dir)
+    pipe = Pipeline(checkpoint_dir or Path(output_dir) / "checkpoints")
+
+    pipe.add(Node("load", "load", stage_load, params={"compact_panel": compact_panel},
+                  context={"data_path": data_path, "news_path": news_path}, files=[data_path, news_path]))
+    for h in horizons:
+        pipe.add(Node(f"split/{h}y", "split", stage_split, ["load"], {"horizon": h}))
+
+    for m in model_names:
+        for h in horizons:
+            cost = MODEL_COST[m]
+            pipe.add(Node(f"fit/{m}/{h}y", "fit", stage_fit, [f"split/{h}y"],
+                          {"model_name": m, "horizon": h}, {"output_dir": output_dir}, cost=cost))
+            pipe.add(Node(f"threshold/{m}/{h}y", "threshold", stage_threshold, [f"split/{h}y", f"fit/{m}/{h}y"],
+                          {"model_name": m, "horizon": h, "calibration": calibration}, {"output_dir": output_dir},
+                          products=[calibrator_path(str(Path(output_dir) / m), m, h)] if calibration != "none" else []))
+            predictions = Path(output_dir) / m / f"{EXPORT_KEY[m]}_predictions_{h}y.csv"
+            pipe.add(Node(f"export/{m}/{h}y", "export", stage_export,
+                          [f"split/{h}y", f"fit/{m}/{h}y", f"threshold/{m}/{h}y"],
+                          {"model_name": m, "horizon": h, "store_root": store_root},
+                          {"output_dir": output_dir, "run_id": run_id},
+                          products=[] if store_root else [predictions]))
+
+    entries = []
+    for m in model_names:
+        for h in horizons:
+            entries += [f"split/{h}y", f"fit/{m}/{h}y", f"threshold/{m}/{h}y"]
+    pipe.add(Node("export/models", "export", stage_models, entries,
+                  {"model_names": model_names, "horizons": horizons}, {"output_dir": output_dir},
+                  products=[Path(output_dir) / "models_all_horizons.pkl", Path(output_dir) / DRIFT_REFERENCE_NAME]))
+
+    for m in model_names:
+        for h in horizons:
+            pipe.add(Node(f"shap/{m}/{h}y", "shap", stage_shap,
+                          [f"split/{hh}y" for hh in horizons] + [f"fit/{m}/{h}y"],
+                          {"model_name": m, "horizon": h}, cost=MODEL_COST[m]))
+    pipe.add(Node("render", "render", stage_render,
+                  [f"shap/{m}/{h}y" for m in model_names for h in horizons],
+                  {"jobs": [[m, h] for m in model_names for h in horizons], "plots": plots},
+                  {"output_dir": output_dir}, products=[Path(output_dir) / SHAP_STORE_NAME]))
+    return pipe
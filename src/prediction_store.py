@@ -0,0 +1,240 @@
+"""
+Consolidated columnar prediction store.
+
+Replaces the per-model, per-horizon prediction CSVs with one append-only
+Parquet dataset partitioned by model, horizon and run id:
+
+  <store>/model=<model>/horizon=<h>/run_id=<run_id>/part-<uuid>.parquet
+
+Training runs write the full test-period predictions of a model. Incremental
+runs (incremental_scoring.py, run id <timestamp>-inc-<suffix>) only hold the
+rows of one landing; read_latest() overlays the ones newer than a model's
+latest training run on it.
+
+String columns are stored dictionary-encoded (pandas categoricals) and rows are
+sorted by symbol/year so row-group statistics let reads filtered on symbol,
+calendar_year and horizon skip everything they do not need.
+
+Usage:
+  python prediction_store.py list --store ./output/prediction_store
+  python prediction_store.py export --store ./output/prediction_store --output ./output
+"""
+
+import uuid
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed when the store is used
+    pa = ds = pq = None
+
+
+PARTITION_COLS = ["model", "horizon", "run_id"]
+CATEGORICAL_COLS = ["symbol", "period", "time", "tanggal", "model_name", "risk_bucket", "confusion_type"]
+SORT_COLS = ["symbol", "calendar_year", "period"]
+ROW_KEY = ["symbol", "calendar_year", "period", "horizon"]
+INCREMENTAL_TAG = "inc"
+
+# Column order of the legacy prediction CSVs (see evaluate_and_export)
+EXPORT_COLUMNS = [
+    "symbol", "calendar_year", "period", "time", "tanggal", "horizon",
+    "distress_actual", "prob_distress", "pred_label", "distance_to_threshold",
+    "model_name", "threshold_used", "risk_bucket", "confusion_type"
+]
+
+
+def new_run_id(incremental: bool = False) -> str:
+    """Sortable, unique run id (UTC timestamp + short random suffix, "-inc-" tagged if incremental)."""
+    tag = f"{INCREMENTAL_TAG}-" if incremental else ""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{tag}{uuid.uuid4().hex[:6]}"
+
+
+def is_incremental(run_id: str) -> bool:
+    return run_id.split("-")[1:2] == [INCREMENTAL_TAG]
+
+
+class PredictionStore:
+    """Append-only Parquet store of prediction rows in the export schema."""
+
+    def __init__(self, root: str):
+        if pa is None:
+            raise ImportError("pyarrow is required for the prediction store (pip install pyarrow)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.partitioning = ds.partitioning(
+            pa.schema([("model", pa.string()), ("horizon", pa.int32()), ("run_id", pa.string())]),
+            flavor="hive"
+        )
+
+    def append(self, df: pd.DataFrame, model: str, horizon: int, run_id: str) -> Path:
+        """Write one (model, horizon, run) batch as a new part file."""
+        part_dir = self.root / f"model={model}" / f"horizon={int(horizon)}" / f"run_id={run_id}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+
+        df = df.drop(columns=[c for c in PARTITION_COLS if c in df.columns])
+        df = df.sort_values([c for c in SORT_COLS if c in df.columns]).reset_index(drop=True)
+        for col in CATEGORICAL_COLS:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = part_dir / f"part-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table, path, compression="zstd", row_group_size=64_000)
+        return path
+
+    def dataset(self):
+        return ds.dataset(str(self.root), format="parquet", partitioning=self.partitioning)
+
+    def run_ids(self) -> List[str]:
+        """All run ids in the store, oldest first."""
+        return sorted({
+            p.name.split("=", 1)[1]
+            for p in self.root.glob("model=*/horizon=*/run_id=*")
+        })
+
+    def models(self) -> List[str]:
+        return sorted(p.name.split("=", 1)[1] for p in self.root.glob("model=*"))
+
+    def latest_run_id(self, model: str = None, incremental: bool = False) -> Optional[str]:
+        """Latest training run (of a model); with incremental=True, incremental runs count too."""
+        pattern = f"model={model}/horizon=*/run_id=*" if model else "model=*/horizon=*/run_id=*"
+        run_ids = sorted({
+            p.name.split("=", 1)[1] for p in self.root.glob(pattern)
+            if incremental or not is_incremental(p.name.split("=", 1)[1])
+        })
+        return run_ids[-1] if run_ids else None
+
+    def read(self, symbols: List[str] = None, years: List[int] = None, horizons: List[int] = None,
+             models: List[str] = None, run_id: str = None, columns: List[str] = None) -> pd.DataFrame:
+        """Read predictions, pushing filters down to partitions and row groups."""
+        if not any(self.root.glob("model=*")):
+            return pd.DataFrame()
+
+        filters = []
+        if symbols is not None:
+            filters.append(ds.field("symbol").isin(list(symbols)))
+        if years is not None:
+            filters.append(ds.field("calendar_year").isin([int(y) for y in years]))
+        if horizons is not None:
+            filters.append(ds.field("horizon").isin([int(h) for h in horizons]))
+        if models is not None:
+            filters.append(ds.field("model").isin(list(models)))
+        if run_id is not None:
+            filters.append(ds.field("run_id") == run_id)
+
+        expr = None
+        for f in filters:
+            expr = f if expr is None else expr & f
+
+        table = self.dataset().to_table(columns=columns, filter=expr)
+        return table.to_pandas()
+
+    def read_latest(self, models: List[str] = None) -> pd.DataFrame:
+        """Current predictions: per model, its latest training run plus the incremental runs
+        after it, one row per (symbol, calendar_year, period, horizon), newest run wins.
+        """
+        frames = []
+        for model in models or self.models():
+            train_run = self.latest_run_id(model)
+            runs = sorted({p.name.split("=", 1)[1] for p in self.root.glob(f"model={model}/horizon=*/run_id=*")})
+            runs = [r for r in runs if r == train_run or (is_incremental(r) and (train_run is None or r > train_run))]
+            if not runs:
+                continue
+            parts = [self.read(models=[model], run_id=r) for r in runs]
+            # Incremental runs leave the outcome columns empty; drop them so the
+            # training run's dtypes win (concat with all-NA columns is deprecated)
+            parts = parts[:1] + [p.dropna(axis=1, how="all") for p in parts[1:]]
+            df = pd.concat(parts, ignore_index=True)
+            if len(runs) > 1:
+                df["run_id"] = df["run_id"].astype(str)
+                df = df.sort_values("run_id", kind="stable").drop_duplicates(ROW_KEY, keep="last")
+            frames.append(df.reset_index(drop=True))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def export_csvs(self, output_dir: str, run_id: str = None) -> List[Path]:
+        """Write the legacy <model>/<model>_predictions_<h>y.csv files for one run.
+
+        Without a run id, each model's current predictions (read_latest) are exported.
+        """
+        output_dir = Path(output_dir)
+        written = []
+
+        for model in self.models():
+            df = self.read(models=[model], run_id=run_id) if run_id else self.read_latest([model])
+            if df.empty:
+                continue
+
+            # Directory names follow the training entry points (xgb predictions live in xgboost/)
+            csv_dir = output_dir / ("xgboost" if model == "xgb" else model)
+            csv_dir.mkdir(parents=True, exist_ok=True)
+
+            for horizon, df_hh in df.groupby("horizon", observed=True):
+                export_df = df_hh[[c for c in EXPORT_COLUMNS if c in df_hh.columns]].copy()
+                for col in export_df.select_dtypes("category").columns:
+                    export_df[col] = export_df[col].astype(str)
+                export_df = export_df.sort_values(["calendar_year", "prob_distress"], ascending=[True, False])
+
+                path = csv_dir / f"{model}_predictions_{horizon}y.csv"
+                export_df.to_csv(path, index=False)
+                written.append(path)
+
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect the prediction store or export legacy CSVs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python prediction_store.py list --store ./output/prediction_store
+  python prediction_store.py export --store ./output/prediction_store --output ./output
+  python prediction_store.py export --store ./output/prediction_store --run-id 20260101T000000-abc123
+        """
+    )
+    parser.add_argument("command", choices=["list", "export"], help="Action to run")
+    parser.add_argument(
+        "--store",
+        type=str,
+        default="./output/prediction_store",
+        help="Prediction store directory"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./output",
+        help="Output directory for exported CSVs"
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        default=None,
+        help="Run to export (default: latest training run per model plus newer incremental runs)"
+    )
+
+    args = parser.parse_args()
+    store = PredictionStore(args.store)
+
+    if args.command == "list":
+        df = store.read(columns=PARTITION_COLS)
+        if df.empty:
+            print("Store is empty")
+            return
+        summary = df.groupby(["run_id", "model", "horizon"], observed=True).size().rename("rows")
+        print(summary.to_string())
+    else:
+        written = store.export_csvs(args.output, args.run_id)
+        for path in written:
+            print(f"Exported: {path}")
+        print(f"\n✓ {len(written)} CSV files written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Per-bank risk timeline queries over stored predictions.
+
+Loads predictions once (prediction store or legacy CSVs), indexes them on
+(symbol, calendar_year, period), and answers dashboard queries from sorted
+integer keys with an in-process LRU cache for repeated lookups.
+
+Usage:
+  python risk_query.py timeline BBRI --store ./output/prediction_store
+  python risk_query.py top --year 2023 --period Q4 --k 10 --csv-dir ./output
+  python risk_query.py top --year 2023 --period Q4 --model xgb --horizon 1
+"""
+
+import time
+import argparse
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from prediction_store import PredictionStore
+
+PERIOD_INDEX = {"Q1": 0, "Q2": 1, "Q3": 2, "Q4": 3}
+QUERY_CACHE_SIZE = 1024
+
+TIMELINE_COLS = [
+    "symbol", "calendar_year", "period", "model", "horizon",
+    "prob_distress", "pred_label", "risk_bucket", "distress_actual"
+]
+
+
+def load_latest_from_store(store_dir: str) -> pd.DataFrame:
+    """Current predictions of every model: latest training run plus newer incremental runs."""
+    return PredictionStore(store_dir).read_latest()
+
+
+def load_from_csv_dir(output_dir: str) -> pd.DataFrame:
+    """Legacy <model>/<model>_predictions_<h>y.csv files."""
+    frames = []
+    for path in sorted(Path(output_dir).glob("*/*_predictions_*y.csv")):
+        df = pd.read_csv(path)
+        if "period" not in df.columns:
+            print(f"Warning: skipping {path} (no period column; re-export to index it)")
+            continue
+        df["model"] = path.name.split("_predictions_")[0]
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+class RiskIndex:
+    """Prediction rows sorted by an integer (symbol, calendar_year, period) key.
+
+    A symbol's rows are one contiguous slice found by binary search, and each
+    quarter's rows are one slice of a second (quarter, symbol) ordering.
+    """
+
+    def __init__(self, df: pd.DataFrame, cache_size: int = QUERY_CACHE_SIZE):
+        df = df.copy()
+        df["symbol"] = df["symbol"].astype(str)
+        df["period"] = df["period"].astype(str)
+        df["model"] = df["model"].astype(str)
+
+        symbols = np.sort(df["symbol"].unique())
+        self.symbols = symbols
+        sym_code = np.searchsorted(symbols, df["symbol"].values).astype(np.int64)
+        quarter = df["calendar_year"].values.astype(np.int64) * 4 + df["period"].map(PERIOD_INDEX).values
+
+        # Symbol-major order for timelines
+        order = np.lexsort((df["horizon"].values, df["model"].values, quarter, sym_code))
+        self.by_symbol = df.iloc[order].reset_index(drop=True)
+        self.symbol_codes = sym_code[order]
+
+        # Quarter-major order for top-k
+        order_q = np.argsort(quarter, kind="stable")
+        self.by_quarter = df.iloc[order_q].reset_index(drop=True)
+        self.quarter_keys = quarter[order_q]
+
+        self._timeline = lru_cache(maxsize=cache_size)(self._timeline_uncached)
+        self._top_k = lru_cache(maxsize=cache_size)(self._top_k_uncached)
+
+    @classmethod
+    def from_store(cls, store_dir: str, **kwargs) -> "RiskIndex":
+        return cls(load_latest_from_store(store_dir), **kwargs)
+
+    @classmethod
+    def from_csv_dir(cls, output_dir: str, **kwargs) -> "RiskIndex":
+        return cls(load_from_csv_dir(output_dir), **kwargs)
+
+    def _timeline_uncached(self, symbol: str) -> pd.DataFrame:
+        code = np.searchsorted(self.symbols, symbol)
+        if code >= len(self.symbols) or self.symbols[code] != symbol:
+            return self.by_symbol.iloc[0:0][TIMELINE_COLS]
+        lo = np.searchsorted(self.symbol_codes, code, side="left")
+        hi = np.searchsorted(self.symbol_codes, code, side="right")
+        return self.by_symbol.iloc[lo:hi][TIMELINE_COLS]
+
+    def timeline(self, symbol: str, wide: bool = False) -> pd.DataFrame:
+        """All models x horizons for one bank, one row per (year, period, model, horizon).
+
+        With wide=True, returns one row per quarter and a prob_distress column
+        per (model, horizon).
+        """
+        df = self._timeline(symbol.upper()).copy()
+        if wide:
+            return df.pivot_table(
+                index=["calendar_year", "period"], columns=["model", "horizon"],
+                values="prob_distress", observed=True
+            )
+        return df
+
+    def _top_k_uncached(self, calendar_year: int, period: str, k: int,
+                        model: str, horizon: int) -> pd.DataFrame:
+        key = int(calendar_year) * 4 + PERIOD_INDEX[period]
+        lo = np.searchsorted(self.quarter_keys, key, side="left")
+        hi = np.searchsorted(self.quarter_keys, key, side="right")
+        rows = self.by_quarter.iloc[lo:hi]
+
+        if model is not None:
+            rows = rows[rows["model"] == model]
+        if horizon is not None:
+            rows = rows[rows["horizon"] == horizon]
+
+        ranked = (
+            rows.groupby("symbol", observed=True)["prob_distress"]
+            .agg(prob_distress="mean", n_predictions="size")
+            .sort_values("prob_distress", ascending=False)
+            .head(k)
+            .reset_index()
+        )
+        ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+        return ranked
+
+    def top_k(self, calendar_year: int, period: str, k: int = 10,
+              model: str = None, horizon: int = None) -> pd.DataFrame:
+        """Riskiest banks in a quarter by mean prob_distress over the selected models/horizons."""
+        return self._top_k(int(calendar_year), period.upper(), int(k), model,
+                           None if horizon is None else int(horizon)).copy()
+
+    def cache_info(self) -> dict:
+        return {"timeline": self._timeline.cache_info(), "top_k": self._top_k.cache_info()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query bank risk timelines and top-k riskiest banks",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python risk_query.py timeline BBRI --store ./output/prediction_store
+  python risk_query.py timeline BBRI --csv-dir ./output --wide
+  python risk_query.py top --year 2023 --period Q4 --k 10
+  python risk_query.py top --year 2023 --period Q4 --model xgb --horizon 1
+        """
+    )
+    parser.add_argument("command", choices=["timeline", "top"], help="Query type")
+    parser.add_argument("symbol", nargs="?", default=None, help="Bank symbol (timeline)")
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Prediction store directory (latest run per model)"
+    )
+    parser.add_argument(
+        "--csv-dir",
+        type=str,
+        default="./output",
+        help="Legacy predictions CSV directory, used when --store is not given"
+    )
+    parser.add_argument("--wide", action="store_true", help="Timeline as quarter x (model, horizon) table")
+    parser.add_argument("--year", type=int, default=None, help="Calendar year (top)")
+    parser.add_argument("--period", type=str, default="Q4", choices=list(PERIOD_INDEX), help="Quarter (top)")
+    parser.add_argument("--k", type=int, default=10, help="Number of banks (top)")
+    parser.add_argument("--model", type=str, default=None, help="Restrict to one model key, e.g. xgb")
+    parser.add_argument("--horizon", type=int, default=None, help="Restrict to one horizon")
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = RiskIndex.from_store(args.store) if args.store else RiskIndex.from_csv_dir(args.csv_dir)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if args.command == "timeline":
+        if not args.symbol:
+            parser.error("timeline requires a symbol")
+        result = index.timeline(args.symbol, wide=args.wide)
+    else:
+        if args.year is None:
+            parser.error("top requires --year")
+        result = index.top_k(args.year, args.period, args.k, args.model, args.horizon)
+    query_ms = (time.perf_counter() - start) * 1000
+
+    with pd.option_context("display.width", 160, "display.max_columns", None, "display.max_rows", 500):
+        print(result.to_string())
+    print(f"\n{len(result)} rows | load {load_ms:.1f} ms | query {query_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
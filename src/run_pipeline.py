@@ -1,82 +1,45 @@
 #!/usr/bin/env python3
 """
 Main execution script for the bankruptcy prediction pipeline.
-Orchestrates training and optional SHAP analysis.
+Orchestrates training and optional SHAP analysis as a resumable DAG of
+checkpointed stages (see pipeline_dag.py).
 """
 
 import sys
 import argparse
-import pickle
 from pathlib import Path
 
-from training_utils import (
-    load_and_prepare_data,
-    split_by_horizon,
-    train_ngboost,
-    train_random_forest,
-    train_xgboost,
-    train_lightgbm,
-    FEATURE_COLS,
-)
-from shap_analysis import analyze_all_horizons
-
-
-def train_all_models(data_path: str, output_dir: str):
-    """Train all 4 models sequentially."""
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Load data
-    df_h, df_model = load_and_prepare_data(data_path)
-
-    models_config = [
-        ("ngboost", train_ngboost),
-        ("rf", train_random_forest),
-        ("xgboost", train_xgboost),
-        ("lgbm", train_lightgbm),
-    ]
-
-    models_store = {}
-
-    for model_name, train_fn in models_config:
-        print(f"\nTraining {model_name.upper()}...")
-        model_output_dir = output_dir / model_name
-        model_output_dir.mkdir(parents=True, exist_ok=True)
-
-        export_key = "xgb" if model_name == "xgboost" else model_name
-
-        models_dict = {}
-        for horizon in range(1, 6):
-            (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon)
-            result = train_fn(X_train, y_train, X_val, y_val, hardcode_threshold=0.4)
-            if model_name == "xgboost":
-                model, threshold, best_params = result
-            else:
-                model, threshold = result
+from calibration import CALIBRATION_METHODS
+from prediction_store import PredictionStore, new_run_id
+from pipeline_dag import build_pipeline, STAGES, SHAP_STAGES
+from work_queue import run_queue, LEASE_SECONDS
 
-            from training_utils import evaluate_and_export
-            evaluate_and_export(model, X_test, y_test, df_test_meta, horizon, threshold, export_key, str(model_output_dir))
 
-            models_dict[horizon] = {
-                "model": model,
-                "threshold": threshold,
-                "X_train": X_train,
-                "y_train": y_train
-            }
-
-        models_store[model_name] = models_dict
-
-    # Save models
-    models_path = output_dir / "models_all_horizons.pkl"
-    with open(models_path, "wb") as f:
-        pickle.dump(models_store, f)
-
-    return models_store, df_h
+def _stage_list(value: str):
+    stages = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s) {unknown}; choose from {STAGES}")
+    return stages
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Bankruptcy Prediction Pipeline"
+        description="Bankruptcy Prediction Pipeline",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Stages: load -> split -> fit -> threshold -> export -> shap -> render
+Completed stages are checkpointed (<output>/checkpoints) and skipped on rerun.
+
+Examples:
+  python run_pipeline.py --skip-shap
+  python run_pipeline.py                          # resumes: only SHAP + plots run after --skip-shap
+  python run_pipeline.py --only shap,render       # recompute SHAP without retraining
+  python run_pipeline.py --from export            # re-export predictions from stored models
+  python run_pipeline.py --plan --calibration isotonic
+  python run_pipeline.py --queue /shared/queue --output /shared/output    # + work_queue.py worker on each machine
+  python run_pipeline.py --queue /tmp/queue --spawn-workers 3
+        """
     )
     parser.add_argument(
         "--data",
@@ -95,6 +58,82 @@ def main():
         action="store_true",
         help="Skip SHAP analysis (faster for testing)"
     )
+    parser.add_argument(
+        "--workers", "--shap-workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Processes for independent stages – fits, SHAP jobs (default: CPU count)"
+    )
+    parser.add_argument(
+        "--calibration",
+        type=str,
+        default="none",
+        choices=CALIBRATION_METHODS,
+        help="Calibrate scores on the validation split before thresholding"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default=None,
+        help="Append predictions to this Parquet store instead of writing CSVs"
+    )
+
+    parser.add_argument(
+        "--compact-panel",
+        action="store_true",
+        help="Hold the training panel as float32 features / int8 labels (see panel.py)"
+    )
+    parser.add_argument(
+        "--news",
+        type=str,
+        default=None,
+        help="Join news features from this article store (.sqlite) or sheet CSV export (see news_features.py)"
+    )
+    stage_group = parser.add_mutually_exclusive_group()
+    stage_group.add_argument(
+        "--only",
+        type=_stage_list,
+        default=None,
+        help="Rerun only these comma-separated stages (missing inputs are rebuilt or loaded from checkpoints)"
+    )
+    stage_group.add_argument(
+        "--from",
+        dest="from_stage",
+        type=str,
+        default=None,
+        choices=STAGES,
+        help="Rerun this stage and everything after it"
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default=None,
+        help="Stage checkpoints (default: <output>/checkpoints)"
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Show which nodes would run or come from checkpoints, then exit"
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        default=None,
+        help="Coordinate workers through this shared queue directory instead of running locally (see work_queue.py)"
+    )
+    parser.add_argument(
+        "--spawn-workers",
+        type=int,
+        default=0,
+        help="With --queue: start this many local workers"
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=LEASE_SECONDS,
+        help="With --queue: job lease of spawned workers, in seconds"
+    )
 
     args = parser.parse_args()
 
@@ -107,52 +146,75 @@ def main():
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    # Stages to (re)run
+    if args.only:
+        stages = force_stages = args.only
+    elif args.from_stage:
+        stages = force_stages = STAGES[STAGES.index(args.from_stage):]
+    else:
+        stages, force_stages = STAGES, []
+    if args.skip_shap:
+        stages = [s for s in stages if s not in SHAP_STAGES]
+        force_stages = [s for s in force_stages if s not in SHAP_STAGES]
+    run_shap = any(s in SHAP_STAGES for s in stages)
+
     print("=" * 70)
     print("BANKRUPTCY PREDICTION PIPELINE")
     print("=" * 70)
     print(f"Data: {args.data}")
     print(f"Output: {args.output}")
+    print(f"Stages: {', '.join(stages)}" + (f" (forced: {', '.join(force_stages)})" if force_stages else ""))
     print()
 
-    # ========== PHASE 1: TRAINING ==========
-    print("PHASE 1: Training all models (NGBoost, RF, XGBoost, LightGBM)")
+    store = PredictionStore(args.prediction_store) if args.prediction_store else None
+    run_id = new_run_id()
+
+    # Absolute paths so queue workers on other machines resolve the same shared files
+    build_args = {
+        "data_path": str(data_path.resolve()),
+        "output_dir": str(output_dir.resolve()),
+        "calibration": args.calibration,
+        "store_root": str(Path(args.prediction_store).resolve()) if args.prediction_store else None,
+        "run_id": run_id,
+        "compact_panel": args.compact_panel,
+        "news_path": str(Path(args.news).resolve()) if args.news else None,
+        "checkpoint_dir": str(Path(args.checkpoint_dir).resolve()) if args.checkpoint_dir else None,
+    }
+    pipeline = build_pipeline(**build_args)
+
+    if args.plan:
+        plan = pipeline.plan(stages, force_stages)
+        for stage in STAGES:
+            names = [n for n in plan if pipeline.nodes[n].stage == stage]
+            if names:
+                n_run = sum(plan[n] == "run" for n in names)
+                print(f"  {stage:<10} run {n_run:>3} | cached {len(names) - n_run:>3}")
+        print(f"\nCheckpoints: {pipeline.checkpoint_dir}")
+        return
+
+    # ========== TRAINING (+ SHAP) DAG ==========
+    print("Running pipeline DAG (NGBoost, RF, XGBoost, LightGBM" + (" + SHAP)" if run_shap else ")"))
     print("-" * 70)
-
-    models_store, df_h = train_all_models(str(data_path), str(output_dir))
-
-    print("\n✓ Training complete!")
-    print(f"  Models saved to: {output_dir}/models_all_horizons.pkl")
-    print(f"  Predictions exported to: {output_dir}/<model>/<model>_predictions_<horizon>y.csv")
-
-    # ========== PHASE 2: SHAP ANALYSIS ==========
-    if not args.skip_shap:
-        print("\n" + "=" * 70)
-        print("PHASE 2: SHAP Explainability Analysis")
-        print("-" * 70)
-
-        for model_type in ["ngboost", "rf", "xgboost", "lgbm"]:
-            X_trains = {}
-            models_dict = {}
-
-            for horizon in range(1, 6):
-                models_dict[horizon] = models_store[model_type][horizon]["model"]
-                X_trains[horizon] = models_store[model_type][horizon]["X_train"]
-
-            analyze_all_horizons(models_dict, X_trains, model_type, FEATURE_COLS, str(output_dir))
-
-        print("\n✓ SHAP analysis complete!")
-        print(f"  Plots saved to: {output_dir}/<model>/")
-        print(f"  Feature importance CSVs saved to: {output_dir}/<model>/<model>_feature_importance_<horizon>y.csv")
+    if args.queue:
+        run_queue(pipeline, build_args, args.queue, stages, force_stages, args.spawn_workers, args.lease)
+    else:
+        pipeline.run(stages, force_stages, workers=args.workers)
 
     print("\n" + "=" * 70)
     print("PIPELINE COMPLETE ✓")
     print("=" * 70)
     print("\nOutput Files:")
-    print("  - Trained models: output/models_all_horizons.pkl")
-    print("  - Predictions (5 horizons × 4 models): output/<model>/<model>_predictions_<horizon>y.csv")
-    if not args.skip_shap:
-        print("  - SHAP plots: output/<model>/<model>_shap_summary|importance|dependence_<feature>_<horizon>y.png")
-        print("  - Feature importance: output/<model>/<model>_feature_importance_<horizon>y.csv")
+    print(f"  - Trained models: {output_dir}/models_all_horizons.pkl")
+    print(f"  - Drift reference: {output_dir}/drift_reference.npz")
+    if store is not None:
+        print(f"  - Predictions: {store.root} (run_id={run_id} for re-exported nodes)")
+    else:
+        print(f"  - Predictions (5 horizons × 4 models): {output_dir}/<model>/<model>_predictions_<horizon>y.csv")
+    if run_shap:
+        print(f"  - SHAP plots: {output_dir}/<model>/<model>_shap_summary|importance|dependence_<feature>_<horizon>y.png")
+        print(f"  - Feature importance: {output_dir}/<model>/<model>_feature_importance_<horizon>y.csv")
+        print(f"  - SHAP values (all models/horizons): {output_dir}/shap_store.npz")
+    print(f"  - Stage checkpoints: {pipeline.checkpoint_dir}")
     print()
 
 
@@ -0,0 +1,493 @@
+"""
+Historical news backfill for the article store: search windows, then bodies.
+
+The hourly scrape only sees the rolling `when:1y` search and at most one page of
+cards. The backfill splits a long date range into narrow windows per bank
+keyword (`"<keyword>" after:YYYY-MM-DD before:YYYY-MM-DD`) and fetches them
+concurrently:
+
+  - a shared rate limiter (with jitter) caps requests per second across all
+    workers; 429 / 5xx responses back off the whole pool (Retry-After honored)
+  - a window whose page is full (BACKFILL_SPLIT_AT cards) was truncated by the
+    search and is split in half until it fits or is one day long
+  - completed windows are recorded in a SQLite checkpoint after their articles
+    are written, so an interrupted run resumes where it stopped (a window in
+    flight is fetched again; the store upserts by link)
+  - articles stream into the ArticleStore as windows complete, with the query's
+    symbol and the negative-keyword match push_data uses
+
+`bodies` fetches the publisher page of every stored article
+(scraper/body_fetcher.py) and adds negative keywords / symbols found in the
+body to articles whose headline had none.
+
+Usage:
+  python backfill.py run --emiten emiten.csv --start 2014-01-01 --end 2024-01-01
+  python backfill.py bodies --emiten emiten.csv --start 2014-01-01
+  python backfill.py status
+  python backfill.py benchmark --banks 40 --years 10 --workers 16 --latency-ms 800
+"""
+
+import os
+import time
+import hashlib
+import random
+import shutil
+import signal
+import sqlite3
+import argparse
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlparse, parse_qs
+from zoneinfo import ZoneInfo
+
+import requests
+
+from config import CONFIG
+from push_to_sheet import check_negative_news, get_emiten_resolver, get_sheet, load_emiten_map
+from scraper.article_store import ArticleStore
+from scraper.body_fetcher import BodyCache, BodyFetcher, BodyMatcher
+from scraper.emiten_resolver import load_emiten_csv
+from scraper.google_news import TIMEOUT_REQUEST, parse_articles, synthetic_search_page
+from scraper.http_cache import HTTP_MODES, StoredResponse, make_http_client
+
+SEARCH_BASE = "https://news.google.com/search"
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; MVP-Scraper/1.0)"}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+PAGE_LIMIT = 1000  # parse every card on the page; BACKFILL_SPLIT_AT decides truncation
+MAX_BACKOFF_S = 300
+
+
+# ====================
+# PLAN
+# ====================
+
+def split_windows(start, end, days):
+    """
+    [start, end) in consecutive windows of `days` days (last one shorter).
+    """
+    windows = []
+    while start < end:
+        stop = min(start + timedelta(days=days), end)
+        windows.append((start, stop))
+        start = stop
+    return windows
+
+
+def build_plan(emiten_map, start, end, window_days):
+    """
+    Return: [(symbol, keyword, start_iso, end_iso)] for every keyword and window
+    """
+    return [
+        (symbol, keyword, s.isoformat(), e.isoformat())
+        for s, e in split_windows(start, end, window_days)
+        for symbol, keywords in sorted(emiten_map.items())
+        for keyword in keywords
+    ]
+
+
+def window_url(keyword, start, end):
+    query = f'"{keyword}" after:{start} before:{end}'
+    return f"{SEARCH_BASE}?{urlencode({'q': query, 'hl': 'id', 'gl': 'ID', 'ceid': 'ID:id'})}"
+
+
+def halve(task):
+    symbol, keyword, start, end = task
+    s, e = date.fromisoformat(start), date.fromisoformat(end)
+    mid = s + (e - s) // 2
+    return [(symbol, keyword, s.isoformat(), mid.isoformat()), (symbol, keyword, mid.isoformat(), e.isoformat())]
+
+
+# ====================
+# CHECKPOINT
+# ====================
+
+class BackfillCheckpoint:
+    """
+    Window status table: pending | done | split | failed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS windows (
+                symbol TEXT,
+                keyword TEXT,
+                start TEXT,
+                end TEXT,
+                status TEXT,
+                articles INTEGER DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (symbol, keyword, start, end)
+            )
+        """)
+
+    def add(self, tasks):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO windows (symbol, keyword, start, end, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                [(*t, time.time()) for t in tasks]
+            )
+
+    def pending(self):
+        """
+        Windows not done yet, failed ones included (retried on every run).
+        """
+        return [tuple(r) for r in self.conn.execute(
+            "SELECT symbol, keyword, start, end FROM windows WHERE status IN ('pending', 'failed') "
+            "ORDER BY start, symbol, keyword"
+        )]
+
+    def mark(self, task, status, articles=0, error=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE windows SET status = ?, articles = ?, attempts = attempts + 1, error = ?, updated_at = ? "
+                "WHERE symbol = ? AND keyword = ? AND start = ? AND end = ?",
+                (status, articles, error, time.time(), *task)
+            )
+
+    def summary(self):
+        rows = self.conn.execute("SELECT status, COUNT(*), SUM(articles) FROM windows GROUP BY status").fetchall()
+        return {status: {"windows": n, "articles": total or 0} for status, n, total in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+# ====================
+# FETCH
+# ====================
+
+class RateLimiter:
+    """
+    Shared request pacing: at most `rate` requests per second over all threads,
+    each interval stretched by up to `jitter`. pause() delays every worker.
+    """
+
+    def __init__(self, rate, jitter=0.25):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.jitter = jitter
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self, stop):
+        """
+        Return: False if stop was set while waiting
+        """
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval * (1 + random.uniform(0, self.jitter))
+        return not stop.wait(slot - now) if slot > now else not stop.is_set()
+
+    def pause(self, seconds):
+        with self.lock:
+            self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_window(task, get_session, limiter, stop, max_retries):
+    """
+    Fetch and parse one window, retrying 429 / 5xx / connection errors.
+    Return: dict(task, status=done|failed|stopped, articles, retries, error)
+    """
+    url = window_url(task[1], task[2], task[3])
+    error = None
+    for attempt in range(max_retries + 1):
+        if not limiter.wait(stop):
+            return {"task": task, "status": "stopped", "articles": [], "retries": attempt, "error": None}
+        try:
+            resp = get_session().get(url, headers=HEADERS, timeout=TIMEOUT_REQUEST)
+        except requests.RequestException as e:
+            error = str(e)
+            delay = None
+        else:
+            if resp.status_code == 200:
+                articles = parse_articles(resp.text, limit=PAGE_LIMIT, verbose=False)
+                return {"task": task, "status": "done", "articles": articles, "retries": attempt, "error": None}
+            error = f"HTTP {resp.status_code}"
+            if resp.status_code not in RETRY_STATUS:
+                break
+            delay = _retry_after(resp)
+        limiter.pause(min(delay or 2.0 * 2 ** attempt, MAX_BACKOFF_S))
+    return {"task": task, "status": "failed", "articles": [], "retries": max_retries, "error": error}
+
+
+def enrich(articles, symbol, now):
+    rows = []
+    for a in articles:
+        is_negative, neg_keyword = check_negative_news(a.get("title"))
+        rows.append(dict(a, first_seen=now, last_seen=now, symbol=symbol,
+                         is_negative=is_negative, neg_keyword=neg_keyword))
+    return rows
+
+
+def run_backfill(plan, checkpoint, store, session_factory, workers=4, rate=1.0, max_retries=4,
+                 split_at=100, stop=None, progress_every=100):
+    """
+    Fetch every pending window of the plan (plus windows left over from earlier
+    runs). Articles are upserted into the store from this thread as windows
+    complete, then the window is marked in the checkpoint.
+
+    Return: dict of counters
+    """
+    stop = stop or threading.Event()
+    checkpoint.add(plan)
+    queue = deque(checkpoint.pending())
+    limiter = RateLimiter(rate)
+    local = threading.local()
+
+    def get_session():
+        if not hasattr(local, "session"):
+            local.session = session_factory()
+        return local.session
+
+    stats = {"windows": 0, "articles": 0, "split": 0, "failed": 0, "retries": 0}
+    total = len(queue)
+    started = time.time()
+    print(f"Backfill: {total:,} windows pending | workers={workers} | rate={rate}/s")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        while True:
+            while queue and len(in_flight) < workers * 2 and not stop.is_set():
+                in_flight.add(pool.submit(fetch_window, queue.popleft(), get_session, limiter, stop, max_retries))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                result = future.result()
+                task, articles = result["task"], result["articles"]
+                stats["retries"] += result["retries"]
+                if result["status"] == "stopped":
+                    continue
+                if result["status"] == "failed":
+                    checkpoint.mark(task, "failed", error=result["error"])
+                    stats["failed"] += 1
+                    continue
+
+                now = datetime.now(ZoneInfo(CONFIG["TIMEZONE"])).strftime("%Y-%m-%d %H:%M:%S")
+                store.upsert(enrich(articles, task[0], now))
+                stats["articles"] += len(articles)
+                stats["windows"] += 1
+
+                if len(articles) >= split_at and task[2] < (date.fromisoformat(task[3]) - timedelta(days=1)).isoformat():
+                    children = halve(task)
+                    checkpoint.add(children)
+                    checkpoint.mark(task, "split", len(articles))
+                    queue.extendleft(reversed(children))
+                    stats["split"] += 1
+                    total += 2
+                else:
+                    checkpoint.mark(task, "done", len(articles))
+
+                if stats["windows"] % progress_every == 0:
+                    elapsed = time.time() - started
+                    left = total - stats["windows"] - stats["failed"]
+                    eta = left * elapsed / stats["windows"]
+                    print(f"  {stats['windows']:,}/{total:,} windows | {stats['articles']:,} articles | "
+                          f"{stats['windows'] / elapsed:.1f} windows/s | ETA {eta / 60:.0f} min")
+
+    stats["elapsed_s"] = time.time() - started
+    stats["stopped"] = stop.is_set()
+    print(f"Backfill {'stopped' if stop.is_set() else 'finished'}: {stats['windows']:,} windows, "
+          f"{stats['articles']:,} articles, {stats['split']} split, {stats['failed']} failed, "
+          f"{stats['retries']} retries in {stats['elapsed_s']:.1f}s")
+    return stats
+
+
+# ====================
+# BODIES
+# ====================
+
+def enrich_bodies(store, fetcher, matcher, since=None):
+    """
+    Fetch bodies for stored articles and OR the body matches into them:
+    is_negative / neg_keyword and symbol are only filled where the headline
+    match left them empty.
+    Return: fetch stats plus the number of articles changed
+    """
+    articles = store.rows(since)
+    bodies, stats = fetcher.fetch([a["link"] for a in articles], progress_every=500)
+
+    updates = []
+    for a in articles:
+        body = bodies.get(a["link"])
+        if body is None or (a["is_negative"] and a["symbol"]):
+            continue
+        match = matcher.match(body["text"])
+        row = dict(a)
+        if not a["is_negative"] and match["is_negative"]:
+            row.update(is_negative=True, neg_keyword=match["neg_keyword"])
+        if not a["symbol"] and match["symbol"]:
+            row["symbol"] = match["symbol"]
+        if row != a:
+            updates.append(row)
+    store.upsert(updates)
+
+    stats["articles"] = len(articles)
+    stats["updated"] = len(updates)
+    print(f"Bodies: {len(bodies):,}/{len(articles):,} articles ({stats['cached']:,} cached, {stats['fetched']:,} fetched, "
+          f"{stats['failed']:,} failed) in {stats['elapsed_s']:.1f}s | {len(updates):,} articles updated")
+    return stats
+
+
+# ====================
+# BENCHMARK
+# ====================
+
+class SyntheticNewsSession:
+    """
+    Offline stand-in for Google News: answers a window query with a page of
+    per_day cards per day (capped at `cap`), after latency_ms. error_rate of
+    the requests get a 429 with Retry-After: 1.
+    """
+
+    def __init__(self, latency_ms=800, per_day=1.5, cap=100, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.per_day = per_day
+        self.cap = cap
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def get(self, url, headers=None, timeout=None):
+        time.sleep(self.latency_ms / 1000)
+        if self.rng.random() < self.error_rate:
+            return StoredResponse(url, 429, {"Retry-After": "1"}, b"", "synthetic")
+        query = parse_qs(urlparse(url).query)["q"][0]
+        terms = dict(t.split(":", 1) for t in query.split() if t.startswith(("after:", "before:")))
+        start = datetime.fromisoformat(terms["after"])
+        days = (datetime.fromisoformat(terms["before"]) - start).days
+        n = min(self.cap, round(days * self.per_day))
+        prefix = hashlib.sha1(query.encode()).hexdigest()[:12] + "-"
+        return StoredResponse(url, 200, {}, synthetic_search_page(n, start, days, prefix).encode(), "synthetic")
+
+    def close(self):
+        pass
+
+
+def benchmark(banks, years, window_days, workers, rate, latency_ms, error_rate):
+    work_dir = tempfile.mkdtemp(prefix="backfill_bench_")
+    emiten_map = {f"BK{i:02d}": [f"bank contoh {i}"] for i in range(banks)}
+    end = date(2024, 1, 1)
+    plan = build_plan(emiten_map, date(end.year - years, 1, 1), end, window_days)
+    try:
+        checkpoint = BackfillCheckpoint(os.path.join(work_dir, "checkpoint.sqlite"))
+        store = ArticleStore(os.path.join(work_dir, "articles.sqlite"))
+        stats = run_backfill(plan, checkpoint, store, lambda: SyntheticNewsSession(latency_ms, error_rate=error_rate),
+                             workers=workers, rate=rate, progress_every=max(len(plan) // 5, 1))
+        print(f"Store: {store.stats()}")
+
+        print("\nResume (nothing left):")
+        run_backfill(plan, checkpoint, store, lambda: SyntheticNewsSession(latency_ms), workers=workers, rate=rate)
+        checkpoint.close()
+        store.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    sequential_s = (stats["windows"] + stats["failed"] + stats["retries"]) * (latency_ms / 1000)
+    print(f"\n{len(plan):,} planned windows ({banks} banks x {years}y / {window_days}d): "
+          f"{stats['elapsed_s'] / 60:.1f} min with {workers} workers at {rate}/s "
+          f"vs ~{sequential_s / 3600:.1f} h sequential")
+
+
+# ====================
+# CLI
+# ====================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Historical news backfill into the article store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python backfill.py run --emiten emiten.csv --start 2014-01-01 --end 2024-01-01
+  python backfill.py run --symbols BBRI BMRI --workers 8 --rate 2
+  python backfill.py bodies --emiten emiten.csv --start 2020-01-01
+  python backfill.py status
+  python backfill.py benchmark --banks 40 --years 10 --workers 16 --latency-ms 800
+        """
+    )
+    parser.add_argument("command", choices=["run", "bodies", "status", "benchmark"])
+    parser.add_argument("--emiten", type=str, default=None,
+                        help="symbol,keywords CSV (default: Sheet2 of the spreadsheet)")
+    parser.add_argument("--symbols", nargs="+", default=None, help="Only these symbols")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2014, 1, 1), help="First day (inclusive)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 1, 1), help="Last day (exclusive)")
+    parser.add_argument("--window-days", type=int, default=CONFIG["BACKFILL_WINDOW_DAYS"], help="Days per window")
+    parser.add_argument("--workers", type=int, default=CONFIG["BACKFILL_WORKERS"], help="Concurrent requests")
+    parser.add_argument("--rate", type=float, default=CONFIG["BACKFILL_RATE"],
+                        help="Max requests per second over all workers")
+    parser.add_argument("--state-dir", type=str, default=CONFIG["SCHEDULER_STATE_DIR"],
+                        help="Directory for the checkpoint (and the article store unless APP_ARTICLE_STORE_PATH)")
+    parser.add_argument("--http-mode", choices=HTTP_MODES, default="off",
+                        help="off = plain session; record / replay use the fixture directory")
+    parser.add_argument("--fixtures", type=str, default=CONFIG["HTTP_FIXTURES_DIR"], help="Fixture directory")
+    parser.add_argument("--banks", type=int, default=40, help="Synthetic banks (benchmark)")
+    parser.add_argument("--years", type=int, default=10, help="Synthetic years (benchmark)")
+    parser.add_argument("--latency-ms", type=int, default=800, help="Simulated request latency (benchmark)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Simulated 429 share (benchmark)")
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.banks, args.years, args.window_days, args.workers, args.rate, args.latency_ms, args.error_rate)
+        return
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    checkpoint = BackfillCheckpoint(os.path.join(args.state_dir, "backfill.sqlite"))
+    store = ArticleStore(CONFIG["ARTICLE_STORE_PATH"] or os.path.join(args.state_dir, "articles.sqlite"))
+
+    if args.command in ("run", "bodies"):
+        if args.emiten:
+            emiten_map = load_emiten_csv(args.emiten)
+        else:
+            client, _ = get_sheet()
+            emiten_map = load_emiten_map(client)
+        if args.symbols:
+            emiten_map = {s: kw for s, kw in emiten_map.items() if s in {x.upper() for x in args.symbols}}
+
+    if args.command == "bodies":
+        cache = BodyCache(os.path.join(args.state_dir, "bodies.sqlite"))
+        fetcher = BodyFetcher(cache, concurrency=CONFIG["BODY_FETCH_CONCURRENCY"],
+                              per_domain=CONFIG["BODY_FETCH_PER_DOMAIN"])
+        matcher = BodyMatcher(CONFIG["NEGATIVE_KEYWORDS"], get_emiten_resolver(emiten_map))
+        enrich_bodies(store, fetcher, matcher, args.start)
+        print(f"Body cache: {cache.stats()}")
+        cache.close()
+
+    if args.command == "run":
+        plan = build_plan(emiten_map, args.start, args.end, args.window_days)
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        cache_dir = os.path.join(args.state_dir, "http_cache")
+        run_backfill(plan, checkpoint, store,
+                     lambda: make_http_client(args.http_mode, cache_dir, args.fixtures, CONFIG["HTTP_CACHE_TTL"]),
+                     workers=args.workers, rate=args.rate, max_retries=CONFIG["BACKFILL_MAX_RETRIES"],
+                     split_at=CONFIG["BACKFILL_SPLIT_AT"], stop=stop)
+
+    for status, counts in sorted(checkpoint.summary().items()):
+        print(f"  {status:<8}{counts['windows']:>8,} windows {counts['articles']:>10,} articles")
+    print(f"Store: {store.stats()}")
+    checkpoint.close()
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+import os
+import re
+import time
+
+from config import CONFIG
+
+
+class LocalWorksheet:
+    """
+    Stand-in for a gspread Worksheet, backed by a JSON file.
+    Implements only the calls push_to_sheet makes. latency_ms simulates the
+    round trip of each Sheets API call so dry runs show realistic job latency.
+    """
+
+    def __init__(self, book, name):
+        self.book = book
+        self.name = name
+
+    @property
+    def rows(self):
+        return self.book.data.setdefault(self.name, [])
+
+    def col_values(self, col):
+        self.book.call()
+        values = [row[col - 1] if len(row) >= col else "" for row in self.rows]
+        while values and values[-1] in ("", None):
+            values.pop()
+        return values
+
+    def get_all_records(self):
+        self.book.call()
+        if not self.rows:
+            return []
+        header, *body = self.rows
+        return [dict(zip(header, row)) for row in body]
+
+    def append_rows(self, rows, value_input_option=None):
+        self.book.call()
+        self.rows.extend([list(r) for r in rows])
+        self.book.save()
+
+    def batch_update(self, updates):
+        self.book.call()
+        for update in updates:
+            match = re.fullmatch(r"([A-Z]+)(\d+)", update["range"])
+            col = 0
+            for ch in match.group(1):
+                col = col * 26 + ord(ch) - 64
+            row_idx = int(match.group(2))
+            while len(self.rows) < row_idx:
+                self.rows.append([])
+            row = self.rows[row_idx - 1]
+            row.extend([""] * (col - len(row)))
+            row[col - 1] = update["values"][0][0]
+        self.book.save()
+
+
+class LocalSpreadsheet:
+    """
+    Stand-in for gspread's client.open(...) result.
+    """
+
+    def __init__(self, path, latency_ms=0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.api_calls = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+        else:
+            self.data = {
+                CONFIG["SHEET_NAME"]: [[
+                    "first_seen", "last_seen", "published_at", "source", "year", "quarter",
+                    "title", "symbol", "is_negative", "neg_keyword", "link", "cluster_id"
+                ]],
+                "Sheet2": [["symbol", "keywords"]],
+            }
+            self.save()
+
+    def call(self):
+        self.api_calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.data, f, default=str)
+
+    def worksheet(self, name):
+        return LocalWorksheet(self, name)
+
+
+class LocalClient:
+    """
+    Stand-in for the gspread client returned by get_sheet().
+    """
+
+    def __init__(self, path, latency_ms=0):
+        self.book = LocalSpreadsheet(path, latency_ms)
+
+    def open(self, name):
+        return self.book
+
+
+def get_local_sheet(path, latency_ms=0):
+    """
+    Same return shape as push_to_sheet.get_sheet(): (client, worksheet)
+    """
+    client = LocalClient(path, latency_ms)
+    return client, client.open(CONFIG["SPREADSHEET_NAME"]).worksheet(CONFIG["SHEET_NAME"])
@@ -0,0 +1,60 @@
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+PHASES = ["scrape", "parse", "match", "cluster", "diff", "write"]
+
+
+class PhaseTimer:
+    """
+    Per-phase wall-clock durations and counters for one job run.
+
+    Usage:
+      timer = PhaseTimer()
+      with timer.phase("scrape"):
+          ...
+      timer.count("inserted", 3)
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.status = "ok"
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def fail(self, status):
+        self.status = status
+
+    def record(self, **extra):
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_s": round(time.perf_counter() - self._start, 4),
+            "status": self.status,
+            "phases_s": {k: round(v, 4) for k, v in self.phases.items()},
+            "counters": self.counters,
+            **extra,
+        }
+
+    def summary(self):
+        return " | ".join(f"{name}={self.phases[name] * 1000:.0f}ms" for name in self.phases)
+
+
+def append_metrics(path, record):
+    """
+    Append one JSON record per line (JSON Lines).
+    """
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
@@ -1,8 +1,13 @@
-import os, re
+import os
 from config import CONFIG
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from scraper.google_news import scrape_google_news
+from scraper.google_news import fetch_search_response, parse_search_response
+from scraper.http_cache import make_http_client
+from scraper.near_dup import NearDupIndex
+from scraper.article_store import ArticleStore
+from scraper.emiten_resolver import EmitenResolver
+from metrics import PhaseTimer
 
 import gspread
 from google.oauth2.service_account import Credentials
@@ -79,14 +84,21 @@ def load_emiten_map(client):
 
     return emiten_map
 
-def detect_emiten(article, emiten_map):
-    text = f"{article.get('title','')} {article.get('source','')}".lower()
+def get_emiten_resolver(emiten_map):
+    """
+    Trigram-indexed resolver for an emiten map (returned as is if already one).
+    """
+    if isinstance(emiten_map, EmitenResolver):
+        return emiten_map
+    return EmitenResolver(emiten_map, threshold=CONFIG["EMITEN_MATCH_THRESHOLD"])
 
-    for code, keywords in emiten_map.items():
-        for kw in keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", text):
-                return code
-    return None
+def detect_emiten(article, emiten_map):
+    """
+    Exact or fuzzy match of bank names / aliases (scraper/emiten_resolver.py).
+    Pass a prebuilt EmitenResolver when matching many articles.
+    """
+    text = f"{article.get('title','')} {article.get('source','')}"
+    return get_emiten_resolver(emiten_map).resolve(text)
 
 def col_to_a1(col_num: int) -> str:
     """
@@ -101,127 +113,182 @@ def col_to_a1(col_num: int) -> str:
         result = chr(65 + remainder) + result
     return result
 
-def push_data():
-    try:
-        client, sheet = get_sheet()
-    except Exception as e:
-        print("Failed to connect to Google Sheet: ", e)
-        return
+def push_data(client=None, sheet=None, emiten_map=None, existing_link_map=None,
+              session=None, timer=None, dup_index=None, article_store=None):
+    """
+    One sync run, timed per phase: scrape -> parse -> match -> cluster -> diff -> write.
+
+    Called without arguments it connects and reads everything cold (one-shot
+    container). runner.py passes a warm client/sheet, cached emiten and link
+    maps, a warm http_cache client, an open NearDupIndex and an
+    ArticleStore (written after the sheet; one-shot runs use
+    APP_ARTICLE_STORE_PATH if set). One-shot runs fetch through an
+    HttpCache in APP_HTTP_CACHE_DIR (APP_HTTP_MODE). existing_link_map is updated in place
+    with the rows inserted by this run.
+
+    Return: PhaseTimer (durations, counters, status)
+    """
+    timer = timer or PhaseTimer()
+
+    if sheet is None:
+        try:
+            client, sheet = get_sheet()
+        except Exception as e:
+            print("Failed to connect to Google Sheet: ", e)
+            timer.fail("connect_failed")
+            return timer
+
+    if session is None:
+        session = make_http_client(CONFIG["HTTP_MODE"], CONFIG["HTTP_CACHE_DIR"] or "http_cache",
+                                   CONFIG["HTTP_FIXTURES_DIR"], CONFIG["HTTP_CACHE_TTL"])
 
     try:
-        articles = scrape_google_news(limit=CONFIG["SCRAPING_LIMIT"])
+        with timer.phase("scrape"):
+            resp = fetch_search_response(session)
+        if getattr(resp, "cache_status", None):
+            timer.count(f"http_{resp.cache_status}")
+        with timer.phase("parse"):
+            articles, reused = parse_search_response(resp, limit=CONFIG["SCRAPING_LIMIT"])
+        if reused:
+            timer.count("parse_reused")
     except Exception as e:
         print("Scraping failed: ", e)
-        return
+        timer.fail("scrape_failed")
+        return timer
 
+    timer.count("scraped", len(articles))
     if not articles:
         print("No articles scraped")
-        return
-
-    emiten_map = load_emiten_map(client)
-    existing_link_map = get_existing_link_map(sheet)
-    existing_links = set(existing_link_map.keys())
-    now = datetime.now(ZoneInfo(CONFIG["TIMEZONE"])).strftime("%Y-%m-%d %H:%M:%S")
-    first_seen_at = now
-    last_seen_at = now
-
-    rows_to_insert = []
-    updates = []
-    
-    inserted = 0
-    updated = 0
-    skipped = 0
-
-    for a in articles:
-        link = a.get("link")
-        title = a.get("title")
-        published_at = a.get("published_at")
-        is_negative, neg_keyword = check_negative_news(title)
-        emiten_code = detect_emiten(a, emiten_map)
-
-        if not link or not title:
-            print("Skipping invalid article: ", a)
-            skipped += 1
-            continue
-
-        if link in existing_links:
-            row_idx = existing_link_map[link]
-            updates.append({
-                "range": f"{col_to_a1(CONFIG['COL_LAST_SEEN'])}{row_idx}",
-                "values": [[now]]
-            })
-            updates.append({
-                "range": f"{col_to_a1(CONFIG['COL_PUBLISHED_AT'])}{row_idx}",
-                "values": [[published_at]]
-            })
-            updates.append({
-                "range": f"{col_to_a1(CONFIG['COL_TITLE'])}{row_idx}",
-                "values": [[title]]
-            })
-            updates.append({
-                "range": f"{col_to_a1(CONFIG['COL_SYMBOL'])}{row_idx}",
-                "values": [[emiten_code]]
-            })
-            updated += 1
-            continue
-
-            # try:
-            #     sheet.update_cell(row_idx, COL_LAST_SEEN, last_seen_at)
-            #     sheet.update_cell(row_idx, COL_PUBLISHED_AT, published_at)
-            #     sheet.update_cell(row_idx, COL_IS_NEGATIVE, is_negative)
-            #     sheet.update_cell(row_idx, COL_NEG_KEYWORD, neg_keyword)
-            #     updated += 1
-            # except Exception as e:
-            #     print("Failed to update published_at: ", e)
-            #     skipped += 1
-
-        rows_to_insert.append([
-            first_seen_at,
-            last_seen_at,
-            published_at,
-            a.get("year"),
-            a.get("quarter"),
-            a.get("source"),
-            title,
-            emiten_code,
-            is_negative,
-            neg_keyword,
-            link
-        ])
-        inserted += 1
+        timer.fail("no_articles")
+        return timer
+
+    with timer.phase("match"):
+        if emiten_map is None:
+            emiten_map = load_emiten_map(client)
+        resolver = get_emiten_resolver(emiten_map)
+        matches = [
+            (check_negative_news(a.get("title")), detect_emiten(a, resolver))
+            for a in articles
+        ]
+
+    with timer.phase("cluster"):
+        if dup_index is None:
+            dup_index = NearDupIndex(CONFIG["NEAR_DUP_INDEX_PATH"], threshold=CONFIG["NEAR_DUP_THRESHOLD"])
+        cluster_ids = dup_index.assign(articles)
+    timer.count("clusters", len(set(cluster_ids)))
+
+    with timer.phase("diff"):
+        if existing_link_map is None:
+            existing_link_map = get_existing_link_map(sheet)
+        existing_links = set(existing_link_map.keys())
+        now = datetime.now(ZoneInfo(CONFIG["TIMEZONE"])).strftime("%Y-%m-%d %H:%M:%S")
+        first_seen_at = now
+        last_seen_at = now
+
+        rows_to_insert = []
+        inserted_links = []
+        updates = []
+        stored_articles = []
+
+        inserted = 0
+        updated = 0
+        skipped = 0
+
+        for a, ((is_negative, neg_keyword), emiten_code), cluster_id in zip(articles, matches, cluster_ids):
+            link = a.get("link")
+            title = a.get("title")
+            published_at = a.get("published_at")
+
+            if not link or not title:
+                print("Skipping invalid article: ", a)
+                skipped += 1
+                continue
+
+            stored_articles.append(dict(
+                a, first_seen=now, last_seen=now, symbol=emiten_code,
+                is_negative=is_negative, neg_keyword=neg_keyword, cluster_id=cluster_id
+            ))
+
+            if link in existing_links:
+                row_idx = existing_link_map[link]
+                updates.append({
+                    "range": f"{col_to_a1(CONFIG['COL_LAST_SEEN'])}{row_idx}",
+                    "values": [[now]]
+                })
+                updates.append({
+                    "range": f"{col_to_a1(CONFIG['COL_PUBLISHED_AT'])}{row_idx}",
+                    "values": [[published_at]]
+                })
+                updates.append({
+                    "range": f"{col_to_a1(CONFIG['COL_TITLE'])}{row_idx}",
+                    "values": [[title]]
+                })
+                updates.append({
+                    "range": f"{col_to_a1(CONFIG['COL_SYMBOL'])}{row_idx}",
+                    "values": [[emiten_code]]
+                })
+                updated += 1
+                continue
+
+            rows_to_insert.append([
+                first_seen_at,
+                last_seen_at,
+                published_at,
+                a.get("year"),
+                a.get("quarter"),
+                a.get("source"),
+                title,
+                emiten_code,
+                is_negative,
+                neg_keyword,
+                link,
+                cluster_id
+            ])
+            inserted_links.append(link)
+            inserted += 1
+
+    timer.count("skipped", skipped)
 
     insert_success = None
-    if rows_to_insert:
-        try:
-            sheet.append_rows(
-                rows_to_insert,
-                value_input_option="USER_ENTERED"
-            )
-            insert_success = True
-        except Exception as e:
-            insert_success = False
-            print("INSERT FAILED, SKIPPING UPDATE:", e)
-            return
+    with timer.phase("write"):
+        if rows_to_insert:
+            try:
+                sheet.append_rows(
+                    rows_to_insert,
+                    value_input_option="USER_ENTERED"
+                )
+                insert_success = True
+            except Exception as e:
+                insert_success = False
+                print("INSERT FAILED, SKIPPING UPDATE:", e)
+                timer.fail("insert_failed")
+                return timer
 
-    if insert_success == None and updates:
-        try:
-            sheet.batch_update(updates)
-        except Exception as e:
-            print("UPDATE FAILED:", e)
-            return
-        
-        # try:
-        #     sheet.append_row(row, value_input_option="USER_ENTERED")
-        #     inserted += 1
-        #     time.sleep(1) # to avoid hitting rate limits
-        # except Exception as e:
-        #     print("Failed to append row: ", e)
-        #     skipped += 1
-        #     continue
+            # New rows land after the last known row
+            next_row = max(existing_link_map.values(), default=0) + 1
+            for offset, link in enumerate(inserted_links):
+                existing_link_map[link] = next_row + offset
+            timer.count("inserted", inserted)
+
+        if insert_success == None and updates:
+            try:
+                sheet.batch_update(updates)
+            except Exception as e:
+                print("UPDATE FAILED:", e)
+                timer.fail("update_failed")
+                return timer
+            timer.count("updated", updated)
+
+        if article_store is None and CONFIG["ARTICLE_STORE_PATH"]:
+            article_store = ArticleStore(CONFIG["ARTICLE_STORE_PATH"])
+        if article_store is not None:
+            article_store.upsert(stored_articles)
 
     print(
         f"Job finished! | scraped={len(articles)} | inserted={inserted} | updated={updated if insert_success else 0} | skipped={skipped}"
     )
+    print(f"Phases: {timer.summary()}")
+    return timer
 
 if __name__ == "__main__":
     push_data()
\ No newline at end of file
@@ -0,0 +1,353 @@
+"""
+Long-running scheduler for push_to_sheet.
+
+Instead of a fresh container per hourly run, one process keeps the Sheets
+client, a keep-alive HTTP session and the emiten / link caches warm between
+ticks. A lockfile prevents overlapping runners, a heartbeat file shows the
+runner is alive, and every tick appends per-phase durations (scrape, parse,
+match, cluster, diff, write) and counters to a JSON Lines metrics file.
+
+Usage:
+  python runner.py                      # tick every APP_SCHEDULER_INTERVAL seconds
+  python runner.py --once               # single tick (same as push_to_sheet.py, with metrics)
+  python runner.py --dry-run --ticks 5 --interval 0 --latency-ms 300 --html page.html
+  python runner.py --dry-run --ticks 5 --interval 0 --http-mode replay --fixtures ./http_fixtures
+  python runner.py --report             # p50 / p95 per phase from the metrics file
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+
+from config import CONFIG
+from metrics import PHASES, PhaseTimer, append_metrics
+from push_to_sheet import push_data, get_sheet, load_emiten_map, get_emiten_resolver, get_existing_link_map
+from local_sheet import get_local_sheet
+from scraper.near_dup import NearDupIndex
+from scraper.article_store import ArticleStore
+from scraper.http_cache import HTTP_MODES, make_http_client
+
+
+class RunnerLock:
+    """
+    Exclusive lock on a file (released by the OS if the process dies).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        fd = open(self.path, "a+")
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fd.seek(0)
+            holder = fd.read().strip()
+            fd.close()
+            print(f"Another runner holds {self.path} (pid {holder or '?'})")
+            return False
+
+        fd.seek(0)
+        fd.truncate()
+        fd.write(str(os.getpid()))
+        fd.flush()
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.fd.close()
+            self.fd = None
+
+
+class FixtureSession:
+    """
+    requests.Session stand-in that serves a saved search page (dry runs).
+    """
+
+    def __init__(self, html_path):
+        with open(html_path) as f:
+            self.text = f.read()
+
+    def get(self, url, headers=None, timeout=None):
+        return self
+
+    def raise_for_status(self):
+        pass
+
+
+class WarmState:
+    """
+    Connections and caches kept between ticks.
+    """
+
+    def __init__(self, dry_run=False, local_sheet_path=None, latency_ms=0, html_fixture=None,
+                 dup_index_path=None, article_store_path=None, http_mode="live", http_cache_dir=None,
+                 fixtures_dir=None, http_latency_ms=0):
+        self.dry_run = dry_run
+        self.local_sheet_path = local_sheet_path
+        self.latency_ms = latency_ms
+        if html_fixture:
+            self.session = FixtureSession(html_fixture)
+        else:
+            self.session = make_http_client(http_mode, http_cache_dir, fixtures_dir, CONFIG["HTTP_CACHE_TTL"],
+                                            http_latency_ms)
+        self.dup_index = NearDupIndex(dup_index_path or CONFIG["NEAR_DUP_INDEX_PATH"],
+                                      threshold=CONFIG["NEAR_DUP_THRESHOLD"])
+        self.article_store = ArticleStore(article_store_path or CONFIG["ARTICLE_STORE_PATH"] or "articles.sqlite")
+        self.reset()
+
+    def reset(self):
+        self.client = None
+        self.sheet = None
+        self.emiten_map = None
+        self.emiten_loaded_at = 0.0
+        self.link_map = None
+        self.links_loaded_at = 0.0
+
+    def connect(self):
+        if self.sheet is None:
+            if self.dry_run:
+                self.client, self.sheet = get_local_sheet(self.local_sheet_path, self.latency_ms)
+            else:
+                self.client, self.sheet = get_sheet()
+
+    def get_emiten_map(self, timer):
+        if self.emiten_map is None or time.time() - self.emiten_loaded_at > CONFIG["EMITEN_CACHE_TTL"]:
+            with timer.phase("match"):
+                self.emiten_map = get_emiten_resolver(load_emiten_map(self.client))
+            self.emiten_loaded_at = time.time()
+            timer.count("emiten_cache_miss")
+        else:
+            timer.count("emiten_cache_hit")
+        return self.emiten_map
+
+    def get_link_map(self, timer):
+        if self.link_map is None or time.time() - self.links_loaded_at > CONFIG["LINK_CACHE_TTL"]:
+            with timer.phase("diff"):
+                self.link_map = get_existing_link_map(self.sheet)
+            self.links_loaded_at = time.time()
+            timer.count("link_cache_miss")
+        else:
+            timer.count("link_cache_hit")
+        return self.link_map
+
+
+def run_tick(state):
+    timer = PhaseTimer()
+
+    try:
+        state.connect()
+    except Exception as e:
+        print("Failed to connect to Google Sheet: ", e)
+        timer.fail("connect_failed")
+        return timer
+
+    try:
+        emiten_map = state.get_emiten_map(timer)
+        link_map = state.get_link_map(timer)
+    except Exception as e:
+        print("Failed to read sheet: ", e)
+        state.reset()
+        timer.fail("read_failed")
+        return timer
+
+    push_data(state.client, state.sheet, emiten_map, link_map, state.session, timer, state.dup_index,
+              state.article_store)
+
+    # After a failed write the cached row numbers may be stale: reconnect and re-read
+    if timer.status in ("insert_failed", "update_failed"):
+        state.reset()
+    return timer
+
+
+def write_heartbeat(path, **fields):
+    """
+    Atomically replace the heartbeat file.
+    """
+    fields["pid"] = os.getpid()
+    fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(fields, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def report(metrics_path):
+    """
+    p50 / p95 per phase and total, from the metrics file.
+    """
+    if not os.path.exists(metrics_path):
+        print(f"No metrics file: {metrics_path}")
+        return
+
+    with open(metrics_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{len(records)} ticks in {metrics_path}")
+    statuses = {}
+    for r in records:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    print("Status: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+
+    print(f"\n{'phase':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name in PHASES + ["total"]:
+        if name == "total":
+            values = [r["duration_s"] for r in records]
+        else:
+            values = [r["phases_s"][name] for r in records if name in r["phases_s"]]
+        if values:
+            print(f"{name:<10}{_percentile(values, 0.5) * 1000:>10.1f}"
+                  f"{_percentile(values, 0.95) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Long-running scheduler for push_to_sheet",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python runner.py
+  python runner.py --once
+  python runner.py --dry-run --ticks 5 --interval 0 --latency-ms 300 --html page.html
+  python runner.py --dry-run --ticks 5 --interval 0 --http-mode replay --fixtures ./http_fixtures
+  python runner.py --report
+        """
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=CONFIG["SCHEDULER_INTERVAL"],
+        help="Seconds between tick starts"
+    )
+    parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+    parser.add_argument("--ticks", type=int, default=None, help="Stop after this many ticks")
+    parser.add_argument(
+        "--state-dir",
+        type=str,
+        default=CONFIG["SCHEDULER_STATE_DIR"],
+        help="Directory for the lockfile, heartbeat and metrics"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Write to a local JSON stand-in sheet instead of Google Sheets"
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=int,
+        default=0,
+        help="Simulated latency per stand-in sheet API call (dry run)"
+    )
+    parser.add_argument(
+        "--html",
+        type=str,
+        default=None,
+        help="Serve this saved search page instead of fetching Google News"
+    )
+    parser.add_argument(
+        "--http-mode",
+        choices=HTTP_MODES,
+        default=CONFIG["HTTP_MODE"],
+        help="Search page fetching: cached live, live + record fixtures, replay fixtures, or uncached"
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=str,
+        default=CONFIG["HTTP_FIXTURES_DIR"],
+        help="Fixture directory for --http-mode record / replay"
+    )
+    parser.add_argument(
+        "--http-latency-ms",
+        type=int,
+        default=0,
+        help="Simulated round trip per replayed request"
+    )
+    parser.add_argument("--report", action="store_true", help="Summarize the metrics file and exit")
+
+    args = parser.parse_args()
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    metrics_path = os.path.join(args.state_dir, "metrics.jsonl")
+    heartbeat_path = os.path.join(args.state_dir, "heartbeat.json")
+
+    if args.report:
+        report(metrics_path)
+        return
+
+    lock = RunnerLock(os.path.join(args.state_dir, "runner.lock"))
+    if not lock.acquire():
+        sys.exit(1)
+
+    # Set from the signal handler; waiting on it (not time.sleep) wakes up immediately
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    state = WarmState(
+        dry_run=args.dry_run,
+        local_sheet_path=os.path.join(args.state_dir, "local_sheet.json"),
+        latency_ms=args.latency_ms,
+        html_fixture=args.html,
+        dup_index_path=os.path.join(args.state_dir, "near_dup.sqlite"),
+        article_store_path=CONFIG["ARTICLE_STORE_PATH"] or os.path.join(args.state_dir, "articles.sqlite"),
+        http_mode=args.http_mode,
+        http_cache_dir=CONFIG["HTTP_CACHE_DIR"] or os.path.join(args.state_dir, "http_cache"),
+        fixtures_dir=args.fixtures,
+        http_latency_ms=args.http_latency_ms,
+    )
+    mode = "dry-run" if args.dry_run else "live"
+    max_ticks = 1 if args.once else args.ticks
+    print(f"Runner started | pid={os.getpid()} | mode={mode} | http={args.http_mode} | interval={args.interval}s")
+
+    tick = 0
+    try:
+        while not stopping.is_set():
+            tick += 1
+            tick_start = time.time()
+            write_heartbeat(heartbeat_path, status="running", tick=tick)
+
+            timer = run_tick(state)
+            record = timer.record(tick=tick, mode=mode, pid=os.getpid())
+            append_metrics(metrics_path, record)
+            print(f"[tick {tick}] {record['status']} in {record['duration_s']:.2f}s | {timer.summary()}")
+
+            if max_ticks and tick >= max_ticks:
+                break
+
+            next_run = tick_start + args.interval
+            while not stopping.is_set() and time.time() < next_run:
+                write_heartbeat(heartbeat_path, status="sleeping", tick=tick,
+                                last_status=record["status"], last_duration_s=record["duration_s"],
+                                next_run_at=datetime.fromtimestamp(next_run, timezone.utc).isoformat())
+                stopping.wait(min(CONFIG["HEARTBEAT_INTERVAL"], max(0.0, next_run - time.time())))
+    finally:
+        write_heartbeat(heartbeat_path, status="stopped", tick=tick)
+        state.dup_index.close()
+        state.article_store.close()
+        if hasattr(state.session, "close"):
+            state.session.close()
+        lock.release()
+
+    print(f"Runner stopped after {tick} ticks | metrics: {metrics_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Local SQLite store of scraped articles (one row per link).
+
+The Google Sheet is the shared view; this store is the copy the training side
+reads (news_features.py). Year and quarter are derived from published_at
+rather than taken from the sheet columns.
+
+Usage:
+  python article_store.py import --csv sheet_export.csv --db articles.sqlite
+  python article_store.py stats --db articles.sqlite
+"""
+
+import csv
+import sqlite3
+import argparse
+from datetime import datetime
+
+ARTICLE_COLUMNS = [
+    "link", "first_seen", "last_seen", "published_at", "year", "quarter", "source",
+    "title", "symbol", "is_negative", "neg_keyword", "cluster_id"
+]
+
+
+def _year_quarter(published_at):
+    try:
+        dt = datetime.strptime(str(published_at)[:19], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None, None
+    return dt.year, (dt.month - 1) // 3 + 1
+
+
+def _as_bool(value):
+    return str(value).strip().upper() in ("TRUE", "1", "1.0", "YES")
+
+
+class ArticleStore:
+    """
+    Upsert-by-link article table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                link TEXT PRIMARY KEY,
+                first_seen TEXT,
+                last_seen TEXT,
+                published_at TEXT,
+                year INTEGER,
+                quarter INTEGER,
+                source TEXT,
+                title TEXT,
+                symbol TEXT,
+                is_negative INTEGER,
+                neg_keyword TEXT,
+                cluster_id INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_symbol_year ON articles (symbol, year, quarter)")
+
+    def upsert(self, articles):
+        """
+        Insert new links; for known links refresh last_seen and the matched fields.
+        articles: dicts with (a subset of) ARTICLE_COLUMNS
+        Return: number of rows written
+        """
+        rows = []
+        for a in articles:
+            if not a.get("link"):
+                continue
+            year, quarter = _year_quarter(a.get("published_at"))
+            row = dict(a, year=year, quarter=quarter, is_negative=int(_as_bool(a.get("is_negative"))))
+            row["symbol"] = (row.get("symbol") or None) and str(row["symbol"]).upper()
+            row["cluster_id"] = int(row["cluster_id"]) if str(row.get("cluster_id") or "").strip() else None
+            rows.append(tuple(row.get(c) for c in ARTICLE_COLUMNS))
+
+        with self.conn:
+            self.conn.executemany(f"""
+                INSERT INTO articles ({", ".join(ARTICLE_COLUMNS)})
+                VALUES ({", ".join("?" * len(ARTICLE_COLUMNS))})
+                ON CONFLICT(link) DO UPDATE SET
+                    last_seen = COALESCE(excluded.last_seen, last_seen),
+                    published_at = COALESCE(excluded.published_at, published_at),
+                    year = COALESCE(excluded.year, year),
+                    quarter = COALESCE(excluded.quarter, quarter),
+                    title = COALESCE(excluded.title, title),
+                    symbol = COALESCE(excluded.symbol, symbol),
+                    is_negative = excluded.is_negative,
+                    neg_keyword = excluded.neg_keyword,
+                    cluster_id = COALESCE(cluster_id, excluded.cluster_id)
+            """, rows)
+        return len(rows)
+
+    def rows(self, since=None):
+        """
+        Stored articles as dicts, optionally only those published on / after `since`.
+        """
+        query = f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles"
+        params = ()
+        if since:
+            query += " WHERE published_at >= ?"
+            params = (str(since),)
+        return [dict(zip(ARTICLE_COLUMNS, row)) for row in self.conn.execute(query + " ORDER BY published_at", params)]
+
+    def import_csv(self, path, batch_size=10000):
+        """
+        Load a CSV export of the sheet (header row = column names).
+        """
+        total = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            batch = []
+            for row in csv.DictReader(f):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    total += self.upsert(batch)
+                    batch = []
+            total += self.upsert(batch)
+        return total
+
+    def stats(self):
+        n, n_symbol, n_negative, first, last = self.conn.execute("""
+            SELECT COUNT(*), COUNT(symbol), SUM(is_negative), MIN(published_at), MAX(published_at)
+            FROM articles
+        """).fetchone()
+        return {"articles": n, "with_symbol": n_symbol, "negative": n_negative or 0,
+                "first_published": first, "last_published": last}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local SQLite store of scraped articles",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python article_store.py import --csv sheet_export.csv --db articles.sqlite
+  python article_store.py stats --db articles.sqlite
+        """
+    )
+    parser.add_argument("command", choices=["import", "stats"])
+    parser.add_argument("--db", type=str, default="articles.sqlite", help="Article store path")
+    parser.add_argument("--csv", type=str, default=None, help="CSV export of the sheet (import)")
+
+    args = parser.parse_args()
+
+    store = ArticleStore(args.db)
+    if args.command == "import":
+        print(f"Imported {store.import_csv(args.csv):,} rows from {args.csv}")
+    print(store.stats())
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
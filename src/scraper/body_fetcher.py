@@ -0,0 +1,643 @@
+"""
+Article body stage: resolve news.google.com/read links to publisher pages,
+fetch them concurrently, extract the main text and match keywords over it.
+
+  - links are fetched through a bounded worker pool; a request is only
+    dispatched while its domain has a free slot (per_domain) and its
+    min_interval has passed, so one slow publisher does not hold the pool and
+    news.google.com (every link starts there) is never hit by more than
+    per_domain requests at once
+  - redirects are resolved hop by hop (Location header; on a Google News page
+    without one, a meta refresh, a data-n-au attribute or a non-Google
+    canonical link), and every hop waits for a slot on its own domain
+  - text extraction is a single pass of the stdlib HTMLParser (no tree): script,
+    style, nav, header, footer, aside and form content is skipped and the main
+    text is the block with the most paragraph text
+  - bodies are cached in SQLite by canonical URL (rel=canonical, else the final
+    URL without tracking parameters); links and fetched URLs map to it, so
+    syndicated copies and re-runs cost no request
+  - BodyMatcher runs the negative-keyword check over bodies with one compiled
+    alternation instead of one regex per keyword, and resolves the symbol with
+    the same EmitenResolver as headlines (aliases, acronyms, fuzzy names)
+
+Usage:
+  python body_fetcher.py serve --articles 500 --publishers 4 --latency-ms 100
+  python body_fetcher.py benchmark --articles 2000 --publishers 8 --latency-ms 200 --concurrency 32
+"""
+
+import re
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+
+import requests
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; MVP-Scraper/1.0)"}
+TIMEOUT_REQUEST = 15
+GOOGLE_NEWS_HOST = "news.google.com"
+MIN_PARAGRAPH_CHARS = 25
+MAX_PAGE_BYTES = 2_000_000
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "template"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|ocid|cmpid|ref|src)$")
+
+
+def canonical_url(url):
+    """
+    Lowercase scheme/host, no fragment, no tracking parameters, no trailing slash.
+    """
+    parts = urlsplit(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+def domain(url):
+    return urlsplit(url).netloc.lower()
+
+
+# ====================
+# EXTRACTION
+# ====================
+
+class PageExtractor(HTMLParser):
+    """
+    One pass over a page: title, canonical / redirect targets and paragraphs
+    grouped by their parent element.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []          # (tag, element id)
+        self.skip_depth = 0
+        self.next_id = 0
+        self.paragraph = None    # (parent id, [chunks]) while inside <p>
+        self.paragraphs = []     # (parent id, text)
+        self.in_title = False
+        self.title = []
+        self.canonical = None
+        self.refresh = None
+        self.data_n_au = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.data_n_au is None and attrs.get("data-n-au"):
+            self.data_n_au = attrs["data-n-au"]
+        if tag == "link" and (attrs.get("rel") or "").lower() == "canonical" and attrs.get("href"):
+            self.canonical = attrs["href"]
+        elif tag == "meta" and (attrs.get("http-equiv") or "").lower() == "refresh":
+            match = re.search(r"url\s*=\s*['\"]?([^'\"]+)", attrs.get("content") or "", re.I)
+            if match:
+                self.refresh = match.group(1).strip()
+        elif tag == "title":
+            self.in_title = True
+        if tag in VOID_TAGS:
+            return
+
+        if tag in SKIP_TAGS or self.skip_depth:
+            self.skip_depth += 1
+        elif tag == "p":
+            self._close_paragraph()
+            self.paragraph = (self.stack[-1][1] if self.stack else -1, [])
+        self.stack.append((tag, self.next_id))
+        self.next_id += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if tag in VOID_TAGS or not any(t == tag for t, _ in self.stack):
+            return
+        while self.stack:
+            open_tag, _ = self.stack.pop()
+            if self.skip_depth:
+                self.skip_depth -= 1
+            elif open_tag == "p":
+                self._close_paragraph()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif self.paragraph is not None and not self.skip_depth:
+            self.paragraph[1].append(data)
+
+    def _close_paragraph(self):
+        if self.paragraph is not None:
+            text = " ".join("".join(self.paragraph[1]).split())
+            if len(text) >= MIN_PARAGRAPH_CHARS:
+                self.paragraphs.append((self.paragraph[0], text))
+            self.paragraph = None
+
+    def main_text(self):
+        self._close_paragraph()
+        if not self.paragraphs:
+            return ""
+        sizes = Counter()
+        for parent, text in self.paragraphs:
+            sizes[parent] += len(text)
+        best = sizes.most_common(1)[0][0]
+        return "\n".join(text for parent, text in self.paragraphs if parent == best)
+
+
+def extract_page(html, base_url=None):
+    """
+    Return: dict(title, text, canonical, redirect)
+    redirect: publisher URL announced by a Google News interstitial, if any
+    """
+    parser = PageExtractor()
+    parser.feed(html[:MAX_PAGE_BYTES])
+    parser.close()
+    canonical = urljoin(base_url, parser.canonical) if base_url and parser.canonical else parser.canonical
+    redirect = parser.data_n_au or parser.refresh
+    if redirect is None and canonical and domain(canonical) != GOOGLE_NEWS_HOST:
+        redirect = canonical
+    return {
+        "title": " ".join("".join(parser.title).split()),
+        "text": parser.main_text(),
+        "canonical": canonical,
+        "redirect": urljoin(base_url, redirect) if base_url and redirect else redirect,
+    }
+
+
+# ====================
+# MATCHING
+# ====================
+
+class BodyMatcher:
+    """
+    Negative-keyword and emiten matching over article text.
+
+    negative: substring match like check_negative_news (the regex decides,
+    the reported keyword is the first in list order). emiten: the resolver
+    detect_emiten uses (EmitenResolver, see push_to_sheet.get_emiten_resolver)
+    is run per paragraph; the symbol resolved in most paragraphs wins (ties by
+    first paragraph).
+    """
+
+    def __init__(self, negative_keywords, resolver):
+        self.negative_keywords = [k.lower() for k in negative_keywords]
+        self.negative_re = self._alternation(self.negative_keywords)
+        self.resolver = resolver
+
+    @staticmethod
+    def _alternation(keywords):
+        keywords = sorted(set(keywords), key=len, reverse=True)
+        return re.compile("|".join(re.escape(k) for k in keywords)) if keywords else None
+
+    def negative(self, text):
+        """
+        Return: (is_negative, keyword | None)
+        """
+        if not text or self.negative_re is None:
+            return False, None
+        text = text.lower()
+        if not self.negative_re.search(text):
+            return False, None
+        return True, next(k for k in self.negative_keywords if k in text)
+
+    def emiten(self, text):
+        if not text:
+            return None
+        # Counter keeps first-seen order, so max() breaks ties by first paragraph
+        counts = Counter(filter(None, (self.resolver.resolve(p) for p in text.split("\n") if p.strip())))
+        return max(counts, key=counts.get) if counts else None
+
+    def match(self, text):
+        is_negative, keyword = self.negative(text)
+        return {"is_negative": is_negative, "neg_keyword": keyword, "symbol": self.emiten(text)}
+
+
+# ====================
+# CACHE
+# ====================
+
+class BodyCache:
+    """
+    SQLite: bodies by canonical URL, plus link / fetched-URL aliases pointing at them.
+    Used from the dispatching thread only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                canonical TEXT PRIMARY KEY,
+                url TEXT,
+                title TEXT,
+                text TEXT,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                canonical TEXT
+            );
+            CREATE TABLE IF NOT EXISTS failures (
+                link TEXT PRIMARY KEY,
+                error TEXT,
+                attempts INTEGER,
+                failed_at REAL
+            );
+        """)
+
+    def lookup(self, url):
+        """
+        Return: body dict for a link or fetched URL, or None
+        """
+        row = self.conn.execute("""
+            SELECT b.canonical, b.url, b.title, b.text FROM aliases a
+            JOIN bodies b ON b.canonical = a.canonical WHERE a.url = ?
+        """, (canonical_url(url),)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["canonical", "url", "title", "text"], row))
+
+    def store(self, body, aliases):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO bodies (canonical, url, title, text, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (body["canonical"], body["url"], body["title"], body["text"], time.time())
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO aliases (url, canonical) VALUES (?, ?)",
+                [(canonical_url(u), body["canonical"]) for u in aliases if u]
+            )
+            self.conn.execute("DELETE FROM failures WHERE link IN ({})".format(",".join("?" * len(aliases))), aliases)
+
+    def fail(self, link, error):
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO failures (link, error, attempts, failed_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT(link) DO UPDATE SET error = excluded.error, attempts = attempts + 1,
+                    failed_at = excluded.failed_at
+            """, (link, error, time.time()))
+
+    def stats(self):
+        bodies, aliases, failures = (self.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                                     for t in ("bodies", "aliases", "failures"))
+        return {"bodies": bodies, "aliases": aliases, "failures": failures}
+
+    def close(self):
+        self.conn.close()
+
+
+# ====================
+# FETCHER
+# ====================
+
+class BodyFetcher:
+    """
+    Bounded concurrent resolve -> fetch -> extract over a list of links.
+    """
+
+    def __init__(self, cache, concurrency=16, per_domain=2, min_interval=0.0, session_factory=None,
+                 max_hops=5):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.min_interval = min_interval
+        self.session_factory = session_factory or requests.Session
+        self.max_hops = max_hops
+        self.local = threading.local()
+
+    def _session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = self.session_factory()
+        return self.local.session
+
+    def fetch_step(self, job):
+        """
+        One request for a job. Redirects are not followed here: the next URL
+        goes back to the dispatcher and waits for a slot on its own domain.
+        Return: the job with either a body or the next URL
+        """
+        resp = self._session().get(job["url"], headers=HEADERS, timeout=TIMEOUT_REQUEST, allow_redirects=False)
+        if resp.is_redirect and resp.headers.get("Location"):
+            return self._hop(job, urljoin(job["url"], resp.headers["Location"]))
+        resp.raise_for_status()
+
+        page = extract_page(resp.text, job["url"])
+        if domain(job["url"]) == GOOGLE_NEWS_HOST or (page["redirect"] and not page["text"]):
+            if not page["redirect"]:
+                raise ValueError("unresolved redirect")
+            return self._hop(job, page["redirect"])
+        job["body"] = {
+            "canonical": canonical_url(page["canonical"] or job["url"]),
+            "url": job["url"],
+            "title": page["title"],
+            "text": page["text"],
+        }
+        return job
+
+    def _hop(self, job, url):
+        if job["hops"] >= self.max_hops:
+            raise ValueError(f"more than {self.max_hops} redirects")
+        job["seen"].append(job["url"])
+        job["hops"] += 1
+        job["url"] = url
+        return job
+
+    def fetch(self, links, progress_every=0):
+        """
+        Bodies for the links (cached ones without a request).
+        Return: ({link: body dict}, stats)
+        """
+        results = {}
+        stats = {"cached": 0, "fetched": 0, "failed": 0, "requests": 0, "max_in_flight_domain": 0}
+        ready = deque()
+        for link in dict.fromkeys(links):
+            body = self.cache.lookup(link)
+            if body is not None:
+                results[link] = body
+                stats["cached"] += 1
+            else:
+                ready.append({"link": link, "url": link, "hops": 0, "seen": []})
+
+        waiting = {}          # domain -> deque of jobs
+        in_flight = Counter() # domain -> requests running
+        last_start = {}       # domain -> monotonic time of last dispatch
+        started = time.time()
+
+        def dispatchable(dom):
+            return (in_flight[dom] < self.per_domain
+                    and time.monotonic() - last_start.get(dom, -1e9) >= self.min_interval)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {}
+            while ready or waiting or futures:
+                while ready:
+                    job = ready.popleft()
+                    body = self.cache.lookup(job["url"]) if job["hops"] else None
+                    if body is not None:
+                        self.cache.store(body, [job["link"], job["url"]] + job["seen"])
+                        results[job["link"]] = body
+                        stats["cached"] += 1
+                        continue
+                    waiting.setdefault(domain(job["url"]), deque()).append(job)
+
+                for dom in list(waiting):
+                    while waiting[dom] and len(futures) < self.concurrency and dispatchable(dom):
+                        job = waiting[dom].popleft()
+                        in_flight[dom] += 1
+                        last_start[dom] = time.monotonic()
+                        stats["max_in_flight_domain"] = max(stats["max_in_flight_domain"], in_flight[dom])
+                        futures[pool.submit(self.fetch_step, job)] = (dom, job)
+                    if not waiting[dom]:
+                        del waiting[dom]
+
+                if not futures:
+                    time.sleep(self.min_interval / 4 or 0.001)
+                    continue
+                done, _ = wait(futures, timeout=self.min_interval or None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dom, job = futures.pop(future)
+                    in_flight[dom] -= 1
+                    stats["requests"] += 1
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        self.cache.fail(job["link"], f"{type(e).__name__}: {e}")
+                        stats["failed"] += 1
+                        continue
+                    if "body" in job:
+                        self.cache.store(job["body"], [job["link"], job["url"]] + job["seen"])
+                        results[job["link"]] = job["body"]
+                        stats["fetched"] += 1
+                        if progress_every and stats["fetched"] % progress_every == 0:
+                            print(f"  {stats['fetched']:,} bodies fetched | {stats['failed']} failed | "
+                                  f"{stats['fetched'] / (time.time() - started):.1f}/s")
+                    else:
+                        ready.append(job)
+
+        stats["elapsed_s"] = time.time() - started
+        return results, stats
+
+
+# ====================
+# FIXTURE SERVER
+# ====================
+
+PARAGRAPHS = [
+    "{bank} mencatatkan kinerja kuartalan yang {tone} dibandingkan periode yang sama tahun lalu.",
+    "Manajemen {bank} menyebutkan rasio kredit bermasalah berada di level {npl} persen pada akhir periode.",
+    "Analis menilai {event} akan mempengaruhi likuiditas perseroan dalam beberapa kuartal ke depan.",
+    "Otoritas Jasa Keuangan terus memantau perkembangan {bank} sesuai ketentuan yang berlaku.",
+    "Saham perseroan ditutup {move} pada perdagangan sesi kedua di Bursa Efek Indonesia.",
+]
+EVENTS = ["rencana rights issue", "kasus gagal bayar obligasi", "restrukturisasi kredit", "pembagian dividen",
+          "penurunan peringkat", "rencana merger", "kredit macet", "ekspansi digital"]
+
+
+def fixture_article(i, bank, paragraphs=12):
+    """
+    Publisher page: navigation, scripts and footer around an <article> of paragraphs.
+    """
+    body = "".join(
+        "<p>" + PARAGRAPHS[(i + k) % len(PARAGRAPHS)].format(
+            bank=bank, tone="melemah" if i % 3 else "menguat", npl=2 + i % 5,
+            event=EVENTS[(i + k) % len(EVENTS)], move="melemah" if i % 2 else "menguat"
+        ) + "</p>"
+        for k in range(paragraphs)
+    )
+    boilerplate = "".join(f'<li><a href="/tag/{k}">Topik populer {k} tentang {EVENTS[k % len(EVENTS)]}</a></li>'
+                          for k in range(30))
+    return (
+        f'<html><head><title>{bank} berita {i}</title><link rel="canonical" href="/news/{i}">'
+        f"<script>var ads = {{slot: 'top', id: {i}}};</script><style>p {{margin: 0}}</style></head><body>"
+        f"<header><nav><ul>{boilerplate}</ul></nav></header>"
+        f'<div class="content"><article><h1>{bank} berita {i}</h1>{body}</article>'
+        f"<aside><p>Baca juga: artikel terkait lainnya tentang perbankan nasional hari ini.</p></aside></div>"
+        f"<footer><p>Hak cipta dilindungi undang-undang. Seluruh isi situs ini milik penerbit.</p></footer>"
+        f"</body></html>"
+    )
+
+
+class FixtureServers:
+    """
+    Local stand-ins: one "Google News" server answering /read/<i> with a 302
+    (even i) or an interstitial page with data-n-au (odd i), and `publishers`
+    publisher servers (one port = one domain) serving /news/<i>. Every request
+    sleeps latency_ms; peak concurrent requests per server are recorded.
+    """
+
+    def __init__(self, articles=500, publishers=4, latency_ms=100, banks=None):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        self.articles = articles
+        self.banks = banks or [f"Bank Contoh {k}" for k in range(40)]
+        self.servers = []
+        fixtures = self
+
+        def handler(kind):
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    state = self.server.fixture_state
+                    with state["lock"]:
+                        state["active"] += 1
+                        state["requests"] += 1
+                        state["peak"] = max(state["peak"], state["active"])
+                    try:
+                        time.sleep(latency_ms / 1000)
+                        fixtures._respond(self, kind)
+                    finally:
+                        with state["lock"]:
+                            state["active"] -= 1
+
+                def send_html(self, status, html, headers=()):
+                    data = html.encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    for k, v in headers:
+                        self.send_header(k, v)
+                    self.end_headers()
+                    self.wfile.write(data)
+            return Handler
+
+        for kind in ["google"] + [f"pub{k}" for k in range(publishers)]:
+            server = ThreadingHTTPServer(("127.0.0.1", 0), handler(kind))
+            server.daemon_threads = True
+            server.fixture_state = {"lock": threading.Lock(), "active": 0, "peak": 0, "requests": 0}
+            self.servers.append(server)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.google = self.servers[0]
+        self.publishers = self.servers[1:]
+
+    def base(self, server):
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    def publisher_url(self, i):
+        return f"{self.base(self.publishers[i % len(self.publishers)])}/news/{i}?utm_source=gnews"
+
+    def links(self):
+        return [f"{self.base(self.google)}/read/ART{i}" for i in range(self.articles)]
+
+    def _respond(self, req, kind):
+        path = req.path.split("?")[0]
+        if kind == "google" and path.startswith("/read/ART"):
+            i = int(path[len("/read/ART"):])
+            if i % 2 == 0:
+                return req.send_html(302, "", [("Location", self.publisher_url(i))])
+            return req.send_html(200, f'<html><body><c-wiz data-n-au="{self.publisher_url(i)}">'
+                                      f'<a href="{self.publisher_url(i)}">Buka</a></c-wiz></body></html>')
+        if kind != "google" and path.startswith("/news/"):
+            i = int(path[len("/news/"):])
+            return req.send_html(200, fixture_article(i, self.banks[i % len(self.banks)]))
+        req.send_html(404, "not found")
+
+    def stats(self):
+        return {("google" if s is self.google else self.base(s)): dict(peak=s.fixture_state["peak"],
+                                                                        requests=s.fixture_state["requests"])
+                for s in self.servers}
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+
+def benchmark(articles, publishers, latency_ms, concurrency, per_domain):
+    banks = [f"Bank Contoh {k}" for k in range(40)]
+    emiten_map = {f"BK{k:02d}": [bank.lower()] for k, bank in enumerate(banks)}
+    negative_keywords = ["gagal bayar", "kredit macet", "penurunan peringkat", "restrukturisasi kredit",
+                         "kredit bermasalah", "likuiditas"]
+    servers = FixtureServers(articles, publishers, latency_ms, banks)
+    work_dir = tempfile.mkdtemp(prefix="body_fetcher_bench_")
+    try:
+        cache = BodyCache(f"{work_dir}/bodies.sqlite")
+        fetcher = BodyFetcher(cache, concurrency=concurrency, per_domain=per_domain)
+        bodies, stats = fetcher.fetch(servers.links())
+        print(f"Fetched {stats['fetched']:,} bodies ({stats['requests']:,} requests, {stats['failed']} failed) "
+              f"in {stats['elapsed_s']:.1f}s = {stats['fetched'] / stats['elapsed_s']:.1f} bodies/s "
+              f"(concurrency {concurrency}, {per_domain} per domain, {latency_ms} ms latency)")
+        print("Peak concurrent requests per server: "
+              + ", ".join(f"{name.rsplit(':', 1)[-1]}={s['peak']}" for name, s in servers.stats().items()))
+        sequential_s = stats["requests"] * latency_ms / 1000
+        print(f"Sequential at the same latency: ~{sequential_s:.0f}s")
+
+        _, again = fetcher.fetch(servers.links())
+        print(f"Second run: {again['cached']:,} from cache, {again['requests']} requests")
+
+        pages = [fixture_article(i, banks[i % len(banks)]) for i in range(200)]
+        start = time.perf_counter()
+        for page in pages:
+            extract_page(page)
+        extract_ms = (time.perf_counter() - start) / len(pages) * 1000
+        from bs4 import BeautifulSoup
+        start = time.perf_counter()
+        for page in pages[:50]:
+            BeautifulSoup(page, "html.parser").get_text(" ")
+        bs4_ms = (time.perf_counter() - start) / 50 * 1000
+        print(f"Extraction: {extract_ms:.2f} ms/page (BeautifulSoup get_text: {bs4_ms:.2f} ms/page)")
+
+        from emiten_resolver import EmitenResolver
+        texts = [b["text"] for b in bodies.values()]
+        matcher = BodyMatcher(negative_keywords, EmitenResolver(emiten_map))
+        start = time.perf_counter()
+        matches = [matcher.match(t) for t in texts]
+        combined_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for t in texts:
+            low = t.lower()
+            next((k for k in negative_keywords if k in low), None)
+            next((c for c, kws in emiten_map.items() for kw in kws if re.search(rf"\b{re.escape(kw)}\b", low)), None)
+        loop_s = time.perf_counter() - start
+        print(f"Matching: {len(texts) / combined_s:,.0f} bodies/s combined regex + resolver vs "
+              f"{len(texts) / loop_s:,.0f} bodies/s per-keyword loop | "
+              f"{sum(m['is_negative'] for m in matches):,} negative, "
+              f"{sum(m['symbol'] is not None for m in matches):,} with symbol")
+        cache.close()
+    finally:
+        servers.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Article body fetcher with redirect resolution and local fixture servers",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python body_fetcher.py serve --articles 500 --publishers 4 --latency-ms 100
+  python body_fetcher.py benchmark --articles 2000 --publishers 8 --latency-ms 200 --concurrency 32
+        """
+    )
+    parser.add_argument("command", choices=["serve", "benchmark"])
+    parser.add_argument("--articles", type=int, default=1000, help="Fixture articles")
+    parser.add_argument("--publishers", type=int, default=8, help="Fixture publisher domains")
+    parser.add_argument("--latency-ms", type=int, default=200, help="Fixture server latency per request")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--per-domain", type=int, default=4, help="Requests in flight per domain")
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.articles, args.publishers, args.latency_ms, args.concurrency, args.per_domain)
+        return
+
+    servers = FixtureServers(args.articles, args.publishers, args.latency_ms)
+    print(f"Google News stand-in: {servers.base(servers.google)}/read/ART0 .. ART{args.articles - 1}")
+    for server in servers.publishers:
+        print(f"Publisher: {servers.base(server)}/news/<i>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servers.close()
+
+
+if __name__ == "__main__":
+    main()
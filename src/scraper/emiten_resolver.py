@@ -0,0 +1,378 @@
+"""
+Emiten (issuer) resolution for headlines: exact alias lookup, then fuzzy
+matching through a character-trigram inverted index.
+
+The Sheet2 keywords of every symbol are its aliases. Derived aliases are added:
+the name without legal words (pt, tbk, persero), without a trailing
+"indonesia" (when two or more words are left), and its initials ("bank rakyat
+indonesia" -> "bri"). A derived alias claimed by two symbols is dropped.
+Initials only match a token written as an acronym ("BRI", "B.R.I."): lowercase
+they are often plain words ("bank artha graha internasional" -> "bagi").
+
+Resolution of a text:
+  1. normalize: ASCII lowercase, dotted acronyms joined ("B.R.I." -> "bri"),
+     punctuation and legal words removed
+  2. exact: every token n-gram (up to the longest alias) is looked up in a
+     dict (initials: single acronym tokens only); the longest, leftmost hit
+     wins with score 1.0, unless the n-grams extending it fuzzily match
+     (step 3) a longer alias that starts with the hit
+  3. fuzzy: only runs of name-like tokens are searched. A token is name-like
+     if it is an alias word or close to one (Dice >= TOKEN_MIN_SCORE through
+     a trigram index of alias words; cached, headline vocabulary repeats).
+     For each n-gram of such a run with at least FUZZY_MIN_CHARS characters,
+     aliases sharing trigrams are collected from the alias index (trigrams in
+     more than STOP_GRAM_SHARE of the aliases, like "ban", are not used for
+     retrieval) and scored by Dice similarity of trigram sets. The best symbol
+     wins if its score reaches the threshold and no other symbol scores within
+     the margin of it. Aliases shorter than FUZZY_MIN_CHARS (tickers,
+     acronyms) only match exactly
+
+Usage:
+  python emiten_resolver.py query "B.R.I. catat laba" --emiten emiten.csv
+  python emiten_resolver.py benchmark --issuers 3000 --articles 5000
+"""
+
+import re
+import csv
+import time
+import random
+import argparse
+import unicodedata
+from collections import Counter
+
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_MARGIN = 0.05
+FUZZY_MIN_CHARS = 5
+TOKEN_MIN_SCORE = 0.5
+STOP_GRAM_SHARE = 0.05
+TOKEN_CACHE_SIZE = 200_000
+LEGAL_WORDS = {"pt", "tbk", "persero"}
+GENERIC_SUFFIXES = {"indonesia"}
+
+_ACRONYM = re.compile(r"(?<![a-z0-9])(?:[a-z]\.){2,}[a-z]?(?![a-z0-9])", re.I)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_WORD = re.compile(r"[A-Za-z0-9]+")
+
+
+def _ascii(text):
+    return unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+
+
+def normalize(text):
+    text = _ACRONYM.sub(lambda m: m.group(0).replace(".", ""), _ascii(text).lower())
+    return [t for t in _NON_ALNUM.sub(" ", text).split() if t not in LEGAL_WORDS]
+
+
+def acronym_tokens(text):
+    """
+    Return: normalized tokens written as acronyms: dotted ("B.R.I."), or upper
+    case ("BRI") in a text that is not all upper case
+    """
+    text = _ascii(text)
+    found = {m.group(0).replace(".", "").lower() for m in _ACRONYM.finditer(text)}
+    if any(c.islower() for c in text):
+        found.update(w.lower() for w in _WORD.findall(_ACRONYM.sub(" ", text)) if len(w) >= 2 and w.isupper())
+    return found
+
+
+def trigrams(text):
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def derived_aliases(tokens):
+    """
+    Return: (name variants, initials or None) derived from one normalized keyword
+    """
+    variants = []
+    stripped = list(tokens)
+    while len(stripped) > 2 and stripped[-1] in GENERIC_SUFFIXES:
+        stripped.pop()
+    if stripped != tokens:
+        variants.append(" ".join(stripped))
+    initials = "".join(t[0] for t in tokens) if len(tokens) >= 3 else None
+    return variants, initials
+
+
+class EmitenResolver:
+    """
+    Trigram index over the aliases of an emiten map ({symbol: [keywords]}).
+    """
+
+    def __init__(self, emiten_map, threshold=DEFAULT_THRESHOLD, margin=DEFAULT_MARGIN):
+        self.threshold = threshold
+        self.margin = margin
+
+        explicit, derived, initials = {}, {}, {}
+        for symbol, keywords in emiten_map.items():
+            for keyword in keywords:
+                tokens = normalize(keyword)
+                if not tokens:
+                    continue
+                explicit.setdefault(" ".join(tokens), symbol)
+                variants, acronym = derived_aliases(tokens)
+                for alias in variants:
+                    derived.setdefault(alias, set()).add(symbol)
+                if acronym:
+                    initials.setdefault(acronym, set()).add(symbol)
+
+        aliases = dict(explicit)
+        for alias, symbols in derived.items():
+            if alias not in aliases and len(symbols) == 1:
+                aliases[alias] = symbols.pop()
+        # Kept apart from the case-insensitive exact table: only matched as acronyms
+        self.initials = {
+            alias: symbols.pop() for alias, symbols in initials.items()
+            if alias not in aliases and len(symbols) == 1
+        }
+
+        self.alias_names = list(aliases)
+        self.alias_symbols = [aliases[a] for a in self.alias_names]
+        self.alias_grams = [trigrams(a) for a in self.alias_names]
+        self.exact = {a: i for i, a in enumerate(self.alias_names)}
+        self.max_tokens = max((len(a.split()) for a in self.alias_names), default=0)
+
+        postings = {}
+        for i, alias in enumerate(self.alias_names):
+            if len(alias) >= FUZZY_MIN_CHARS:
+                for gram in self.alias_grams[i]:
+                    postings.setdefault(gram, []).append(i)
+        max_df = max(50, int(STOP_GRAM_SHARE * len(self.alias_names)))
+        self.postings = {g: ids for g, ids in postings.items() if len(ids) <= max_df}
+
+        self.words = sorted({w for a in self.alias_names if len(a) >= FUZZY_MIN_CHARS for w in a.split()})
+        self.word_grams = [trigrams(w) for w in self.words]
+        self.word_postings = {}
+        for i, grams in enumerate(self.word_grams):
+            for gram in grams:
+                self.word_postings.setdefault(gram, []).append(i)
+        self.word_set = set(self.words)
+        self.token_cache = {}
+
+    def _name_like(self, token):
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            return cached
+        found = token in self.word_set
+        if not found and len(token) >= 3:
+            grams = trigrams(token)
+            counts = Counter()
+            for gram in grams:
+                ids = self.word_postings.get(gram)
+                if ids:
+                    counts.update(ids)
+            found = any(2 * c / (len(grams) + len(self.word_grams[i])) >= TOKEN_MIN_SCORE
+                        for i, c in counts.items())
+        if len(self.token_cache) >= TOKEN_CACHE_SIZE:
+            self.token_cache.clear()
+        self.token_cache[token] = found
+        return found
+
+    def __len__(self):
+        return len(self.alias_names) + len(self.initials)
+
+    def match(self, text):
+        """
+        Return: dict(symbol, score, alias) or None
+        """
+        tokens = normalize(text)
+        spans = [(n, i) for n in range(min(self.max_tokens, len(tokens)), 0, -1)
+                 for i in range(len(tokens) - n + 1)]
+
+        acronyms = None
+        for n, i in spans:
+            window = " ".join(tokens[i:i + n])
+            alias_id = self.exact.get(window)
+            if alias_id is not None:
+                symbol, alias = self.alias_symbols[alias_id], self.alias_names[alias_id]
+            elif n == 1 and window in self.initials:
+                if acronyms is None:
+                    acronyms = acronym_tokens(text)
+                if window not in acronyms:
+                    continue
+                symbol, alias = self.initials[window], window
+            else:
+                continue
+            # "bank x" is exact, but "bank x y" may be a misspelled longer name: only
+            # aliases that extend the hit ("bank x ...") may override it
+            longer = [(m, i) for m in range(n + 1, min(self.max_tokens, len(tokens) - i) + 1)]
+            return self._fuzzy(tokens, longer, prefix=window + " ") or {"symbol": symbol, "score": 1.0, "alias": alias}
+        return self._fuzzy(tokens, spans)
+
+    def _fuzzy(self, tokens, spans, prefix=None):
+        scores = {}  # symbol -> (score, alias id)
+        floor = self.threshold - self.margin
+        name_like = None
+        for n, i in spans:
+            if name_like is None:
+                name_like = [self._name_like(t) for t in tokens]
+            if not all(name_like[i:i + n]):
+                continue
+            window = " ".join(tokens[i:i + n])
+            if len(window) < FUZZY_MIN_CHARS:
+                continue
+            grams = trigrams(window)
+            counts = Counter()
+            for gram in grams:
+                ids = self.postings.get(gram)
+                if ids:
+                    counts.update(ids)
+            for alias_id in counts:
+                if prefix is not None and not self.alias_names[alias_id].startswith(prefix):
+                    continue
+                alias_grams = self.alias_grams[alias_id]
+                size = len(grams) + len(alias_grams)
+                # Dice can't reach the floor: skip the set intersection
+                if 2 * min(len(grams), len(alias_grams)) < floor * size:
+                    continue
+                score = 2 * len(grams & alias_grams) / size
+                symbol = self.alias_symbols[alias_id]
+                if score >= floor and score > scores.get(symbol, (0.0,))[0]:
+                    scores[symbol] = (score, alias_id)
+
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1][0])
+        if not ranked or ranked[0][1][0] < self.threshold:
+            return None
+        # A runner-up within the margin makes the match ambiguous
+        if len(ranked) > 1 and ranked[1][1][0] > ranked[0][1][0] - self.margin:
+            return None
+        symbol, (score, alias_id) = ranked[0]
+        return {"symbol": symbol, "score": score, "alias": self.alias_names[alias_id]}
+
+    def resolve(self, text):
+        match = self.match(text)
+        return match["symbol"] if match else None
+
+
+def load_emiten_csv(path):
+    """
+    symbol,keywords CSV (same layout as Sheet2).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        return {
+            row["symbol"].upper(): [k.strip().lower() for k in row["keywords"].split(",") if k.strip()]
+            for row in csv.DictReader(f)
+        }
+
+
+# ====================
+# BENCHMARK
+# ====================
+
+def synthetic_issuers(n, seed=42):
+    """
+    {symbol: [name]} with names like "bank sudamaru" / "bank lorentika jaya indonesia".
+    """
+    rng = random.Random(seed)
+    syllables = ["ba", "ri", "ma", "ndi", "su", "ka", "ra", "to", "ja", "ya", "lo", "re", "ti", "nu", "sa",
+                 "di", "ko", "pe", "la", "win", "dan", "mu", "ga", "se", "jo"]
+    emiten_map = {}
+    cores = set()
+    while len(emiten_map) < n:
+        core = " ".join("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+                        for _ in range(rng.randint(1, 2)))
+        if core in cores:
+            continue
+        cores.add(core)
+        suffix = " indonesia" if rng.random() < 0.3 else ""
+        emiten_map[f"B{len(emiten_map):04d}"] = [f"bank {core}{suffix}"]
+    return emiten_map
+
+
+def synthetic_headlines(emiten_map, n, seed=7):
+    """
+    Return: [(headline, symbol | None)] mixing exact names, dotted acronyms,
+    misspellings, names without "indonesia" and headlines without a bank
+    """
+    rng = random.Random(seed)
+    symbols = list(emiten_map)
+    events = ["catat laba bersih naik", "hadapi kredit macet", "umumkan rights issue", "gagal bayar obligasi",
+              "bagikan dividen tunai", "peringkat diturunkan", "siapkan merger", "restrukturisasi kredit"]
+    rows = []
+    for k in range(n):
+        event = rng.choice(events)
+        kind = k % 5
+        if kind == 4:
+            rows.append((f"IHSG ditutup menguat, investor {event} di sektor ritel", None))
+            continue
+        symbol = rng.choice(symbols)
+        name = emiten_map[symbol][0]
+        words = name.split()
+        if kind == 1 and len(words) >= 3:
+            name = ".".join(w[0].upper() for w in words) + "."
+        elif kind == 2:
+            w = max(range(1, len(words)), key=lambda j: len(words[j]))
+            pos = rng.randrange(1, len(words[w]) - 1)
+            words[w] = words[w][:pos] + words[w][pos + 1:]
+            name = " ".join(words)
+        elif kind == 3 and words[-1] == "indonesia" and len(words) > 3:
+            name = " ".join(words[:-1])
+        rows.append((f"{name.title()} {event} pada kuartal {rng.randint(1, 4)}", symbol))
+    return rows
+
+
+def benchmark(issuers, articles, threshold):
+    emiten_map = synthetic_issuers(issuers)
+    headlines = synthetic_headlines(emiten_map, articles)
+
+    start = time.perf_counter()
+    resolver = EmitenResolver(emiten_map, threshold)
+    build_s = time.perf_counter() - start
+    print(f"Index: {len(resolver):,} aliases for {issuers:,} issuers, {len(resolver.postings):,} trigrams "
+          f"in {build_s * 1000:.0f} ms")
+
+    def regex_loop(text):
+        text = text.lower()
+        for code, keywords in emiten_map.items():
+            for kw in keywords:
+                if re.search(rf"\b{re.escape(kw)}\b", text):
+                    return code
+        return None
+
+    def evaluate(fn, rows):
+        start = time.perf_counter()
+        predicted = [fn(text) for text, _ in rows]
+        per_article_ms = (time.perf_counter() - start) / len(rows) * 1000
+        with_bank = [(p, s) for p, (_, s) in zip(predicted, rows) if s is not None]
+        recall = sum(p == s for p, s in with_bank) / len(with_bank)
+        wrong = sum(p is not None and p != s for p, (_, s) in zip(predicted, rows))
+        return per_article_ms, recall, wrong / len(rows)
+
+    for name, fn, rows in [("regex loop", regex_loop, headlines[:min(len(headlines), 500)]),
+                           ("resolver", resolver.resolve, headlines)]:
+        ms, recall, wrong = evaluate(fn, rows)
+        print(f"  {name:<11}{ms:>8.3f} ms/article | recall {recall:.3f} | wrong symbol {wrong:.3%} "
+              f"({len(rows):,} headlines)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fuzzy emiten resolution with a trigram index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python emiten_resolver.py query "B.R.I. catat laba" --emiten emiten.csv
+  python emiten_resolver.py benchmark --issuers 3000 --articles 5000
+        """
+    )
+    parser.add_argument("command", choices=["query", "benchmark"])
+    parser.add_argument("text", nargs="?", default=None, help="Headline (query)")
+    parser.add_argument("--emiten", type=str, default=None, help="symbol,keywords CSV (query)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum fuzzy score")
+    parser.add_argument("--issuers", type=int, default=3000, help="Synthetic issuers (benchmark)")
+    parser.add_argument("--articles", type=int, default=5000, help="Synthetic headlines (benchmark)")
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.issuers, args.articles, args.threshold)
+        return
+
+    if not args.text or not args.emiten:
+        parser.error("query needs a text and --emiten")
+    resolver = EmitenResolver(load_emiten_csv(args.emiten), args.threshold)
+    print(resolver.match(args.text))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
@@ -31,19 +31,34 @@ def get_year_and_quarter(dt: datetime):
     quarter = (dt.month - 1) // 3 + 1
     return dt.year, quarter
 
-def scrape_google_news(limit=10):
+def fetch_search_response(session=None):
+    """
+    Download the Google News search page.
+    Pass a requests.Session to reuse its keep-alive connection across runs, or
+    an http_cache.HttpCache to revalidate against the cached copy.
+    Return: response (raise_for_status already called)
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (compatible; MVP-Scraper/1.0)"
     }
 
-    resp = requests.get(SEARCH_URL, headers=headers, timeout=TIMEOUT_REQUEST)
+    resp = (session or requests).get(SEARCH_URL, headers=headers, timeout=TIMEOUT_REQUEST)
     resp.raise_for_status()
+    return resp
+
+def fetch_search_page(session=None):
+    return fetch_search_response(session).text
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+def parse_articles(html, limit=10, verbose=True):
+    """
+    Extract articles from a Google News search page.
+    """
+    soup = BeautifulSoup(html, "html.parser")
 
     articles = []
     cards = soup.select("c-wiz.PO9Zff")
-    print(f"Found cards: {len(cards)}")
+    if verbose:
+        print(f"Found cards: {len(cards)}")
 
     for card in cards:
         # title + link
@@ -85,6 +100,47 @@ def scrape_google_news(limit=10):
 
     return articles
 
+def parse_search_response(resp, limit=10):
+    """
+    parse_articles on a fetched response. Responses from http_cache.HttpCache
+    reuse the articles parsed from the same body (e.g. after a 304).
+    Return: (articles, reused)
+    """
+    cache = getattr(resp, "cache", None)
+    if cache is None:
+        return parse_articles(resp.text, limit=limit), False
+    return cache.derived(resp.digest, f"articles-{limit}", lambda: parse_articles(resp.text, limit=limit))
+
+def synthetic_search_page(n=100, start=None, days=None, prefix="SYNTH"):
+    """
+    Search page with n article cards in the markup parse_articles expects
+    (offline fixtures and benchmarks). With start (datetime) and days, the
+    cards are spread over that window; links are ./read/<prefix><i>.
+    """
+    events = ["laba bersih naik", "kredit macet meningkat", "rights issue", "gagal bayar obligasi",
+              "dividen tunai", "penurunan peringkat", "merger", "restrukturisasi kredit"]
+
+    def published(i):
+        if start is None:
+            return f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T07:00:00Z"
+        return (start + timedelta(days=days * i / max(n, 1))).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    cards = []
+    for i in range(n):
+        cards.append(
+            f'<c-wiz class="PO9Zff"><article>'
+            f'<a class="JtKRv" href="./read/{prefix}{i:05d}">Bank Contoh {i % 40} {events[i % len(events)]} '
+            f'kuartal {i % 4 + 1}</a>'
+            f'<div class="vr1PYe">Sumber {i % 12}</div>'
+            f'<time class="hvbAAd" datetime="{published(i)}"></time>'
+            f'</article></c-wiz>'
+        )
+    return f"<html><body>{''.join(cards)}</body></html>"
+
+def scrape_google_news(limit=10, session=None):
+    articles, _ = parse_search_response(fetch_search_response(session), limit=limit)
+    return articles
+
 
 if __name__ == "__main__":
     data = scrape_google_news(limit=5)
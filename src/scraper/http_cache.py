@@ -0,0 +1,408 @@
+"""
+HTTP layer for the scraper: on-disk response cache, conditional revalidation,
+fixture record / replay.
+
+HttpCache wraps a keep-alive requests.Session and has the same .get() call, so
+it can be passed wherever fetch_search_page takes a session:
+
+  - a response younger than the TTL is served from disk without a request
+  - older ones are revalidated with If-None-Match / If-Modified-Since; a 304
+    costs one round trip and no body
+  - derived results (the parsed article list) are cached by body digest, so an
+    unchanged page is not parsed again either
+  - on a network error or 5xx, the stale copy is served if there is one
+
+Record mode additionally writes every page body to a fixture directory.
+ReplaySession serves those fixtures with a stable ETag (answering conditional
+requests with 304) and optional simulated latency, so the parser, the cache and
+the whole push pipeline run offline.
+
+Usage:
+  python http_cache.py record --fixtures ./http_fixtures
+  python http_cache.py synth --fixtures ./http_fixtures --n 100
+  python http_cache.py benchmark --fixtures ./http_fixtures --latency-ms 300
+  python http_cache.py stats --cache ./http_cache
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from email.utils import formatdate
+
+import requests
+
+HTTP_MODES = ["live", "record", "replay", "off"]
+DEFAULT_TTL = 300
+USER_AGENT = "Mozilla/5.0 (compatible; MVP-Scraper/1.0)"
+
+# Response headers kept with cached entries and fixtures
+KEPT_HEADERS = ["ETag", "Last-Modified", "Content-Type", "Cache-Control"]
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class StoredResponse:
+    """
+    Minimal requests.Response stand-in for cached and replayed pages.
+    cache_status: fresh | not_modified | fetched | stale | replay
+    """
+
+    def __init__(self, url, status_code, headers, content, cache_status, digest=None, cache=None,
+                 changed=False, encoding="utf-8"):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.cache_status = cache_status
+        self.digest = digest or hashlib.sha256(content).hexdigest()
+        self.cache = cache
+        self.changed = changed
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+
+# ====================
+# FIXTURES
+# ====================
+
+class FixtureStore:
+    """
+    Raw pages by URL: <dir>/<key>.html plus index.json (url, status, headers, recorded_at).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def save(self, url, content, headers=None, status=200):
+        key = url_key(url)
+        digest = hashlib.sha256(content).hexdigest()
+        if self.index.get(url, {}).get("digest") == digest:
+            return
+        _write_atomic(os.path.join(self.path, f"{key}.html"), content)
+        self.index[url] = {
+            "file": f"{key}.html",
+            "status": status,
+            "headers": {k: v for k, v in (headers or {}).items() if k in KEPT_HEADERS},
+            "digest": digest,
+            "recorded_at": time.time(),
+        }
+        _write_atomic(self.index_path, json.dumps(self.index, indent=2).encode())
+
+    def load(self, url):
+        """
+        Return: (meta, content) or None
+        """
+        meta = self.index.get(url)
+        if meta is None:
+            return None
+        with open(os.path.join(self.path, meta["file"]), "rb") as f:
+            return meta, f.read()
+
+
+class FixtureMissing(LookupError):
+    pass
+
+
+class ReplaySession:
+    """
+    requests.Session stand-in serving recorded fixtures (no network).
+    Every page gets an ETag (recorded or derived from its digest) and matching
+    conditional requests get a 304. latency_ms simulates the round trip.
+    """
+
+    def __init__(self, fixtures, latency_ms=0):
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.requests = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        found = self.fixtures.load(url)
+        if found is None:
+            raise FixtureMissing(f"No fixture recorded for {url}")
+        meta, content = found
+        response_headers = dict(meta["headers"])
+        response_headers.setdefault("ETag", f'"{meta["digest"][:16]}"')
+        response_headers.setdefault("Last-Modified", formatdate(meta["recorded_at"], usegmt=True))
+
+        if (headers or {}).get("If-None-Match") == response_headers["ETag"]:
+            return StoredResponse(url, 304, response_headers, b"", "replay")
+        return StoredResponse(url, meta["status"], response_headers, content, "replay", meta["digest"])
+
+    def close(self):
+        pass
+
+
+# ====================
+# CACHE
+# ====================
+
+class HttpCache:
+    """
+    Conditional-request response cache on disk (<dir>/<key>.json + <key>.body).
+    """
+
+    def __init__(self, cache_dir, session=None, ttl=DEFAULT_TTL, stale_if_error=True, record_to=None):
+        self.cache_dir = cache_dir
+        os.makedirs(os.path.join(cache_dir, "derived"), exist_ok=True)
+        self.session = session if session is not None else requests.Session()
+        self.ttl = ttl
+        self.stale_if_error = stale_if_error
+        self.record_to = record_to
+        self.stats = {}
+
+    def _count(self, name):
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _paths(self, url):
+        key = url_key(url)
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _response(self, url, meta, content, cache_status, changed=False):
+        response = StoredResponse(url, meta["status"], meta["headers"], content, cache_status,
+                                  meta["digest"], self, changed, meta.get("encoding"))
+        if self.record_to is not None:
+            self.record_to.save(url, content, meta["headers"], meta["status"])
+        return response
+
+    def get(self, url, headers=None, timeout=None, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        meta, content = self._load(url)
+        now = time.time()
+
+        if meta is not None and now - meta["validated_at"] < ttl:
+            self._count("fresh")
+            return self._response(url, meta, content, "fresh")
+
+        request_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        if meta is not None:
+            if meta["headers"].get("ETag"):
+                request_headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        try:
+            resp = self.session.get(url, headers=request_headers, timeout=timeout)
+        except (requests.RequestException, OSError):
+            if meta is not None and self.stale_if_error:
+                self._count("stale")
+                return self._response(url, meta, content, "stale")
+            raise
+
+        if resp.status_code == 304 and meta is not None:
+            meta["validated_at"] = now
+            for name in KEPT_HEADERS:
+                if resp.headers.get(name):
+                    meta["headers"][name] = resp.headers[name]
+            _write_atomic(self._paths(url)[0], json.dumps(meta).encode())
+            self._count("not_modified")
+            return self._response(url, meta, content, "not_modified")
+
+        if resp.status_code != 200:
+            if meta is not None and self.stale_if_error and resp.status_code >= 500:
+                self._count("stale")
+                return self._response(url, meta, content, "stale")
+            self._count("error")
+            return resp
+
+        body = resp.content
+        digest = hashlib.sha256(body).hexdigest()
+        changed = meta is None or meta["digest"] != digest
+        if meta is not None and changed:
+            self._drop_derived(meta["digest"])
+        new_meta = {
+            "url": url,
+            "status": 200,
+            "headers": {k: resp.headers[k] for k in KEPT_HEADERS if resp.headers.get(k)},
+            "digest": digest,
+            "encoding": getattr(resp, "encoding", None) or "utf-8",
+            "fetched_at": now,
+            "validated_at": now,
+        }
+        meta_path, body_path = self._paths(url)
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(new_meta).encode())
+        self._count("fetched")
+        return self._response(url, new_meta, body, "fetched", changed)
+
+    # ----- derived results -----
+
+    def _derived_path(self, digest, name):
+        return os.path.join(self.cache_dir, "derived", f"{digest[:32]}-{name}.json")
+
+    def _drop_derived(self, digest):
+        derived_dir = os.path.join(self.cache_dir, "derived")
+        for filename in os.listdir(derived_dir):
+            if filename.startswith(digest[:32]):
+                os.remove(os.path.join(derived_dir, filename))
+
+    def derived(self, digest, name, build):
+        """
+        JSON-serializable result of build() for a body digest, computed once.
+        Return: (value, reused)
+        """
+        path = self._derived_path(digest, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                self._count("derived_hit")
+                return json.load(f), True
+        value = build()
+        _write_atomic(path, json.dumps(value).encode())
+        self._count("derived_miss")
+        return value, False
+
+    def close(self):
+        self.session.close()
+
+
+def make_http_client(mode, cache_dir=None, fixtures_dir=None, ttl=DEFAULT_TTL, latency_ms=0):
+    """
+    Session-like client for a mode:
+      live   - HttpCache over a keep-alive requests.Session
+      record - live, plus every page written to fixtures_dir
+      replay - HttpCache over the fixtures in fixtures_dir (no network)
+      off    - plain requests.Session
+    """
+    if mode not in HTTP_MODES:
+        raise ValueError(f"Unknown HTTP mode: {mode}")
+    if mode == "off":
+        return requests.Session()
+    if mode == "replay":
+        return HttpCache(cache_dir, ReplaySession(FixtureStore(fixtures_dir), latency_ms), ttl)
+    record_to = FixtureStore(fixtures_dir) if mode == "record" else None
+    return HttpCache(cache_dir, requests.Session(), ttl, record_to=record_to)
+
+
+# ====================
+# CLI
+# ====================
+
+def benchmark(fixtures_dir, url, latency_ms, rounds):
+    """
+    Fetch + parse per tick: no cache vs. revalidated (304, parse reused) vs. within TTL.
+    """
+    from google_news import parse_articles, parse_search_response
+
+    fixtures = FixtureStore(fixtures_dir)
+    cache_dir = tempfile.mkdtemp(prefix="http_cache_bench_")
+    results = {}
+    try:
+        plain = ReplaySession(fixtures, latency_ms)
+        revalidating = HttpCache(cache_dir, ReplaySession(fixtures, latency_ms), ttl=0)
+        fresh = HttpCache(cache_dir, ReplaySession(fixtures, latency_ms), ttl=3600)
+        revalidating.get(url)
+
+        def uncached():
+            parse_articles(plain.get(url).text, limit=100)
+
+        def cached(client):
+            return lambda: parse_search_response(client.get(url), limit=100)
+
+        for name, fn in [("no cache", uncached), ("revalidate (304)", cached(revalidating)),
+                         ("within TTL", cached(fresh))]:
+            times = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - start)
+            results[name] = sorted(times)[len(times) // 2] * 1000
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="HTTP response cache and fixture record / replay for the scraper",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python http_cache.py record --fixtures ./http_fixtures
+  python http_cache.py synth --fixtures ./http_fixtures --n 100
+  python http_cache.py benchmark --fixtures ./http_fixtures --latency-ms 300
+  python http_cache.py stats --cache ./http_cache
+        """
+    )
+    parser.add_argument("command", choices=["record", "synth", "benchmark", "stats"])
+    parser.add_argument("--url", type=str, default=None, help="Page URL (default: the Google News search)")
+    parser.add_argument("--fixtures", type=str, default="http_fixtures", help="Fixture directory")
+    parser.add_argument("--cache", type=str, default="http_cache", help="Cache directory (stats)")
+    parser.add_argument("--n", type=int, default=100, help="Articles on the synthetic page (synth)")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Simulated round trip (benchmark)")
+    parser.add_argument("--rounds", type=int, default=20, help="Fetches per variant (benchmark)")
+
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        entries = [f for f in os.listdir(args.cache) if f.endswith(".json")] if os.path.isdir(args.cache) else []
+        for filename in sorted(entries):
+            with open(os.path.join(args.cache, filename)) as f:
+                meta = json.load(f)
+            age = time.time() - meta["validated_at"]
+            print(f"{meta['url']}\n  etag={meta['headers'].get('ETag')} validated {age:.0f}s ago "
+                  f"digest={meta['digest'][:12]}")
+        print(f"{len(entries)} cached responses in {args.cache}")
+        return
+
+    from google_news import SEARCH_URL, synthetic_search_page
+
+    url = args.url or SEARCH_URL
+    fixtures = FixtureStore(args.fixtures)
+
+    if args.command == "record":
+        resp = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=15)
+        resp.raise_for_status()
+        fixtures.save(url, resp.content, resp.headers)
+        print(f"Recorded {url} ({len(resp.content):,} bytes) -> {args.fixtures}")
+    elif args.command == "synth":
+        fixtures.save(url, synthetic_search_page(args.n).encode(), {"Content-Type": "text/html; charset=utf-8"})
+        print(f"Synthetic page with {args.n} articles for {url} -> {args.fixtures}")
+    else:
+        if fixtures.load(url) is None:
+            parser.error(f"no fixture for {url} in {args.fixtures} (run record or synth first)")
+        results = benchmark(args.fixtures, url, args.latency_ms, args.rounds)
+        print(f"Median fetch + parse per tick ({args.latency_ms} ms simulated round trip, {args.rounds} rounds):")
+        for name, ms in results.items():
+            print(f"  {name:<18}{ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
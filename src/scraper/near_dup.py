@@ -0,0 +1,362 @@
+"""
+Near-duplicate clustering of news titles (MinHash + LSH, SQLite index).
+
+The same story is syndicated by many outlets under different links and almost
+identical titles. Each title becomes a MinHash signature over character
+shingles; signatures are split into LSH bands and every band is stored as a
+bucket key in SQLite. A new title is compared only with the titles sharing at
+least one bucket (no pairwise scan), and joins the cluster of the most similar
+one above the threshold, otherwise it starts a new cluster.
+
+Usage:
+  python near_dup.py build --csv sheet_export.csv --index near_dup.sqlite
+  python near_dup.py query "Bank XYZ gagal bayar obligasi" --index near_dup.sqlite
+  python near_dup.py benchmark --n 300000
+"""
+
+import os
+import re
+import time
+import sqlite3
+import argparse
+import unicodedata
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+THRESHOLD = 0.6
+BATCH_SIZE = 256
+SEED = 1
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _splitmix64(x):
+    """
+    Vectorized splitmix64 finalizer (uint64 arithmetic wraps mod 2**64).
+    """
+    with np.errstate(over="ignore"):
+        x = (x + np.uint64(0x9E3779B97F4A7C15)) & _MASK64
+        x = ((x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK64
+        x = ((x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK64
+        return x ^ (x >> np.uint64(31))
+
+
+def normalize_title(title):
+    """
+    Lowercase, strip accents and punctuation, collapse spaces.
+    """
+    text = unicodedata.normalize("NFKD", str(title or "")).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def shingles(title, k=SHINGLE_SIZE):
+    """
+    Distinct character k-grams of the normalized title, packed as uint64.
+    """
+    data = np.frombuffer(normalize_title(title).encode(), dtype=np.uint8).astype(np.uint64)
+    if len(data) < k:
+        data = np.pad(data, (0, k - len(data)))
+    windows = np.lib.stride_tricks.sliding_window_view(data, k)
+    packed = (windows << (np.arange(k - 1, -1, -1, dtype=np.uint64) * np.uint64(8))).sum(axis=1)
+    return np.unique(packed)
+
+
+class MinHasher:
+    """
+    MinHash signatures for batches of titles.
+    h_i(x) = splitmix64(x ^ seed_i), keeping the top 32 bits.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=SEED):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self.seeds = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)[:, None]
+        self.band_salt = np.arange(bands, dtype=np.uint64) << np.uint64(56)
+
+    def signatures(self, titles):
+        """
+        Return: uint32 array (n_titles, num_perm)
+        """
+        sigs = np.empty((len(titles), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(titles), BATCH_SIZE):
+            parts = [shingles(t) for t in titles[start:start + BATCH_SIZE]]
+            offsets = np.cumsum([0] + [len(p) for p in parts[:-1]])
+            hashed = _splitmix64(np.concatenate(parts)[None, :] ^ self.seeds) >> np.uint64(32)
+            sigs[start:start + len(parts)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return sigs
+
+    def band_keys(self, sigs):
+        """
+        One bucket key per (title, band), as signed int64 for SQLite.
+        """
+        bands = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        key = np.broadcast_to(self.band_salt, bands.shape[:2]).copy()
+        for r in range(self.rows):
+            key = _splitmix64(key ^ bands[:, :, r])
+        return key.view(np.int64)
+
+
+class NearDupIndex:
+    """
+    On-disk signature index assigning each article to a story cluster.
+
+    cluster_id is the id of the first article seen for the story, so it is
+    stable across runs as long as the index file is kept.
+    """
+
+    def __init__(self, path, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, bands)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                link TEXT UNIQUE,
+                title TEXT,
+                cluster_id INTEGER,
+                sig BLOB
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                key INTEGER,
+                article_id INTEGER,
+                PRIMARY KEY (key, article_id)
+            ) WITHOUT ROWID;
+        """)
+        self._check_params()
+
+    def _check_params(self):
+        params = {"num_perm": self.hasher.num_perm, "bands": self.hasher.bands,
+                  "shingle_size": SHINGLE_SIZE, "seed": SEED}
+        stored = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if not stored:
+            self.conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in params.items()])
+            self.conn.commit()
+            return
+        for k, v in params.items():
+            if stored.get(k) != str(v):
+                raise ValueError(f"Index {self.path} was built with {k}={stored.get(k)}, not {v}")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def cluster_of(self, link):
+        row = self.conn.execute("SELECT cluster_id FROM articles WHERE link = ?", (link,)).fetchone()
+        return row[0] if row else None
+
+    def _best_match(self, sig, keys):
+        placeholders = ",".join("?" * len(keys))
+        candidates = self.conn.execute(
+            f"SELECT a.id, a.cluster_id, a.sig FROM articles a WHERE a.id IN "
+            f"(SELECT DISTINCT article_id FROM buckets WHERE key IN ({placeholders}))",
+            [int(k) for k in keys]
+        ).fetchall()
+        if not candidates:
+            return None, 0.0
+
+        cand_sigs = np.frombuffer(b"".join(c[2] for c in candidates), dtype=np.uint32)
+        similarity = (cand_sigs.reshape(len(candidates), -1) == sig).mean(axis=1)
+        best = int(similarity.argmax())
+        return candidates[best][1], float(similarity[best])
+
+    def add(self, links, titles):
+        """
+        Index articles in order and return their cluster ids.
+        Links already in the index keep their cluster. Articles earlier in the
+        same call are visible to later ones (in-batch duplicates cluster too).
+        """
+        cluster_ids = [None] * len(links)
+        known = {}
+        for start in range(0, len(links), 900):
+            chunk = [l for l in links[start:start + 900] if l]
+            placeholders = ",".join("?" * len(chunk))
+            if chunk:
+                known.update(self.conn.execute(
+                    f"SELECT link, cluster_id FROM articles WHERE link IN ({placeholders})", chunk
+                ))
+
+        todo = [i for i, link in enumerate(links) if link not in known]
+        for i, link in enumerate(links):
+            if link in known:
+                cluster_ids[i] = known[link]
+        if not todo:
+            return cluster_ids
+
+        sigs = self.hasher.signatures([titles[i] for i in todo])
+        keys = self.hasher.band_keys(sigs)
+
+        with self.conn:
+            for i, sig, sig_keys in zip(todo, sigs, keys):
+                if links[i] in known:  # same link twice in one call
+                    cluster_ids[i] = known[links[i]]
+                    continue
+
+                cluster_id, similarity = self._best_match(sig, sig_keys)
+                cur = self.conn.execute(
+                    "INSERT INTO articles (link, title, cluster_id, sig) VALUES (?, ?, ?, ?)",
+                    (links[i], titles[i], cluster_id, sig.tobytes())
+                )
+                article_id = cur.lastrowid
+                if cluster_id is None or similarity < self.threshold:
+                    cluster_id = article_id
+                    self.conn.execute("UPDATE articles SET cluster_id = ? WHERE id = ?", (cluster_id, article_id))
+
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO buckets VALUES (?, ?)",
+                    [(int(k), article_id) for k in sig_keys]
+                )
+                cluster_ids[i] = cluster_id
+                if links[i]:
+                    known[links[i]] = cluster_id
+
+        return cluster_ids
+
+    def assign(self, articles):
+        """
+        Cluster ids for scraped article dicts (title, link).
+        """
+        return self.add([a.get("link") for a in articles], [a.get("title") for a in articles])
+
+    def query(self, title):
+        """
+        (cluster_id, similarity) of the closest indexed title, without indexing it.
+        """
+        sig = self.hasher.signatures([title])
+        return self._best_match(sig[0], self.hasher.band_keys(sig)[0])
+
+    def stats(self):
+        n_articles, n_clusters = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT cluster_id) FROM articles"
+        ).fetchone()
+        return {
+            "articles": n_articles,
+            "clusters": n_clusters,
+            "size_mb": os.path.getsize(self.path) / 1e6 if os.path.exists(self.path) else 0.0,
+        }
+
+
+# ====================
+# BENCHMARK
+# ====================
+
+def synthetic_titles(n, dup_rate=0.6, random_state=42):
+    """
+    Titles with syndicated variants (dropped/swapped words, outlet suffix).
+    Return: (titles, story_ids)
+    """
+    rng = np.random.default_rng(random_state)
+    vocab = np.array([f"w{i}" for i in range(20000)])
+    outlets = ["kompas", "detik", "cnbc indonesia", "kontan", "bisnis com", "antara"]
+
+    titles, stories, bases = [], [], []
+    for _ in range(n):
+        if bases and rng.random() < dup_rate:
+            story = int(rng.integers(len(bases)))
+            words = list(bases[story])
+            if rng.random() < 0.5 and len(words) > 6:
+                words.pop(int(rng.integers(len(words))))
+            if rng.random() < 0.5:
+                words.append(outlets[int(rng.integers(len(outlets)))])
+        else:
+            story = len(bases)
+            bases.append(list(rng.choice(vocab, size=int(rng.integers(8, 14)))))
+            words = bases[story]
+        titles.append(" ".join(words))
+        stories.append(story)
+    return titles, np.array(stories)
+
+
+def benchmark(n, index_path):
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    titles, stories = synthetic_titles(n)
+    links = [f"https://example.com/{i}" for i in range(n)]
+
+    index = NearDupIndex(index_path)
+    start = time.perf_counter()
+    step = 10000
+    cluster_ids = []
+    for s in range(0, n, step):
+        cluster_ids += index.add(links[s:s + step], titles[s:s + step])
+        done = min(s + step, n)
+        print(f"  {done:>8,} titles | {done / (time.perf_counter() - start):,.0f} titles/s")
+    elapsed = time.perf_counter() - start
+    cluster_ids = np.array(cluster_ids)
+
+    # Pairwise precision / recall against the true stories, via co-occurrence counts
+    def pairs(labels):
+        _, counts = np.unique(labels, return_counts=True)
+        return (counts * (counts - 1) // 2).sum()
+
+    _, joint = np.unique(np.stack([cluster_ids, stories]), axis=1, return_counts=True)
+    together = (joint * (joint - 1) // 2).sum()
+    precision = together / max(pairs(cluster_ids), 1)
+    recall = together / max(pairs(stories), 1)
+
+    # Latency of one incoming batch on the full index
+    probe_titles, _ = synthetic_titles(100, random_state=7)
+    t = time.perf_counter()
+    index.add([f"https://example.com/probe/{i}" for i in range(100)], probe_titles)
+    per_article_ms = (time.perf_counter() - t) * 1000 / 100
+
+    stats = index.stats()
+    index.close()
+    print(f"\nIndexed {n:,} titles in {elapsed:.1f}s ({n / elapsed:,.0f}/s)")
+    print(f"Clusters: {stats['clusters']:,} (true stories: {len(np.unique(stories)):,})")
+    print(f"Pair precision: {precision:.4f} | pair recall: {recall:.4f}")
+    print(f"Incremental add on full index: {per_article_ms:.2f} ms/article")
+    print(f"Index size: {stats['size_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Near-duplicate clustering of news titles",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python near_dup.py build --csv sheet_export.csv --index near_dup.sqlite
+  python near_dup.py query "Bank XYZ gagal bayar obligasi" --index near_dup.sqlite
+  python near_dup.py benchmark --n 300000
+        """
+    )
+    parser.add_argument("command", choices=["build", "query", "benchmark"])
+    parser.add_argument("title", nargs="?", default=None, help="Title to look up (query)")
+    parser.add_argument("--index", type=str, default="near_dup.sqlite", help="Signature index path")
+    parser.add_argument("--csv", type=str, default=None, help="CSV with title and link columns (build)")
+    parser.add_argument("--n", type=int, default=100000, help="Synthetic titles (benchmark)")
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.n, args.index)
+        return
+
+    index = NearDupIndex(args.index)
+    if args.command == "build":
+        import csv
+        with open(args.csv, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.DictReader(f) if r.get("title") and r.get("link")]
+        start = time.perf_counter()
+        index.add([r["link"] for r in rows], [r["title"] for r in rows])
+        print(f"Indexed {len(rows):,} rows in {time.perf_counter() - start:.1f}s | {index.stats()}")
+    else:
+        cluster_id, similarity = index.query(args.title)
+        print(f"cluster_id={cluster_id} similarity={similarity:.2f}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,68 @@ from typing import Dict, List, Optional, Tuple
 from training_utils import MODEL_TITLE_MAP
 
 
+# models_store keys that differ from the explainer / title keys
+EXPLAINER_KEY = {"xgboost": "xgb"}
+
+
+def positive_class(values, base):
+    """Class-1 SHAP values / base value from any explainer output layout."""
+    if isinstance(values, list):
+        values = values[1]
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[:, :, 1]
+    base = np.atleast_1d(np.asarray(base, dtype=np.float64))
+    return values, float(base[-1])
+
+
+class ModelExplainer:
+    """An initialized SHAP explainer for one model; reuse it across calls.
+
+    TreeExplainer for XGBoost / RF / LightGBM, KernelExplainer on a background
+    sample for NGBoost. shap_values() returns class-1 contributions
+    (n_rows x n_features) in the explainer's output space, base_value the
+    matching expected value.
+    """
+
+    def __init__(self, model, model_type: str, background: pd.DataFrame = None):
+        self.model_type = EXPLAINER_KEY.get(model_type, model_type)
+        if self.model_type in ["xgb", "rf", "lgbm"]:
+            self.explainer = shap.TreeExplainer(model)
+        elif self.model_type == "ngboost":
+            if background is None:
+                raise ValueError("NGBoost explanations need a background sample")
+            self.explainer = shap.KernelExplainer(lambda X: model.predict_proba(X)[:, 1], background, link="logit")
+        else:
+            raise ValueError(f"Unknown model_type: {model_type}")
+        self.model = model
+        self.background = background
+        _, self.base_value = positive_class(np.zeros((0, 0)), self.explainer.expected_value)
+        if self.model_type == "xgb":
+            # shap misreads the base score of XGBoost >= 3 as 0; use the booster's own bias column
+            probe = xgb.DMatrix(np.zeros((1, model.num_features())), feature_names=model.feature_names)
+            self.base_value = float(model.predict(probe, pred_contribs=True)[0, -1])
+
+    def shap_values(self, X: pd.DataFrame) -> np.ndarray:
+        if self.model_type == "xgb":
+            raw = self.explainer.shap_values(xgb.DMatrix(X))
+        elif self.model_type == "ngboost":
+            raw = self.explainer.shap_values(X, silent=True)
+        else:
+            raw = self.explainer.shap_values(X)
+        values, _ = positive_class(raw, self.explainer.expected_value)
+        return values
+
+
+def build_explainer(model, model_type: str, X_train: pd.DataFrame = None, background_n: int = 100,
+                    random_state: int = 42) -> ModelExplainer:
+    """ModelExplainer with the NGBoost background drawn from X_train."""
+    background = None
+    if EXPLAINER_KEY.get(model_type, model_type) == "ngboost":
+        background = X_train.sample(n=min(background_n, len(X_train)), random_state=random_state)
+    return ModelExplainer(model, model_type, background)
+
+
 class SHAPAnalyzer:
     """SHAP analysis for tree-based and gradient boosting models."""
 
@@ -25,35 +87,8 @@ class SHAPAnalyzer:
 
     def compute_shap_values(self, model, X_train, X_sample, model_type: str, feature_cols: List[str]) -> np.ndarray:
         """Compute SHAP values for any model type."""
-        if model_type == "xgb":
-            explainer = shap.TreeExplainer(model)
-            shap_values = explainer.shap_values(xgb.DMatrix(X_sample))
-
-        elif model_type in ["rf", "lgbm"]:
-            explainer = shap.TreeExplainer(model)
-            shap_values_raw = explainer.shap_values(X_sample)
-
-            if isinstance(shap_values_raw, list):
-                shap_values = shap_values_raw[1]  # class 1
-            else:
-                shap_values = shap_values_raw
-
-        elif model_type == "ngboost":
-            X_bg = X_train.sample(
-                n=min(self.background_n, len(X_train)),
-                random_state=self.random_state
-            )
-            explainer = shap.KernelExplainer(
-                lambda X: model.predict_proba(X)[:, 1],
-                X_bg,
-                link="logit"
-            )
-            shap_values = explainer.shap_values(X_sample)
-
-        else:
-            raise ValueError(f"Unknown model_type: {model_type}")
-
-        return shap_values
+        explainer = build_explainer(model, model_type, X_train, self.background_n, self.random_state)
+        return explainer.shap_values(X_sample)
 
     def plot_summary(self, model, X_train, model_type: str, feature_cols: List[str],
                      horizon: int, plot_type: str = "dot", figsize: Tuple[int, int] = (10, 6)):
@@ -109,41 +144,16 @@ class SHAPAnalyzer:
 
         return plt.gcf()
 
-    def plot_force(self, model, X_train, X_row, model_type: str, feature_cols: List[str]):
-        """Plot SHAP force plot for a single instance."""
-        if model_type == "xgb":
-            explainer = shap.TreeExplainer(model)
-            shap_values = explainer.shap_values(xgb.DMatrix(X_row, feature_names=feature_cols))
-            base_value = explainer.expected_value
-
-        elif model_type in ["rf", "lgbm"]:
-            explainer = shap.TreeExplainer(model)
-            shap_values_all = explainer.shap_values(X_row)
-
-            if isinstance(shap_values_all, list):
-                shap_values = shap_values_all[1]
-                base_value = explainer.expected_value[1]
-            else:
-                shap_values = shap_values_all
-                base_value = explainer.expected_value
-
-        elif model_type == "ngboost":
-            X_bg = X_train.sample(
-                n=min(self.background_n, len(X_train)),
-                random_state=self.random_state
-            )
-            explainer = shap.KernelExplainer(
-                lambda X: model.predict_proba(X)[:, 1],
-                X_bg,
-                link="logit"
-            )
-            shap_values = explainer.shap_values(X_row)
-            base_value = explainer.expected_value
-
-        else:
-            raise ValueError(f"Unknown model_type: {model_type}")
+    def plot_force(self, model, X_train, X_row, model_type: str, feature_cols: List[str],
+                   explainer: ModelExplainer = None):
+        """Plot SHAP force plot for a single instance.
 
-        return shap.force_plot(base_value, shap_values[0], X_row.iloc[0], feature_names=feature_cols)
+        Pass a prebuilt explainer (see explanation_service.py) to avoid rebuilding
+        it on every call.
+        """
+        explainer = explainer or build_explainer(model, model_type, X_train, self.background_n, self.random_state)
+        shap_values = explainer.shap_values(X_row)
+        return shap.force_plot(explainer.base_value, shap_values[0], X_row.iloc[0], feature_names=feature_cols)
 
     def get_feature_importance_df(self, model, X_train, model_type: str, feature_cols: List[str]) -> pd.DataFrame:
         """Get SHAP-based feature importance as DataFrame."""
@@ -0,0 +1,306 @@
+"""
+SHAP orchestration across all (model, horizon) pairs.
+
+analyze_all_horizons recomputes SHAP values for every plot and redraws the
+sample per horizon. Here:
+
+  - the explained sample and the KernelExplainer background are drawn once per
+    model type from the union of its train rows (train sets of the 5 horizons
+    overlap almost entirely), so horizons are explained on the same rows
+  - each of the 20 (model, horizon) jobs computes SHAP values exactly once, in a
+    process pool (slowest jobs first)
+  - values, base values and samples go to one compressed store (shap_store.npz)
+  - feature-importance CSVs and plots are rendered from the store, so they can
+    be regenerated without recomputing anything
+
+Usage:
+  python shap_orchestrator.py --models ./output/models_all_horizons.pkl --output ./output
+  python shap_orchestrator.py --models ./output/models_all_horizons.pkl --model-types rf,lgbm --workers 4
+  python shap_orchestrator.py --output ./output --from-store
+"""
+
+import os
+import time
+import pickle
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import shap
+
+from training_utils import MODEL_TITLE_MAP
+from shap_analysis import ModelExplainer
+
+SHAP_SAMPLE_N = 200
+SHAP_BACKGROUND_N = 100
+SHAP_TOP_DEPENDENCE = 6
+SHAP_STORE_NAME = "shap_store.npz"
+RANDOM_STATE = 42
+
+MODEL_TYPES = ["ngboost", "rf", "xgboost", "lgbm"]
+# Explainer / title key per models_store key
+EXPORT_KEY = {"ngboost": "ngboost", "rf": "rf", "xgboost": "xgb", "xgb": "xgb", "lgbm": "lgbm"}
+# Rough relative cost, used to schedule the slowest jobs first
+JOB_COST = {"ngboost": 100, "rf": 10, "xgb": 1, "lgbm": 1}
+
+
+# ====================
+# SHARED SAMPLES
+# ====================
+
+def shared_rows(X_trains: Dict[int, pd.DataFrame], sample_n: int = SHAP_SAMPLE_N,
+                background_n: int = SHAP_BACKGROUND_N, random_state: int = RANDOM_STATE):
+    """Explained sample and background drawn once from the union of train rows."""
+    union = pd.concat(X_trains.values())
+    union = union[~union.index.duplicated()].sort_index()
+    X_sample = union.sample(n=min(sample_n, len(union)), random_state=random_state)
+    X_bg = union.sample(n=min(background_n, len(union)), random_state=random_state)
+    return X_sample, X_bg
+
+
+# ====================
+# SHAP JOBS
+# ====================
+
+def explain(model, model_type: str, X_sample: pd.DataFrame, X_bg: pd.DataFrame):
+    """SHAP values (n_sample x n_features) and base value for one model."""
+    explainer = ModelExplainer(model, EXPORT_KEY[model_type], X_bg)
+    return explainer.shap_values(X_sample), explainer.base_value
+
+
+def _run_job(model_type: str, horizon: int, model, X_sample: pd.DataFrame, X_bg: pd.DataFrame):
+    start = time.perf_counter()
+    values, base = explain(model, model_type, X_sample, X_bg)
+    return model_type, horizon, values.astype(np.float32), base, time.perf_counter() - start
+
+
+def compute_shap(models_store: Dict, model_types: List[str] = None, n_workers: int = None,
+                 sample_n: int = SHAP_SAMPLE_N, background_n: int = SHAP_BACKGROUND_N,
+                 random_state: int = RANDOM_STATE) -> Dict:
+    """Run every (model, horizon) job once and collect the results for the store."""
+    model_types = [m for m in (model_types or MODEL_TYPES) if m in models_store]
+    samples, jobs = {}, []
+    for model_type in model_types:
+        horizons = sorted(models_store[model_type])
+        X_sample, X_bg = shared_rows({h: models_store[model_type][h]["X_train"] for h in horizons},
+                                     sample_n, background_n, random_state)
+        samples[model_type] = X_sample
+        for h in horizons:
+            jobs.append((model_type, h, models_store[model_type][h]["model"], X_sample, X_bg))
+    jobs.sort(key=lambda job: -JOB_COST[EXPORT_KEY[job[0]]])
+
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(jobs)))
+    print(f"  {len(jobs)} SHAP jobs on {n_workers} worker(s)")
+    results = {}
+    if n_workers == 1:
+        outputs = (_run_job(*job) for job in jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=n_workers)
+        outputs = (f.result() for f in [pool.submit(_run_job, *job) for job in jobs])
+    try:
+        for model_type, h, values, base, seconds in outputs:
+            results[(model_type, h)] = (values, base)
+            print(f"    {model_type:<8} {h}Y: {seconds:6.2f}s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {"samples": samples, "results": results}
+
+
+# ====================
+# STORE
+# ====================
+
+def save_shap_store(path: str, computed: Dict) -> Path:
+    """One compressed .npz with samples, SHAP matrices and base values."""
+    arrays = {}
+    for model_type, X_sample in computed["samples"].items():
+        arrays[f"{model_type}__sample"] = X_sample.to_numpy(dtype=np.float64)
+        arrays[f"{model_type}__sample_index"] = X_sample.index.to_numpy()
+        arrays[f"{model_type}__features"] = np.array(X_sample.columns, dtype=str)
+    for (model_type, h), (values, base) in computed["results"].items():
+        arrays[f"{model_type}__{h}y__values"] = values
+        arrays[f"{model_type}__{h}y__base"] = np.array(base)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+class ShapStore:
+    """Read access to shap_store.npz."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._npz = np.load(self.path, allow_pickle=False)
+
+    def model_types(self) -> List[str]:
+        found = {k.split("__")[0] for k in self._npz.files}
+        return [m for m in MODEL_TYPES if m in found] + sorted(found - set(MODEL_TYPES))
+
+    def horizons(self, model_type: str) -> List[int]:
+        return sorted(int(k.split("__")[1][:-1]) for k in self._npz.files
+                      if k.startswith(f"{model_type}__") and k.endswith("y__values"))
+
+    def sample(self, model_type: str) -> pd.DataFrame:
+        return pd.DataFrame(self._npz[f"{model_type}__sample"],
+                            index=self._npz[f"{model_type}__sample_index"],
+                            columns=self._npz[f"{model_type}__features"].tolist())
+
+    def values(self, model_type: str, horizon: int) -> np.ndarray:
+        return self._npz[f"{model_type}__{horizon}y__values"]
+
+    def base_value(self, model_type: str, horizon: int) -> float:
+        return float(self._npz[f"{model_type}__{horizon}y__base"])
+
+    def importance(self, model_type: str, horizon: int) -> pd.DataFrame:
+        """Mean |SHAP| per feature, same layout as SHAPAnalyzer.get_feature_importance_df."""
+        return pd.DataFrame({
+            "feature": self.sample(model_type).columns,
+            "shap_importance": np.abs(self.values(model_type, horizon)).mean(axis=0, dtype=np.float64),
+        }).sort_values("shap_importance", ascending=False)
+
+
+# ====================
+# OUTPUTS FROM THE STORE
+# ====================
+
+def write_importance_csvs(store: ShapStore, output_dir: str) -> int:
+    """<model>/<model>_feature_importance_<h>y.csv for every job in the store."""
+    n = 0
+    for model_type in store.model_types():
+        model_dir = Path(output_dir) / model_type
+        model_dir.mkdir(parents=True, exist_ok=True)
+        for h in store.horizons(model_type):
+            store.importance(model_type, h).to_csv(
+                model_dir / f"{model_type}_feature_importance_{h}y.csv", index=False
+            )
+            n += 1
+    return n
+
+
+def _save(fig, path: Path):
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+def render_plots(store: ShapStore, output_dir: str, top_n: int = SHAP_TOP_DEPENDENCE) -> int:
+    """Summary, importance and top-feature dependence plots (same file names as analyze_all_horizons)."""
+    n = 0
+    for model_type in store.model_types():
+        model_dir = Path(output_dir) / model_type
+        model_dir.mkdir(parents=True, exist_ok=True)
+        title = MODEL_TITLE_MAP[EXPORT_KEY.get(model_type, model_type)]
+        X_sample = store.sample(model_type)
+
+        for h in store.horizons(model_type):
+            values = store.values(model_type, h)
+
+            plt.figure(figsize=(10, 6))
+            shap.summary_plot(values, X_sample, plot_type="dot", show=False)
+            plt.title(f"{title} SHAP Summary – {h}Y Horizon")
+            plt.tight_layout()
+            _save(plt.gcf(), model_dir / f"{model_type}_shap_summary_{h}y.png")
+
+            plt.figure(figsize=(10, 6))
+            shap.summary_plot(values, X_sample, plot_type="bar", show=False)
+            plt.title(f"SHAP Feature Importance – {title} ({h}Y Horizon)")
+            plt.tight_layout()
+            _save(plt.gcf(), model_dir / f"{model_type}_shap_importance_{h}y.png")
+            n += 2
+
+            for feat in store.importance(model_type, h).head(top_n)["feature"]:
+                try:
+                    fig, ax = plt.subplots(figsize=(8, 6))
+                    shap.dependence_plot(feat, values, X_sample, ax=ax, show=False)
+                    ax.set_title(f"{feat} – {title} SHAP Dependence ({h}Y)")
+                    fig.tight_layout()
+                    _save(fig, model_dir / f"{model_type}_dependence_{feat}_{h}y.png")
+                    n += 1
+                except Exception as e:
+                    plt.close("all")
+                    print(f"  Warning: Could not generate dependence plot for {feat}: {e}")
+    return n
+
+
+def run_shap(models_store: Dict, output_dir: str, model_types: List[str] = None, n_workers: int = None,
+             plots: bool = True, sample_n: int = SHAP_SAMPLE_N,
+             background_n: int = SHAP_BACKGROUND_N) -> Path:
+    """Compute all SHAP jobs, write the store, then CSVs and plots from it."""
+    start = time.perf_counter()
+    computed = compute_shap(models_store, model_types, n_workers, sample_n, background_n)
+    store_path = save_shap_store(Path(output_dir) / SHAP_STORE_NAME, computed)
+    print(f"  SHAP values: {time.perf_counter() - start:.1f}s -> {store_path} "
+          f"({store_path.stat().st_size / 1e6:.2f} MB)")
+
+    start = time.perf_counter()
+    store = ShapStore(store_path)
+    n_csv = write_importance_csvs(store, output_dir)
+    n_png = render_plots(store, output_dir) if plots else 0
+    print(f"  Rendered {n_csv} importance CSVs, {n_png} plots in {time.perf_counter() - start:.1f}s")
+    return store_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="SHAP values for all models and horizons, stored once and rendered from the store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python shap_orchestrator.py --models ./output/models_all_horizons.pkl --output ./output
+  python shap_orchestrator.py --models ./output/models_all_horizons.pkl --model-types rf,lgbm --workers 4
+  python shap_orchestrator.py --output ./output --from-store
+        """
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="./output/models_all_horizons.pkl",
+        help="Pickled models store from train_all_models.py / run_pipeline.py"
+    )
+    parser.add_argument("--output", type=str, default="./output", help="Output directory")
+    parser.add_argument(
+        "--model-types",
+        type=str,
+        default=",".join(MODEL_TYPES),
+        help="Comma-separated subset of ngboost,rf,xgboost,lgbm"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Processes for SHAP jobs (default: CPU count)")
+    parser.add_argument("--no-plots", action="store_true", help="Only write the store and importance CSVs")
+    parser.add_argument(
+        "--from-store",
+        action="store_true",
+        help=f"Re-render CSVs and plots from <output>/{SHAP_STORE_NAME} without recomputing"
+    )
+
+    args = parser.parse_args()
+
+    if args.from_store:
+        store = ShapStore(Path(args.output) / SHAP_STORE_NAME)
+        n_csv = write_importance_csvs(store, args.output)
+        n_png = 0 if args.no_plots else render_plots(store, args.output)
+        print(f"Rendered {n_csv} importance CSVs, {n_png} plots from {store.path}")
+        return
+
+    models_path = Path(args.models)
+    if not models_path.exists():
+        print(f"Error: Models file not found: {args.models}")
+        return
+    with open(models_path, "rb") as f:
+        models_store = pickle.load(f)
+
+    print("=" * 70)
+    print("SHAP ANALYSIS (shared samples, one pass per model/horizon)")
+    print("=" * 70)
+    run_shap(models_store, args.output, args.model_types.split(","), args.workers, plots=not args.no_plots)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic bank-quarter panels for benchmarks and stress tests.
+
+Produces the same columns the pipeline reads from
+financial_report_bank_zscore_clean.csv (symbol, calendar_year, period, time,
+the 15 feature ratios and bank_zscore_risk), at any size.
+
+Usage:
+  python synthetic_data.py --banks 50000 --years 50 --output ./data/synthetic/panel.csv
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training_utils import FEATURE_COLS, TARGET_COL
+
+PERIODS = ["Q1", "Q2", "Q3", "Q4"]
+
+
+def make_synthetic_panel(n_banks: int = 100, n_years: int = 10, start_year: int = 2014,
+                         random_state: int = 42, first_bank: int = 0) -> pd.DataFrame:
+    """Complete panel of n_banks x n_years x 4 quarters, sorted by symbol/year/period.
+
+    first_bank offsets the symbol numbering so panels can be generated in blocks.
+    """
+    rng = np.random.default_rng(random_state)
+    n = n_banks * n_years * 4
+
+    bank = np.repeat(np.arange(n_banks), n_years * 4)
+    year = np.tile(np.repeat(np.arange(start_year, start_year + n_years), 4), n_banks)
+    quarter = np.tile(np.arange(4), n_banks * n_years)
+
+    symbols = np.array([f"B{i:06d}" for i in range(first_bank, first_bank + n_banks)])
+    periods = np.array(PERIODS)
+
+    # Bank-level effect keeps labels persistent over time
+    bank_effect = rng.normal(size=n_banks)[bank]
+    features = rng.normal(size=(n, len(FEATURE_COLS))).astype(np.float64)
+    features[:, 0] += bank_effect
+    risk_score = bank_effect + 0.5 * features[:, 1] - 0.5 * features[:, 3] + rng.normal(scale=0.5, size=n)
+
+    df = pd.DataFrame(features, columns=FEATURE_COLS)
+    df.insert(0, "symbol", pd.Categorical.from_codes(bank, symbols))
+    df.insert(1, "calendar_year", year)
+    df.insert(2, "period", pd.Categorical.from_codes(quarter, periods))
+    df.insert(3, "time", df["calendar_year"].astype(str) + df["period"].astype(str))
+    # Fixed cut (~75th percentile of the score) so blocks share one label rule
+    df[TARGET_COL] = (risk_score > 0.85).astype(np.int64)
+
+    return df
+
+
+def write_synthetic_csv(path: str, n_banks: int, n_years: int = 10, block_banks: int = 5000,
+                        random_state: int = 42) -> int:
+    """Write a synthetic panel CSV in blocks of banks, never holding the full panel."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    n_rows = 0
+    for i, first_bank in enumerate(range(0, n_banks, block_banks)):
+        block = make_synthetic_panel(min(block_banks, n_banks - first_bank), n_years,
+                                     random_state=random_state + i, first_bank=first_bank)
+        block.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        n_rows += len(block)
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic bank-quarter panel CSV",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python synthetic_data.py --banks 1000 --years 10 --output ./data/synthetic/panel.csv
+        """
+    )
+    parser.add_argument("--banks", type=int, default=1000, help="Number of banks")
+    parser.add_argument("--years", type=int, default=10, help="Number of years (from 2014)")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./data/synthetic/panel.csv",
+        help="Output CSV path"
+    )
+
+    args = parser.parse_args()
+
+    n_rows = write_synthetic_csv(args.output, args.banks, args.years)
+    print(f"Synthetic panel ({n_rows:,} rows) saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ Outputs predictions CSV per horizon per model.
 Usage:
   python train_all_models.py
   python train_all_models.py --data ./data/processed/data.csv --output ./results
+  python train_all_models.py --calibration isotonic
+  python train_all_models.py --prediction-store ./output/prediction_store
+  python train_all_models.py --compact-panel
+  python train_all_models.py --news ./scheduler_state/articles.sqlite
 """
 
 import pickle
@@ -22,7 +26,14 @@ from training_utils import (
     train_xgboost,
     train_lightgbm,
     evaluate_and_export,
+    get_probabilities,
+    HARDCODED_THRESHOLD,
 )
+from calibration import calibrate_horizon, CALIBRATION_METHODS
+from prediction_store import PredictionStore, new_run_id
+from panel import load_compact_panel, CompactPanel
+from dataset_cache import load_dataset
+from drift_monitor import save_reference
 
 
 def main():
@@ -33,6 +44,10 @@ def main():
 Examples:
   python train_all_models.py
   python train_all_models.py --data ./data/processed/data.csv --output ./results
+  python train_all_models.py --calibration isotonic
+  python train_all_models.py --prediction-store ./output/prediction_store
+  python train_all_models.py --compact-panel
+  python train_all_models.py --news ./scheduler_state/articles.sqlite
         """
     )
 
@@ -48,6 +63,32 @@ Examples:
         default="./output",
         help="Output directory"
     )
+    parser.add_argument(
+        "--calibration",
+        type=str,
+        default="none",
+        choices=CALIBRATION_METHODS,
+        help="Calibrate scores on the validation split before thresholding"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default=None,
+        help="Append predictions to this Parquet store instead of writing CSVs"
+    )
+
+    parser.add_argument(
+        "--compact-panel",
+        action="store_true",
+        help="Hold the training panel as float32 features / int8 labels (see panel.py)"
+    )
+
+    parser.add_argument(
+        "--news",
+        type=str,
+        default=None,
+        help="Join news features from this article store (.sqlite) or sheet CSV export (see news_features.py)"
+    )
 
     args = parser.parse_args()
 
@@ -67,9 +108,24 @@ Examples:
     print(f"Output: {args.output}")
     print()
 
+    # Prediction store (optional) replaces per-horizon CSVs
+    store = PredictionStore(args.prediction_store) if args.prediction_store else None
+    run_id = new_run_id()
+    if store is not None:
+        print(f"Prediction store: {args.prediction_store} (run_id={run_id})")
+
     # Load data once
     print("Loading data...")
-    df_h, df_model = load_and_prepare_data(str(data_path))
+    feature_cols = None
+    if args.news:
+        # Panel + news features, prepared once per input and cached
+        df_h, df_model, feature_cols = load_dataset(str(data_path), args.news)
+        if args.compact_panel:
+            df_h = CompactPanel.from_frame(df_h, feature_cols)
+    elif args.compact_panel:
+        df_h = load_compact_panel(str(data_path))
+    else:
+        df_h, df_model = load_and_prepare_data(str(data_path))
 
     # Models to train in sequence
     models_config = [
@@ -104,12 +160,12 @@ Examples:
             print("-" * 70)
 
             # Split data
-            (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon)
+            (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon, feature_cols)
 
-            # Train (hardcode threshold=0.4 for all models)
+            # Train (hardcoded threshold for all models)
             training_params = {
                 "X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val,
-                "hardcode_threshold": 0.4, "horizon": horizon, "search_logs": search_logs
+                "hardcode_threshold": HARDCODED_THRESHOLD, "horizon": horizon, "search_logs": search_logs
             }
             if model_name == "xgboost":
                 training_params["output_dir"] = str(model_output_dir)
@@ -121,12 +177,22 @@ Examples:
             else:
                 model, threshold = result
 
+            # Validation scores feed calibration (optional) and ensemble stacking
+            proba_val = get_probabilities(model, X_val, export_key)
+            calibrator = calibrate_horizon(
+                proba_val, y_val, args.calibration, str(model_output_dir), model_name, horizon
+            )
+
             # Evaluate & export
-            evaluate_and_export(model, X_test, y_test, df_test_meta, horizon, threshold, export_key, str(model_output_dir))
+            evaluate_and_export(model, X_test, y_test, df_test_meta, horizon, threshold, export_key,
+                                str(model_output_dir), calibrator=calibrator, store=store, run_id=run_id)
 
             models_dict[horizon] = {
                 "model": model,
                 "threshold": threshold,
+                "calibrator": calibrator,
+                "proba_val": proba_val,
+                "y_val": y_val,
                 "X_train": X_train,
                 "y_train": y_train
             }
@@ -154,12 +220,16 @@ Examples:
     models_path = output_dir / "models_all_horizons.pkl"
     with open(models_path, "wb") as f:
         pickle.dump(models_store, f)
+    save_reference(models_store, str(output_dir))
 
     print("\n" + "=" * 70)
     print("✓ PIPELINE COMPLETE")
     print("=" * 70)
     print(f"All models saved to: {models_path}")
-    print(f"Predictions in: {output_dir}/<model>/<model>_predictions_<horizon>y.csv")
+    if store is not None:
+        print(f"Predictions in: {store.root} (run_id={run_id})")
+    else:
+        print(f"Predictions in: {output_dir}/<model>/<model>_predictions_<horizon>y.csv")
     print()
 
 
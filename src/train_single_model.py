@@ -6,6 +6,8 @@ Usage:
   python train_single_model.py --model ngboost
   python train_single_model.py --model rf --data ./data/processed/data.csv --output ./results
   python train_single_model.py --model xgboost --horizons 1,2,3
+  python train_single_model.py --model lgbm --calibration platt
+  python train_single_model.py --model xgboost --news ./scheduler_state/articles.sqlite
 """
 
 import pickle
@@ -22,7 +24,13 @@ from training_utils import (
     train_xgboost,
     train_lightgbm,
     evaluate_and_export,
+    get_probabilities,
+    HARDCODED_THRESHOLD,
 )
+from calibration import calibrate_horizon, CALIBRATION_METHODS
+from prediction_store import PredictionStore, new_run_id
+from panel import load_compact_panel, CompactPanel
+from dataset_cache import load_dataset
 
 
 def main():
@@ -34,6 +42,8 @@ Examples:
   python train_single_model.py --model ngboost
   python train_single_model.py --model rf --horizons 1,2,3
   python train_single_model.py --model xgboost --output ./results
+  python train_single_model.py --model lgbm --calibration platt
+  python train_single_model.py --model xgboost --news ./scheduler_state/articles.sqlite
         """
     )
 
@@ -67,6 +77,32 @@ Examples:
         action="store_true",
         help="Save trained model to pickle"
     )
+    parser.add_argument(
+        "--calibration",
+        type=str,
+        default="none",
+        choices=CALIBRATION_METHODS,
+        help="Calibrate scores on the validation split before thresholding"
+    )
+    parser.add_argument(
+        "--prediction-store",
+        type=str,
+        default=None,
+        help="Append predictions to this Parquet store instead of writing CSVs"
+    )
+
+    parser.add_argument(
+        "--compact-panel",
+        action="store_true",
+        help="Hold the training panel as float32 features / int8 labels (see panel.py)"
+    )
+
+    parser.add_argument(
+        "--news",
+        type=str,
+        default=None,
+        help="Join news features from this article store (.sqlite) or sheet CSV export (see news_features.py)"
+    )
 
     args = parser.parse_args()
 
@@ -91,9 +127,24 @@ Examples:
     print(f"Horizons: {horizons}")
     print()
 
+    # Prediction store (optional) replaces per-horizon CSVs
+    store = PredictionStore(args.prediction_store) if args.prediction_store else None
+    run_id = new_run_id()
+    if store is not None:
+        print(f"Prediction store: {args.prediction_store} (run_id={run_id})")
+
     # Load data
     print("Loading data...")
-    df_h, df_model = load_and_prepare_data(str(data_path))
+    feature_cols = None
+    if args.news:
+        # Panel + news features, prepared once per input and cached
+        df_h, df_model, feature_cols = load_dataset(str(data_path), args.news)
+        if args.compact_panel:
+            df_h = CompactPanel.from_frame(df_h, feature_cols)
+    elif args.compact_panel:
+        df_h = load_compact_panel(str(data_path))
+    else:
+        df_h, df_model = load_and_prepare_data(str(data_path))
 
     # Select training function
     if args.model == "ngboost":
@@ -121,13 +172,13 @@ Examples:
         print("-" * 70)
 
         # Split data
-        (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon)
+        (X_train, y_train), (X_val, y_val), (X_test, y_test, df_test_meta) = split_by_horizon(df_h, horizon, feature_cols)
 
-        # Train (hardcode threshold=0.4 for all models)
+        # Train (hardcoded threshold for all models)
         # Pass horizon for all models, output_dir for XGBoost param logging
         training_params = {
             "X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val,
-            "hardcode_threshold": 0.4, "horizon": horizon, "search_logs": search_logs
+            "hardcode_threshold": HARDCODED_THRESHOLD, "horizon": horizon, "search_logs": search_logs
         }
         if args.model == "xgboost":
             training_params["output_dir"] = str(output_dir)
@@ -139,12 +190,22 @@ Examples:
         else:
             model, threshold = result
 
+        # Validation scores feed calibration (optional) and ensemble stacking
+        proba_val = get_probabilities(model, X_val, model_key)
+        calibrator = calibrate_horizon(
+            proba_val, y_val, args.calibration, str(output_dir), args.model, horizon
+        )
+
         # Evaluate & export
-        evaluate_and_export(model, X_test, y_test, df_test_meta, horizon, threshold, model_key, str(output_dir))
+        evaluate_and_export(model, X_test, y_test, df_test_meta, horizon, threshold, model_key,
+                            str(output_dir), calibrator=calibrator, store=store, run_id=run_id)
 
         models_dict[horizon] = {
             "model": model,
             "threshold": threshold,
+            "calibrator": calibrator,
+            "proba_val": proba_val,
+            "y_val": y_val,
             "X_train": X_train,
             "y_train": y_train
         }
@@ -174,7 +235,7 @@ Examples:
     print("\n" + "=" * 70)
     print("✓ COMPLETE")
     print("=" * 70)
-    print(f"Predictions exported to: {output_dir}/")
+    print(f"Predictions exported to: {store.root if store is not None else output_dir}/")
     print()
 
 
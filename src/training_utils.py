@@ -3,19 +3,15 @@ Shared training utilities for bankruptcy prediction models.
 Used by both train_single_model.py and train_all_models.py
 """
 
+import time
 import pandas as pd
 import numpy as np
 import json
-from typing import Dict, Tuple
-from sklearn.metrics import (
-    accuracy_score, confusion_matrix,
-    roc_auc_score, average_precision_score, precision_recall_curve
-)
-import xgboost as xgb
-import lightgbm as lgb
-from ngboost import NGBClassifier
-from ngboost.distns import Bernoulli
-from sklearn.ensemble import RandomForestClassifier
+from typing import Dict, List, Tuple
+
+# sklearn and the model backends (xgboost, lightgbm, ngboost) are imported inside
+# the functions that use them, so CLIs only pay for the trainer they run
+from data_validation import build_panel_schema, validate_panel
 
 
 # ====================
@@ -28,6 +24,15 @@ TRAIN_END_YEAR = 2019
 VAL_END_YEAR = 2021
 RECALL_TARGET = 0.75
 RANDOM_STATE = 42
+HARDCODED_THRESHOLD = 0.4
+
+# Risk buckets on (calibrated, if available) probability
+RISK_BUCKET_BINS = [0, 0.3, 0.6, 1.0]
+RISK_BUCKET_LABELS = ["Low Risk", "Medium Risk", "High Risk"]
+
+# NGBoost stops once validation loss has not improved for this many stages
+NGBOOST_MAX_STAGES = 500
+NGBOOST_EARLY_STOPPING_ROUNDS = 50
 
 FEATURE_COLS = [
     "size", "der", "dar", "roa", "roe", "sdoa", "sdroe",
@@ -41,7 +46,8 @@ MODEL_TITLE_MAP = {
     "rf": "Random Forest",
     "xgb": "XGBoost",
     "lgbm": "LightGBM",
-    "ngboost": "NGBoost"
+    "ngboost": "NGBoost",
+    "ensemble": "Ensemble"
 }
 
 
@@ -60,8 +66,14 @@ def quarter_end_date(year: int, period: str):
     return pd.to_datetime(f"{year}-{q_end[period]}")
 
 
+# Quarter-end day/month for the export "tanggal" column (dd/mm/yyyy)
+QUARTER_END_DAY_MONTH = {"Q1": "31/03", "Q2": "30/06", "Q3": "30/09", "Q4": "31/12"}
+
+
 def build_threshold_table(y_true: np.ndarray, proba: np.ndarray) -> pd.DataFrame:
     """Build threshold tuning table."""
+    from sklearn.metrics import confusion_matrix, precision_recall_curve
+
     precision, recall, thresholds = precision_recall_curve(y_true, proba)
 
     rows = []
@@ -82,6 +94,8 @@ def build_threshold_table(y_true: np.ndarray, proba: np.ndarray) -> pd.DataFrame
 
 def calc_type_errors(y_true: np.ndarray, y_proba: np.ndarray, thr: float = 0.5) -> Dict:
     """Calculate Type I/II errors."""
+    from sklearn.metrics import confusion_matrix
+
     y_pred = (y_proba >= thr).astype(int)
     tn, fp, fn, tp = confusion_matrix(y_true, y_pred).ravel()
 
@@ -95,7 +109,12 @@ def calc_type_errors(y_true: np.ndarray, y_proba: np.ndarray, thr: float = 0.5)
 
 def get_probabilities(model, X, model_type: str) -> np.ndarray:
     """Get probability predictions."""
+    # Compiled ensembles (inference_engine.FlatForest) share one scoring path
+    if getattr(model, "compiled", False):
+        return model.predict(np.asarray(X))
+
     if model_type in ["xgb", "xgboost"]:
+        import xgboost as xgb
         if not isinstance(X, xgb.DMatrix):
             X = xgb.DMatrix(X)
         return model.predict(X)
@@ -111,30 +130,87 @@ def get_probabilities(model, X, model_type: str) -> np.ndarray:
 # DATA LOADING & PREP
 # ====================
 
-def load_and_prepare_data(data_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Load cleaned data and prepare horizon labels."""
-    df = pd.read_csv(data_path)
+QUARTER_INDEX = {"Q1": 0, "Q2": 1, "Q3": 2, "Q4": 3}
+
+
+def build_horizon_labels(df: pd.DataFrame, horizons=range(1, 6)) -> np.ndarray:
+    """TARGET_COL of the same bank and quarter h years later (n_rows x n_horizons, NaN if absent).
 
+    Each row gets an integer key symbol_code * n_slots + quarter_slot, where
+    quarter_slot = (calendar_year - first_year) * 4 + quarter; the label h years
+    ahead sits at key + 4h. Keys index a direct-address table (symbols x quarters
+    spanned), so a gap in a bank's history leaves NaN instead of pulling in a
+    later year, and all horizons resolve in one vectorized lookup, linear in rows.
+    """
+    steps = 4 * np.asarray(list(horizons), dtype=np.int64)
+    if len(df) == 0:
+        return np.empty((0, len(steps)), dtype=np.float64)
+
+    codes, symbols = pd.factorize(df["symbol"], use_na_sentinel=False)
+    quarter = df["period"].map(QUARTER_INDEX)
+    if quarter.isna().any():
+        bad = sorted(df.loc[quarter.isna(), "period"].astype(str).unique())[:5]
+        raise ValueError(f"Unknown period values: {bad}")
+
+    year = df["calendar_year"].to_numpy(dtype=np.int64)
+    n_slots = int(year.max() - year.min() + 1) * 4
+    slot = (year - year.min()) * 4 + quarter.to_numpy(dtype=np.int64)
+    key = codes.astype(np.int64) * n_slots + slot
+
+    # key -> row; filled back to front so the first of any duplicate rows wins
+    table = np.full(len(symbols) * n_slots, -1, dtype=np.int64)
+    rows = np.arange(len(df), dtype=np.int64)
+    table[key[::-1]] = rows[::-1]
+
+    inside = slot[:, None] + steps[None, :] < n_slots
+    pos = np.where(inside, table[np.where(inside, key[:, None] + steps[None, :], 0)], -1)
+    target = df[TARGET_COL].to_numpy(dtype=np.float64)
+    return np.where(pos >= 0, target[pos], np.nan)
+
+
+def prepare_horizon_panel(df: pd.DataFrame) -> pd.DataFrame:
+    """Filter years, keep complete 4Q bank-years, sort and add distress_{h}y labels."""
     # Filter years
     df = df[df["calendar_year"].between(YEAR_START, YEAR_END)].copy()
 
     # Keep only complete 4Q bank-years
     ok_pairs = (
-        df.groupby(["symbol", "calendar_year"])["period"]
+        df.groupby(["symbol", "calendar_year"], observed=True)["period"]
         .nunique()
         .reset_index(name="n_quarters")
         .query("n_quarters == 4")[["symbol", "calendar_year"]]
     )
     df = df.merge(ok_pairs, on=["symbol", "calendar_year"], how="inner")
 
-    # Sort for horizon shift
-    df_h = df.sort_values(["symbol", "calendar_year"]).copy()
+    df_h = df.sort_values(["symbol", "calendar_year", "period"], kind="stable").copy()
 
-    # Create horizon labels (1-5 years ahead)
-    for h in range(1, 6):
-        df_h[f"distress_{h}y"] = (
-            df_h.groupby("symbol")[TARGET_COL].shift(-h)
-        )
+    # Horizon labels (1-5 years ahead): same bank, same quarter, h years later
+    labels = build_horizon_labels(df_h, range(1, 6))
+    for j, h in enumerate(range(1, 6)):
+        df_h[f"distress_{h}y"] = labels[:, j]
+
+    return df_h
+
+
+def load_and_prepare_data(data_path: str, validate: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Load cleaned data and prepare horizon labels.
+
+    Raises DataValidationError if the raw panel fails schema validation.
+    """
+    # Keys parsed as categoricals: validation then works on their codes instead
+    # of hashing millions of strings; handed on as plain strings afterwards
+    key_dtypes = {"symbol": "category", "period": "category"}
+    df = pd.read_csv(data_path, dtype=key_dtypes)
+
+    if validate:
+        report = validate_panel(df, build_panel_schema(FEATURE_COLS, TARGET_COL))
+        if report.issues:
+            print(report.summary())
+        report.raise_if_errors()
+
+    df = df.astype({col: object for col in key_dtypes})
+
+    df_h = prepare_horizon_panel(df)
 
     # Keep only rows with complete features
     df_model = df_h.dropna(subset=FEATURE_COLS + [TARGET_COL]).copy()
@@ -142,22 +218,36 @@ def load_and_prepare_data(data_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
     return df_h, df_model
 
 
-def split_by_horizon(df: pd.DataFrame, horizon: int) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """Time-based train/val/test split."""
+def split_by_horizon(df: pd.DataFrame, horizon: int,
+                     feature_cols: List[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Time-based train/val/test split on the year the label is observed (calendar_year + horizon).
+
+    feature_cols defaults to FEATURE_COLS (pass the extended list when the panel
+    carries news features). Compact panels (panel.CompactPanel) split themselves
+    on their own feature columns without widening to float64.
+    """
+    if hasattr(df, "split"):
+        return df.split(horizon)
+
+    feature_cols = feature_cols or FEATURE_COLS
+
     label_col = f"distress_{horizon}y"
     df_hh = df.dropna(subset=[label_col]).copy()
 
-    train_mask = df_hh["calendar_year"] <= TRAIN_END_YEAR
-    val_mask = (df_hh["calendar_year"] > TRAIN_END_YEAR) & (df_hh["calendar_year"] <= VAL_END_YEAR)
-    test_mask = df_hh["calendar_year"] > VAL_END_YEAR
+    # A row's outcome is known h years after its features; splitting on that year
+    # keeps training labels out of the validation / test periods
+    label_year = df_hh["calendar_year"] + horizon
+    train_mask = label_year <= TRAIN_END_YEAR
+    val_mask = (label_year > TRAIN_END_YEAR) & (label_year <= VAL_END_YEAR)
+    test_mask = label_year > VAL_END_YEAR
 
-    X_train = df_hh.loc[train_mask, FEATURE_COLS]
+    X_train = df_hh.loc[train_mask, feature_cols]
     y_train = df_hh.loc[train_mask, label_col].astype(int)
 
-    X_val = df_hh.loc[val_mask, FEATURE_COLS]
+    X_val = df_hh.loc[val_mask, feature_cols]
     y_val = df_hh.loc[val_mask, label_col].astype(int)
 
-    X_test = df_hh.loc[test_mask, FEATURE_COLS]
+    X_test = df_hh.loc[test_mask, feature_cols]
     y_test = df_hh.loc[test_mask, label_col].astype(int)
 
     df_test_meta = df_hh.loc[test_mask, ["symbol", "calendar_year", "period", "time"]]
@@ -169,31 +259,66 @@ def split_by_horizon(df: pd.DataFrame, horizon: int) -> Tuple[pd.DataFrame, pd.D
 # TRAINING FUNCTIONS
 # ====================
 
+def truncate_ngboost(ngb, n_stages: int):
+    """Drop boosting stages past n_stages so predict walks only the kept ones."""
+    ngb.base_models = ngb.base_models[:n_stages]
+    ngb.scalings = ngb.scalings[:n_stages]
+    ngb.col_idxs = ngb.col_idxs[:n_stages]
+    ngb.n_estimators = n_stages
+    return ngb
+
+
 def train_ngboost(X_train, y_train, X_val, y_val, hardcode_threshold: float = None,
                   horizon: int = None, search_logs: list = None) -> Tuple:
-    """Train NGBoost. Optionally use hardcoded threshold."""
+    """Train NGBoost with validation early stopping. Optionally use hardcoded threshold."""
+    from ngboost import NGBClassifier
+    from ngboost.distns import Bernoulli
+
     print("  Training NGBoost...")
     pos = (y_train == 1).sum()
     neg = (y_train == 0).sum()
     sample_weight = np.where(y_train == 1, neg / pos, 1.0)
+    # Validation loss uses the same class weighting as training
+    val_sample_weight = np.where(y_val == 1, neg / pos, 1.0)
 
     ngb = NGBClassifier(
         Dist=Bernoulli,
-        n_estimators=500,
+        n_estimators=NGBOOST_MAX_STAGES,
         learning_rate=0.03,
-        random_state=RANDOM_STATE
+        random_state=RANDOM_STATE,
+        verbose=False
     )
 
-    ngb.fit(X_train, y_train, sample_weight=sample_weight)
+    start = time.perf_counter()
+    ngb.fit(
+        X_train, y_train,
+        X_val=X_val, Y_val=y_val,
+        sample_weight=sample_weight,
+        val_sample_weight=val_sample_weight,
+        early_stopping_rounds=NGBOOST_EARLY_STOPPING_ROUNDS
+    )
+    fit_seconds = time.perf_counter() - start
+
+    # Keep stages up to the best validation iteration
+    stages_fitted = len(ngb.base_models)
+    best_iter = ngb.best_val_loss_itr if ngb.best_val_loss_itr is not None else stages_fitted - 1
+    truncate_ngboost(ngb, best_iter + 1)
+    print(f"    Stages: {len(ngb.base_models)} kept / {stages_fitted} fitted ({fit_seconds:.1f}s)")
+
     proba_val = ngb.predict_proba(X_val)[:, 1]
 
     # Log hyperparameters (NGBoost uses fixed config)
     log_entry = {
         "horizon": horizon,
         "model": "ngboost",
-        "n_estimators": 500,
+        "n_estimators": NGBOOST_MAX_STAGES,
         "learning_rate": 0.03,
-        "random_state": RANDOM_STATE
+        "random_state": RANDOM_STATE,
+        "early_stopping_rounds": NGBOOST_EARLY_STOPPING_ROUNDS,
+        "stages_fitted": stages_fitted,
+        "best_iter": best_iter,
+        "n_stages": len(ngb.base_models),
+        "fit_seconds": round(fit_seconds, 3)
     }
     if search_logs is not None:
         search_logs.append(log_entry)
@@ -213,6 +338,8 @@ def train_ngboost(X_train, y_train, X_val, y_val, hardcode_threshold: float = No
 def train_random_forest(X_train, y_train, X_val, y_val, hardcode_threshold: float = None,
                         horizon: int = None, search_logs: list = None) -> Tuple:
     """Train Random Forest. Optionally use hardcoded threshold."""
+    from sklearn.ensemble import RandomForestClassifier
+
     print("  Training Random Forest...")
     pos = (y_train == 1).sum()
     neg = (y_train == 0).sum()
@@ -264,6 +391,9 @@ def train_xgboost(X_train, y_train, X_val, y_val, hardcode_threshold: float = No
     Args:
         search_logs: Optional list to collect iteration logs across horizons
     """
+    import xgboost as xgb
+    from sklearn.metrics import average_precision_score
+
     print("  Training XGBoost (random hyperparameter search)...")
 
     # Prepare DMatrix
@@ -367,6 +497,8 @@ def train_xgboost(X_train, y_train, X_val, y_val, hardcode_threshold: float = No
 def train_lightgbm(X_train, y_train, X_val, y_val, hardcode_threshold: float = None,
                    horizon: int = None, search_logs: list = None) -> Tuple:
     """Train LightGBM with early stopping."""
+    import lightgbm as lgb
+
     print("  Training LightGBM...")
 
     train_data = lgb.Dataset(X_train, label=y_train)
@@ -426,33 +558,43 @@ def train_lightgbm(X_train, y_train, X_val, y_val, hardcode_threshold: float = N
 # ====================
 
 def evaluate_and_export(model, X_test, y_test, df_test_meta, horizon: int, thr: float,
-                        model_type: str, output_dir: str):
-    """Evaluate model and export predictions."""
+                        model_type: str, output_dir: str, calibrator=None,
+                        store=None, run_id: str = None):
+    """Evaluate model and export predictions.
+
+    If a calibrator (see calibration.py) is given, thresholds and risk buckets
+    apply to calibrated probabilities. If a PredictionStore is given, rows are
+    appended to it under run_id instead of being written as CSV.
+    """
     proba = get_probabilities(model, X_test, model_type)
-    pred = (proba >= thr).astype(int)
+    note = None
+    if calibrator is not None:
+        proba = calibrator.transform(proba)
+        note = f"calibrated={calibrator.method}"
 
-    # Metrics
-    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) > 1 else np.nan
-    pr = average_precision_score(y_test, proba) if len(np.unique(y_test)) > 1 else np.nan
-    acc = accuracy_score(y_test, pred)
-    err = calc_type_errors(y_test, proba, thr)
+    return export_predictions(proba, y_test, df_test_meta, horizon, thr, model_type, output_dir,
+                              note=note, store=store, run_id=run_id)
 
-    print(f"\n  === TEST {horizon}Y (thr={thr}) ===")
-    print(f"  Accuracy : {acc}")
-    print(f"  ROC-AUC  : {auc}")
-    print(f"  PR-AUC   : {pr}")
-    print(f"  Type I Error : {err['Type_I_error']}")
-    print(f"  Type II Error: {err['Type_II_error']}")
-    print(f"  Recall       : {err['Recall']}")
 
-    # Build export dataframe
-    export_df = df_test_meta[["symbol", "calendar_year", "period", "time"]].copy()
-    export_df["tanggal"] = export_df.apply(
-        lambda r: quarter_end_date(r["calendar_year"], r["period"]).strftime("%d/%m/%Y"),
-        axis=1
+def prediction_frame(proba: np.ndarray, y_true, df_meta, horizon: int, thr: float,
+                     model_type: str) -> pd.DataFrame:
+    """Prediction rows in the export schema.
+
+    y_true=None (quarters whose outcome is not known yet) leaves distress_actual
+    and confusion_type empty.
+    """
+    proba = np.asarray(proba)
+    pred = (proba >= thr).astype(int)
+
+    export_df = df_meta[["symbol", "calendar_year", "period", "time"]].copy()
+    export_df["tanggal"] = (
+        export_df["period"].astype(str).map(QUARTER_END_DAY_MONTH)
+        + "/" + export_df["calendar_year"].astype(str)
     )
     export_df["horizon"] = horizon
-    export_df["distress_actual"] = y_test.values
+    export_df["distress_actual"] = (
+        pd.array([pd.NA] * len(export_df), dtype="Int64") if y_true is None else np.asarray(y_true)
+    )
     export_df["prob_distress"] = proba
     export_df["pred_label"] = pred
     export_df["distance_to_threshold"] = proba - thr
@@ -462,27 +604,55 @@ def evaluate_and_export(model, X_test, y_test, df_test_meta, horizon: int, thr:
     # Risk buckets
     export_df["risk_bucket"] = pd.cut(
         export_df["prob_distress"],
-        bins=[0, 0.3, 0.6, 1.0],
-        labels=["Low Risk", "Medium Risk", "High Risk"],
+        bins=RISK_BUCKET_BINS,
+        labels=RISK_BUCKET_LABELS,
         include_lowest=True
     )
 
     # Confusion type
-    def get_confusion(row):
-        if row.distress_actual == 1 and row.pred_label == 1:
-            return "TP"
-        elif row.distress_actual == 1 and row.pred_label == 0:
-            return "FN"
-        elif row.distress_actual == 0 and row.pred_label == 1:
-            return "FP"
-        return "TN"
-
-    export_df["confusion_type"] = export_df.apply(get_confusion, axis=1)
-    export_df = export_df.sort_values(["calendar_year", "prob_distress"], ascending=[True, False])
-
-    # Save CSV
-    output_path = f"{output_dir}/{model_type}_predictions_{horizon}y.csv"
-    export_df.to_csv(output_path, index=False)
-    print(f"  Exported: {output_path}")
+    if y_true is None:
+        export_df["confusion_type"] = None
+    else:
+        actual = export_df["distress_actual"].values == 1
+        predicted = pred == 1
+        export_df["confusion_type"] = np.select(
+            [actual & predicted, actual, predicted], ["TP", "FN", "FP"], default="TN"
+        )
+    return export_df.sort_values(["calendar_year", "prob_distress"], ascending=[True, False])
+
+
+def export_predictions(proba: np.ndarray, y_test, df_test_meta, horizon: int, thr: float,
+                       model_type: str, output_dir: str, note: str = None,
+                       store=None, run_id: str = None) -> pd.DataFrame:
+    """Print test metrics for precomputed probabilities and export the predictions."""
+    from sklearn.metrics import accuracy_score, roc_auc_score, average_precision_score
+
+    pred = (proba >= thr).astype(int)
+
+    # Metrics
+    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) > 1 else np.nan
+    pr = average_precision_score(y_test, proba) if len(np.unique(y_test)) > 1 else np.nan
+    acc = accuracy_score(y_test, pred)
+    err = calc_type_errors(y_test, proba, thr)
+
+    suffix = f", {note}" if note else ""
+    print(f"\n  === TEST {horizon}Y (thr={thr}{suffix}) ===")
+    print(f"  Accuracy : {acc}")
+    print(f"  ROC-AUC  : {auc}")
+    print(f"  PR-AUC   : {pr}")
+    print(f"  Type I Error : {err['Type_I_error']}")
+    print(f"  Type II Error: {err['Type_II_error']}")
+    print(f"  Recall       : {err['Recall']}")
+
+    export_df = prediction_frame(proba, y_test, df_test_meta, horizon, thr, model_type)
+
+    # Save to prediction store, or CSV
+    if store is not None:
+        store.append(export_df, model_type, horizon, run_id)
+        print(f"  Stored: {store.root} (model={model_type}, horizon={horizon}, run_id={run_id})")
+    else:
+        output_path = f"{output_dir}/{model_type}_predictions_{horizon}y.csv"
+        export_df.to_csv(output_path, index=False)
+        print(f"  Exported: {output_path}")
 
     return export_df
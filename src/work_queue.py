@@ -0,0 +1,391 @@
+"""
+Multi-machine work queue for the pipeline DAG over a shared filesystem.
+
+The coordinator (run_pipeline.py --queue DIR) enqueues every pipeline_dag node
+whose inputs are checkpointed; any number of workers on machines that mount the
+same volume claim jobs, run them from the checkpoints and write their results
+back to the artifact directory. Layout of the queue directory:
+
+  pipeline.json          build_pipeline arguments (absolute paths on the shared volume)
+  pending/<job>.json     {"node", "key", "attempts"}
+  claimed/<job>.json     moved here by an atomic rename: exactly one worker wins
+  claimed/<job>.lease    {"worker", "expires_at"}, renewed by the worker's heartbeat
+  done/<job>.json        {"node", "worker", "seconds"}
+  failed/<job>.json      error after MAX_ATTEMPTS
+  workers/<id>.json      worker heartbeat (status)
+  closed                 written by the coordinator when the run is over
+
+A job whose lease runs out (worker crashed, machine gone) is moved back to
+pending by whoever notices first - coordinator or worker. Nodes are
+deterministic and checkpoints are written atomically, so a job that ends up
+running twice is harmless.
+
+Usage:
+  python run_pipeline.py --queue /shared/queue --output /shared/output
+  python work_queue.py worker --queue /shared/queue          # on every machine, any number of times
+  python run_pipeline.py --queue /tmp/q --spawn-workers 3    # local workers standing in for nodes
+  python work_queue.py status --queue /shared/queue
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import traceback
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+LEASE_SECONDS = 60.0
+# Extra slack before a lease counts as expired (clock skew between machines)
+LEASE_GRACE_SECONDS = 15.0
+POLL_SECONDS = 1.0
+MAX_ATTEMPTS = 3
+WORKER_IDLE_EXIT_SECONDS = 600.0
+
+QUEUE_DIRS = ["pending", "claimed", "done", "failed", "workers"]
+SRC_DIR = Path(__file__).resolve().parent
+
+
+def _write_json(path: Path, data: Dict):
+    """Atomically replace a JSON file."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path):
+    """Contents of a JSON file, or None if it vanished (moved by another process)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _job_id(seq: int, node: str) -> str:
+    return f"{seq:05d}-{node.replace('/', '_')}"
+
+
+# ====================
+# QUEUE
+# ====================
+
+class WorkQueue:
+    """Directory-backed job queue with leases."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        for name in QUEUE_DIRS:
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, name: str) -> Path:
+        return self.root / name
+
+    # ----- coordinator side -----
+
+    def reset(self, build_args: Dict):
+        """Start a run: drop jobs of earlier runs and publish the pipeline arguments."""
+        for name in QUEUE_DIRS:
+            for path in self._dir(name).iterdir():
+                path.unlink()
+        (self.root / "closed").unlink(missing_ok=True)
+        _write_json(self.root / "pipeline.json", build_args)
+
+    def put(self, seq: int, node: str, key: str) -> str:
+        job = _job_id(seq, node)
+        _write_json(self._dir("pending") / f"{job}.json", {"node": node, "key": key, "attempts": 0})
+        return job
+
+    def finished(self) -> Dict[str, Dict]:
+        return {p.stem: _read_json(p) for p in self._dir("done").glob("*.json")}
+
+    def failures(self) -> Dict[str, Dict]:
+        return {p.stem: _read_json(p) for p in self._dir("failed").glob("*.json")}
+
+    def close(self):
+        (self.root / "closed").touch()
+
+    def is_closed(self) -> bool:
+        return (self.root / "closed").exists()
+
+    def build_args(self) -> Dict:
+        return _read_json(self.root / "pipeline.json")
+
+    # ----- worker side -----
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS):
+        """Claim the first pending job (atomic rename); None if there is none."""
+        for path in sorted(self._dir("pending").glob("*.json")):
+            target = self._dir("claimed") / path.name
+            try:
+                os.rename(path, target)
+                os.utime(target)  # a missing lease falls back to this mtime
+            except FileNotFoundError:
+                continue  # another worker was faster
+            if (self._dir("done") / path.name).exists():
+                self._release(path.stem)  # requeued copy of a job that finished after all
+                continue
+            self.renew(path.stem, worker, lease)
+            job = _read_json(target)
+            if job is None:
+                continue  # already recovered by someone else
+            job["id"] = path.stem
+            return job
+        return None
+
+    def renew(self, job: str, worker: str, lease: float = LEASE_SECONDS):
+        _write_json(self._dir("claimed") / f"{job}.lease",
+                    {"worker": worker, "expires_at": time.time() + lease})
+
+    def complete(self, job: Dict, worker: str, seconds: float):
+        _write_json(self._dir("done") / f"{job['id']}.json",
+                    {"node": job["node"], "worker": worker, "seconds": round(seconds, 3),
+                     "attempts": job["attempts"] + 1})
+        self._release(job["id"])
+
+    def fail(self, job: Dict, worker: str, error: str):
+        """Back to pending for another attempt, or to failed/ after MAX_ATTEMPTS."""
+        attempts = job["attempts"] + 1
+        record = {"node": job["node"], "key": job["key"], "attempts": attempts}
+        if attempts < MAX_ATTEMPTS:
+            _write_json(self._dir("pending") / f"{job['id']}.json", record)
+        else:
+            _write_json(self._dir("failed") / f"{job['id']}.json", {**record, "worker": worker, "error": error})
+        self._release(job["id"])
+
+    def _release(self, job: str):
+        (self._dir("claimed") / f"{job}.json").unlink(missing_ok=True)
+        (self._dir("claimed") / f"{job}.lease").unlink(missing_ok=True)
+
+    def recover_expired(self) -> List[str]:
+        """Move jobs whose lease ran out back to pending (counts as a failed attempt)."""
+        recovered = []
+        now = time.time()
+        for path in self._dir("claimed").glob("*.lease"):
+            lease = _read_json(path)
+            if not path.with_suffix(".json").exists() and lease and now > lease["expires_at"]:
+                path.unlink(missing_ok=True)  # renewed by a heartbeat after the job was released
+        for path in self._dir("claimed").glob("*.json"):
+            lease = _read_json(path.with_suffix(".lease"))
+            try:
+                expires_at = lease["expires_at"] if lease else path.stat().st_mtime + LEASE_SECONDS
+            except FileNotFoundError:
+                continue
+            if now <= expires_at + LEASE_GRACE_SECONDS:
+                continue
+            if (self._dir("done") / path.name).exists():
+                self._release(path.stem)
+                continue
+
+            job = _read_json(path)
+            if job is None:
+                continue
+            job["id"] = path.stem
+            worker = lease["worker"] if lease else "?"
+            self.fail(job, worker, f"lease expired (worker {worker})")
+            recovered.append(job["node"])
+            print(f"  ↺ {job['node']}: lease of {worker} expired, requeued")
+        return recovered
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(list(self._dir(name).glob("*.json"))) for name in QUEUE_DIRS}
+
+
+# ====================
+# WORKER
+# ====================
+
+class Heartbeat:
+    """Renews a job's lease (and the worker status file) from a background thread."""
+
+    def __init__(self, queue: WorkQueue, worker: str, lease: float):
+        self.queue = queue
+        self.worker = worker
+        self.lease = lease
+        self.job = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def beat(self):
+        job = self.job
+        if job is not None:
+            self.queue.renew(job["id"], self.worker, self.lease)
+        _write_json(self.queue.root / "workers" / f"{self.worker}.json", {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "node": job["node"] if job else None,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def _loop(self):
+        while not self._stop.wait(self.lease / 4):
+            self.beat()
+
+
+def run_worker(queue_dir: str, lease: float = LEASE_SECONDS,
+               idle_exit: float = WORKER_IDLE_EXIT_SECONDS, max_jobs: int = None) -> int:
+    """Claim and run jobs until the queue is closed (or idle for idle_exit seconds)."""
+    from pipeline_dag import build_pipeline
+
+    queue = WorkQueue(queue_dir)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    heartbeat = Heartbeat(queue, worker, lease).start()
+    pipeline, pipeline_args = None, None
+    n_jobs, idle_since = 0, time.monotonic()
+    print(f"Worker {worker} on {queue.root}")
+
+    try:
+        while max_jobs is None or n_jobs < max_jobs:
+            queue.recover_expired()
+            job = queue.claim(worker, lease)
+            if job is None:
+                if queue.is_closed() or time.monotonic() - idle_since > idle_exit:
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+
+            heartbeat.job = job
+            try:
+                # One pipeline per coordinator run (pipeline.json changes with it)
+                args = queue.build_args()
+                if args != pipeline_args:
+                    pipeline, pipeline_args = build_pipeline(**args), args
+                if pipeline.key(job["node"]) != job["key"]:
+                    raise RuntimeError("checkpoint key differs from the coordinator's "
+                                       "(different code or data on this machine)")
+                print(f"  ▶ {job['node']} (attempt {job['attempts'] + 1})")
+                seconds = pipeline.execute(job["node"])
+                queue.complete(job, worker, seconds)
+                print(f"  ✓ {job['node']} ({seconds:.1f}s)")
+            except Exception as e:
+                traceback.print_exc()
+                queue.fail(job, worker, f"{type(e).__name__}: {e}")
+                print(f"  ✗ {job['node']}: {e}")
+            finally:
+                heartbeat.job = None
+            n_jobs += 1
+            idle_since = time.monotonic()
+    finally:
+        heartbeat.stop()
+        (queue.root / "workers" / f"{worker}.json").unlink(missing_ok=True)
+
+    print(f"Worker {worker} exiting after {n_jobs} job(s)")
+    return n_jobs
+
+
+# ====================
+# COORDINATOR
+# ====================
+
+def spawn_workers(queue_dir: str, n: int, lease: float = LEASE_SECONDS) -> List[subprocess.Popen]:
+    """Local worker processes standing in for machines."""
+    return [
+        subprocess.Popen([sys.executable, str(SRC_DIR / "work_queue.py"), "worker",
+                          "--queue", str(queue_dir), "--lease", str(lease)], cwd=SRC_DIR)
+        for _ in range(n)
+    ]
+
+
+def run_queue(pipeline, build_args: Dict, queue_dir: str, stages: List[str] = None,
+              force_stages: List[str] = (), n_spawn: int = 0, lease: float = LEASE_SECONDS) -> Dict[str, str]:
+    """Enqueue the DAG's ready nodes until every planned node is done (or one fails for good)."""
+    queue = WorkQueue(queue_dir)
+    queue.reset(build_args)
+    status = pipeline.plan(stages, force_stages)
+    to_run = [name for name, s in status.items() if s == "run"]
+    done = {name for name, s in status.items() if s == "cached"}
+    enqueued, seq = {}, 0
+    print(f"  {len(to_run)} jobs, {len(done)} nodes from checkpoints | queue: {queue.root}")
+
+    workers = spawn_workers(queue_dir, n_spawn, lease) if n_spawn else []
+    try:
+        while any(name not in done for name in to_run):
+            queue.recover_expired()
+            for job, record in queue.finished().items():
+                if record and record["node"] not in done:
+                    done.add(record["node"])
+                    print(f"  ✓ {record['node']} ({record['seconds']:.1f}s on {record['worker']})")
+            failures = queue.failures()
+            if failures:
+                lines = [f"{r['node']}: {r['error']}" for r in failures.values() if r]
+                raise RuntimeError("job failed after retries (completed nodes are checkpointed):\n  "
+                                   + "\n  ".join(lines))
+
+            ready = [n for n in to_run if n not in enqueued and all(d in done for d in pipeline.nodes[n].deps)]
+            for name in sorted(ready, key=lambda n: -pipeline.nodes[n].cost):
+                enqueued[name] = queue.put(seq, name, pipeline.key(name))
+                seq += 1
+            if workers and all(proc.poll() is not None for proc in workers):
+                raise RuntimeError("all spawned workers exited with jobs left (see their output)")
+            time.sleep(POLL_SECONDS)
+    finally:
+        queue.close()
+        for proc in workers:
+            proc.wait()
+
+    return status
+
+
+def print_status(queue_dir: str):
+    queue = WorkQueue(queue_dir)
+    counts = queue.counts()
+    print(f"Queue: {queue.root}{' (closed)' if queue.is_closed() else ''}")
+    print("  " + " | ".join(f"{name} {counts[name]}" for name in ["pending", "claimed", "done", "failed"]))
+    for path in sorted((queue.root / "claimed").glob("*.json")):
+        lease = _read_json(path.with_suffix(".lease")) or {}
+        left = lease.get("expires_at", 0) - time.time()
+        print(f"  claimed {path.stem:<40} {lease.get('worker', '?')} (lease {left:+.0f}s)")
+    for path in sorted((queue.root / "workers").glob("*.json")):
+        info = _read_json(path) or {}
+        print(f"  worker  {path.stem:<40} {info.get('node') or 'idle'} (seen {info.get('updated_at')})")
+    for job, record in queue.failures().items():
+        print(f"  failed  {job:<40} {record.get('error') if record else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Workers and status for the shared-filesystem pipeline queue",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python run_pipeline.py --queue /shared/queue --output /shared/output    # coordinator
+  python work_queue.py worker --queue /shared/queue
+  python work_queue.py worker --queue /shared/queue --lease 30 --idle-exit 60
+  python work_queue.py status --queue /shared/queue
+        """
+    )
+    parser.add_argument("action", choices=["worker", "status"], help="Action to run")
+    parser.add_argument("--queue", type=str, required=True, help="Queue directory on the shared volume")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Job lease in seconds (renewed every lease/4)")
+    parser.add_argument(
+        "--idle-exit",
+        type=float,
+        default=WORKER_IDLE_EXIT_SECONDS,
+        help="Exit after this many seconds without a job (also exits when the queue is closed)"
+    )
+    parser.add_argument("--max-jobs", type=int, default=None, help="Exit after this many jobs")
+
+    args = parser.parse_args()
+
+    if args.action == "status":
+        print_status(args.queue)
+    else:
+        run_worker(args.queue, args.lease, args.idle_exit, args.max_jobs)
+
+
+if __name__ == "__main__":
+    main()